@@ -2,9 +2,13 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 import os
 
-db = SQLAlchemy()
+from dbprofile import (
+    READ_BIND, RoutingSession, apply_pragmas, clear_read_only, engine_options, pragmas_from_env, read_only_url
+)
 
-def create_app():
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+
+def create_app(test_config=None):
     app = Flask(__name__)
     app.secret_key = "dev-secret-key"
     app.config['SESSION_PERMANENT'] = False
@@ -14,12 +18,44 @@ def create_app():
     instance_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'instance')
     os.makedirs(instance_path, exist_ok=True)
     
-    # Use absolute path for database
+    # Any SQLAlchemy URL; defaults to an absolute path in the instance folder
     db_path = os.path.join(instance_path, 'quiz.db')
-    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_path}"
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", f"sqlite:///{db_path}")
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    # Shared secret for service-to-service endpoints (see app.service_auth).
+    app.config["SERVICE_TOKEN"] = os.environ.get("SERVICE_TOKEN")
+    # Cold attempts older than the archive window live in their own file.
+    app.config["SQLALCHEMY_BINDS"] = {
+        "archive": os.environ.get("ARCHIVE_DATABASE_URL", f"sqlite:///{os.path.join(instance_path, 'quiz_archive.db')}")
+    }
+
+    if test_config:
+        app.config.update(test_config)
+
+    # SQLite pragmas for every connection, and a read-only engine on the same
+    # file for the read_only views (see dbprofile).
+    app.config.setdefault("SQLITE_PRAGMAS", pragmas_from_env())
+    app.config.setdefault("SQLITE_READ_BIND", os.environ.get("SQLITE_READ_BIND", "1") != "0")
+    read_url = read_only_url(app.config["SQLALCHEMY_DATABASE_URI"], app.instance_path)
+    if app.config["SQLITE_READ_BIND"] and read_url:
+        app.config["SQLALCHEMY_BINDS"] = dict(app.config["SQLALCHEMY_BINDS"], **{READ_BIND: read_url})
+
+    # Pool sizing, pre-ping, recycle and statement cache from DB_* variables,
+    # for the main database and every bind given as a plain URL.
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", engine_options(app.config["SQLALCHEMY_DATABASE_URI"]))
+    app.config["SQLALCHEMY_BINDS"] = {
+        key: dict(engine_options(value), url=value) if isinstance(value, str) else value
+        for key, value in app.config["SQLALCHEMY_BINDS"].items()
+    }
 
     db.init_app(app)
+    with app.app_context():
+        for bind_key, engine in db.engines.items():
+            apply_pragmas(engine, app.config["SQLITE_PRAGMAS"], read_only=bind_key == READ_BIND)
+    app.teardown_request(clear_read_only)
+
+    from app.quiz.state import init_quiz_state_store
+    init_quiz_state_store(app)
 
     from app.main.routes import main_bp
     from app.quiz.routes import quiz_bp
@@ -29,9 +65,14 @@ def create_app():
     app.register_blueprint(quiz_bp, url_prefix="/quiz")
     app.register_blueprint(api_bp)
 
-    with app.app_context():
-        db.create_all()
-        
+    # Migrations are a deploy step (migrate.py); AUTO_MIGRATE=1 applies them
+    # here instead, which is only meant for single-process development.
+    app.config.setdefault("AUTO_MIGRATE", os.environ.get("AUTO_MIGRATE", "0") == "1")
+    if app.config["AUTO_MIGRATE"]:
+        from app.migrations import upgrade_database
+        with app.app_context():
+            upgrade_database()
+
     from datetime import timedelta
     app.jinja_env.globals.update(timedelta=timedelta)
 
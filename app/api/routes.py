@@ -2,14 +2,25 @@
 API routes for Quiz Service.
 These endpoints are used by the Saga Orchestrator.
 """
-from flask import Blueprint, request, jsonify
+from datetime import datetime
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from app import db
-from app.models import UserProfile, Category
+from app.models import UserProfile, Category, UserStats
+from app.quiz.services import ingest_attempts, insert_returning_ids
+from app.export import DATASETS, gzip_chunks, iter_dataset, ndjson_chunks
+from app.service_auth import service_only
+from dbprofile import pool_stats, read_only
+from sqlalchemy.orm import joinedload
 import logging
+import os
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 logger = logging.getLogger(__name__)
 
+MAX_BATCH_ATTEMPTS = 20000
+BATCH_CHUNK_SIZE = 500
+MAX_BULK_PROFILES = 1000
+
 
 @api_bp.route('/health', methods=['GET'])
 def health():
@@ -17,6 +28,18 @@ def health():
     return jsonify({'status': 'ok', 'service': 'quiz_service'}), 200
 
 
+@api_bp.route('/pool', methods=['GET'])
+@service_only
+def get_pool_stats():
+    """
+    Connection pool usage per database bind: connections checked out and
+    idle, overflow in use, and checkout wait times and timeouts since start.
+    Pool state is per process, so each worker reports its own. Requires the
+    X-Service-Token header.
+    """
+    return jsonify({'pid': os.getpid(), 'binds': pool_stats(db.engines)}), 200
+
+
 @api_bp.route('/users/profile', methods=['POST'])
 def create_user_profile():
     """
@@ -90,7 +113,116 @@ def create_user_profile():
         return jsonify({'error': f'Failed to create user profile: {str(e)}'}), 500
 
 
+@api_bp.route('/users/profiles/bulk', methods=['POST'])
+@service_only
+def create_user_profiles_bulk():
+    """
+    Create profiles for many users in one statement.
+    Called by the batch registration saga after bulk-creating the users.
+    
+    Request Body:
+    {
+        "user_ids": [int, ...],
+        "default_preferences": {"notifications_enabled": bool, "default_category": int (optional)}
+    }
+    
+    Returns (207 if any item failed, otherwise 201):
+    {
+        "created": int,
+        "failed": int,
+        "results": [{"user_id", "status": "created"|"error", "profile_id", "error"}]
+    }
+    """
+    try:
+        data = request.get_json(silent=True)
+        
+        if not data or not isinstance(data.get('user_ids'), list):
+            return jsonify({'error': 'Request body must contain a user_ids list'}), 400
+        
+        user_ids = data['user_ids']
+        if len(user_ids) > MAX_BULK_PROFILES:
+            return jsonify({'error': f'At most {MAX_BULK_PROFILES} profiles per request'}), 413
+        
+        preferences = data.get('default_preferences') or {}
+        default_category_id = preferences.get('default_category')
+        if default_category_id and not db.session.get(Category, default_category_id):
+            return jsonify({'error': f'Category {default_category_id} does not exist'}), 400
+        
+        existing = {
+            user_id for (user_id,) in
+            db.session.query(UserProfile.user_id).filter(UserProfile.user_id.in_(user_ids))
+        }
+        results = []
+        rows = []
+        for user_id in user_ids:
+            if not isinstance(user_id, int) or isinstance(user_id, bool):
+                results.append({'user_id': user_id, 'status': 'error', 'error': 'user_id must be an integer'})
+            elif user_id in existing:
+                results.append({'user_id': user_id, 'status': 'error',
+                                'error': f'Profile for user_id {user_id} already exists'})
+            else:
+                existing.add(user_id)
+                results.append({'user_id': user_id, 'status': 'created'})
+                rows.append({
+                    'user_id': user_id,
+                    'notifications_enabled': preferences.get('notifications_enabled', True),
+                    'default_category_id': default_category_id,
+                })
+        
+        if rows:
+            profile_ids = iter(insert_returning_ids(UserProfile.__table__, rows))
+            db.session.commit()
+            for result in results:
+                if result['status'] == 'created':
+                    result['profile_id'] = next(profile_ids)
+        
+        failed = len(results) - len(rows)
+        logger.info(f"Bulk profile creation: {len(rows)} created, {failed} failed")
+        
+        return jsonify({
+            'created': len(rows),
+            'failed': failed,
+            'results': results
+        }), 207 if failed else 201
+        
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error creating user profiles in bulk: {str(e)}")
+        return jsonify({'error': f'Failed to create user profiles: {str(e)}'}), 500
+
+
+@api_bp.route('/users/profiles/bulk/compensate', methods=['POST'])
+@service_only
+def compensate_delete_profiles_bulk():
+    """
+    Bulk compensation for the batch registration saga: delete the profiles
+    of the given users. Missing profiles are ignored (idempotent).
+    
+    Request Body: {"user_ids": [int, ...]}
+    """
+    try:
+        data = request.get_json(silent=True)
+        
+        if not data or not isinstance(data.get('user_ids'), list):
+            return jsonify({'error': 'Request body must contain a user_ids list'}), 400
+        
+        deleted = UserProfile.query.filter(
+            UserProfile.user_id.in_(data['user_ids'])
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        
+        logger.info(f"User profiles deleted for compensation: {deleted}")
+        
+        return jsonify({'success': True, 'deleted': deleted, 'compensated': True}), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error compensating (deleting profiles): {str(e)}")
+        return jsonify({'error': f'Failed to compensate (delete profiles): {str(e)}'}), 500
+
+
 @api_bp.route('/users/<int:user_id>/profile', methods=['GET'])
+@read_only
 def get_user_profile(user_id):
     """
     Get user profile by user_id.
@@ -158,4 +290,153 @@ def compensate_delete_profile(user_id):
         return jsonify({
             'error': f'Failed to compensate (delete profile): {str(e)}',
             'user_id': user_id
-        }), 500
\ No newline at end of file
+        }), 500
+
+
+@api_bp.route('/users/<int:user_id>/stats', methods=['GET'])
+@service_only
+@read_only
+def get_user_stats(user_id):
+    """
+    Get quiz statistics for a user, per category and overall.
+    Served from the user_stats aggregate table, so the cost is proportional
+    to the number of categories, not the number of attempts. Any user ID can
+    be asked for, so this requires the X-Service-Token header.
+    
+    Args:
+        user_id: The user ID to get statistics for
+        
+    Returns:
+    {
+        "user_id": int,
+        "categories": [{"category_id", "category_name", "attempt_count", "best_score", ...}],
+        "overall": {"attempt_count", "score_sum", "total_sum", "average_percentage"}
+    }
+    """
+    try:
+        rows = (
+            UserStats.query
+            .options(joinedload(UserStats.category))
+            .filter(UserStats.user_id == user_id)
+            .order_by(UserStats.category_id)
+            .all()
+        )
+        
+        attempt_count = sum(row.attempt_count for row in rows)
+        score_sum = sum(row.score_sum for row in rows)
+        total_sum = sum(row.total_sum for row in rows)
+        
+        return jsonify({
+            'user_id': user_id,
+            'categories': [row.to_dict() for row in rows],
+            'overall': {
+                'attempt_count': attempt_count,
+                'score_sum': score_sum,
+                'total_sum': total_sum,
+                'average_percentage': round(score_sum / total_sum * 100, 1) if total_sum else 0
+            }
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Error getting user stats: {str(e)}")
+        return jsonify({'error': f'Failed to get user stats: {str(e)}'}), 500
+
+
+@api_bp.route('/attempts/batch', methods=['POST'])
+@service_only
+def create_attempts_batch():
+    """
+    Bulk-ingest completed quiz attempts (offline and kiosk clients).
+    Attempts are scored server-side against the answer key and written in
+    chunked transactions; one bad item or chunk does not reject the batch.
+    Items name their owner's user_id, so this requires the X-Service-Token
+    header; kiosk uploads go through a service holding the token.
+    
+    Request Body:
+    {
+        "attempts": [
+            {
+                "client_id": any (optional, echoed back),
+                "category_id": int,
+                "user_id": int or null,
+                "session_id": string (required when user_id is null),
+                "created_at": ISO 8601 string (optional),
+                "total": int (optional, defaults to number of answers; may exceed
+                          it only for unanswered questions, up to the quiz length),
+                "answers": {"<question_id>": choice_id, ...}
+                           or [{"question_id": int, "choice_id": int}, ...]
+            }
+        ]
+    }
+    
+    Returns (207 if any item failed, otherwise 201):
+    {
+        "created": int,
+        "failed": int,
+        "results": [{"index", "status": "created"|"error", "attempt_id", "score", "total", "error"}]
+    }
+    """
+    try:
+        data = request.get_json(silent=True)
+        
+        if not data or not isinstance(data.get('attempts'), list):
+            return jsonify({'error': 'Request body must contain an attempts list'}), 400
+        
+        attempts = data['attempts']
+        if len(attempts) > MAX_BATCH_ATTEMPTS:
+            return jsonify({'error': f'At most {MAX_BATCH_ATTEMPTS} attempts per batch'}), 413
+        
+        results = ingest_attempts(attempts, chunk_size=BATCH_CHUNK_SIZE)
+        created = sum(1 for r in results if r['status'] == 'created')
+        failed = len(results) - created
+        
+        logger.info(f"Batch attempt upload: {created} created, {failed} failed")
+        
+        return jsonify({
+            'created': created,
+            'failed': failed,
+            'results': results
+        }), 207 if failed else 201
+        
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error ingesting attempt batch: {str(e)}")
+        return jsonify({'error': f'Failed to ingest attempts: {str(e)}'}), 500
+
+
+@api_bp.route('/export/<dataset>', methods=['GET'])
+@service_only
+@read_only
+def export_dataset(dataset):
+    """
+    Stream a dataset (categories, questions or attempts) as NDJSON.
+    Rows are read in id order with bounded memory. Resume an interrupted
+    export by passing the last id received as since_id. Requires the
+    X-Service-Token header.
+    
+    Query Parameters:
+        since_id: only records with a greater id (optional)
+        from, to: ISO 8601 created_at range for attempts, to exclusive (optional)
+        gzip: 1 to gzip the stream (optional)
+    
+    Returns: application/x-ndjson, one record per line
+    """
+    if dataset not in DATASETS:
+        return jsonify({'error': f'Unknown dataset {dataset}; expected one of {", ".join(DATASETS)}'}), 404
+    
+    try:
+        since_id = request.args.get('since_id', type=int)
+        start = request.args.get('from')
+        end = request.args.get('to')
+        start = datetime.fromisoformat(start) if start else None
+        end = datetime.fromisoformat(end) if end else None
+    except ValueError:
+        return jsonify({'error': 'from and to must be ISO 8601 timestamps'}), 400
+    
+    chunks = ndjson_chunks(iter_dataset(dataset, since_id, start, end))
+    headers = {'Content-Disposition': f'attachment; filename={dataset}.ndjson'}
+    if request.args.get('gzip') in ('1', 'true'):
+        chunks = gzip_chunks(chunks)
+        headers['Content-Encoding'] = 'gzip'
+    
+    return Response(stream_with_context(chunks), mimetype='application/x-ndjson', headers=headers)
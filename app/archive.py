@@ -0,0 +1,158 @@
+"""
+Archive tier for cold quiz attempts.
+
+Attempts older than the archive window are moved from quiz_attempts and
+quiz_answers in the hot database into archived_attempts in a separate archive
+database (the "archive" bind). Each archived attempt is one row: the card
+fields as columns plus the review rows as zlib-compressed JSON. History and
+detail pages fall back to the archive, so archived results keep working.
+"""
+import json
+import logging
+import zlib
+from datetime import datetime, timedelta
+
+from flask import g
+from sqlalchemy import func, insert, tuple_
+
+from app import db
+from app.models import ArchivedAttempt, Category, QuizAnswer, QuizAttempt
+from app.quiz.services import build_attempt_results, cached_results, results_key
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ARCHIVE_AFTER_DAYS = 180
+DEFAULT_BATCH_SIZE = 500
+PAYLOAD_VERSION = 1
+
+
+def encode_results(results) -> bytes:
+    """Pack review rows (see get_attempt_results) into the archive payload."""
+    rows = [
+        [r["question_text"], r["selected_text"], r["correct_text"], r["is_correct"]]
+        for r in results
+    ]
+    return zlib.compress(
+        json.dumps({"v": PAYLOAD_VERSION, "rows": rows}, separators=(",", ":")).encode("utf-8")
+    )
+
+
+def decode_results(payload: bytes) -> tuple:
+    """Unpack an archive payload into the review rows detail() renders."""
+    data = json.loads(zlib.decompress(payload).decode("utf-8"))
+    return tuple(
+        {
+            "question_text": question_text,
+            "selected_text": selected_text,
+            "correct_text": correct_text,
+            "is_correct": is_correct
+        }
+        for question_text, selected_text, correct_text, is_correct in data["rows"]
+    )
+
+
+def archive_horizon():
+    """
+    Newest created_at in the archive, read once per request.
+
+    History only needs to consult the archive for pages that reach back to
+    this point; None means the archive is empty. archive_attempts.py moves it
+    from another process, so it is never cached beyond the request: a MAX on
+    ix_archived_attempts_created is one index lookup.
+    """
+    if "archive_horizon" not in g:
+        g.archive_horizon = db.session.query(func.max(ArchivedAttempt.created_at)).scalar()
+    return g.archive_horizon
+
+
+def get_archived_attempt(attempt_id: int):
+    return db.session.get(ArchivedAttempt, attempt_id)
+
+
+def archive_attempts(older_than_days: int = DEFAULT_ARCHIVE_AFTER_DAYS,
+                     batch_size: int = DEFAULT_BATCH_SIZE,
+                     dry_run: bool = False) -> dict:
+    """
+    Move attempts older than the window from the hot tables into the archive.
+
+    Each batch is written to the archive and committed there first, then
+    deleted from the hot database. A crash in between leaves the batch in both
+    places; the next run re-archives it idempotently and finishes the delete.
+
+    Returns a report of attempts and answers moved.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    old_attempts = QuizAttempt.query.filter(QuizAttempt.created_at < cutoff)
+    report = {"cutoff": cutoff.isoformat(), "attempts": 0, "answers": 0, "batches": 0, "dry_run": dry_run}
+
+    if dry_run:
+        report["attempts"] = old_attempts.count()
+        report["answers"] = (
+            db.session.query(func.count(QuizAnswer.id))
+            .filter(QuizAnswer.quiz_attempt_id.in_(
+                db.session.query(QuizAttempt.id).filter(QuizAttempt.created_at < cutoff).scalar_subquery()
+            ))
+            .scalar()
+        )
+        return report
+
+    category_names = dict(db.session.query(Category.id, Category.name).all())
+
+    while True:
+        batch = old_attempts.order_by(QuizAttempt.id).limit(batch_size).all()
+        if not batch:
+            break
+
+        ids = [attempt.id for attempt in batch]
+        results = build_attempt_results(ids)
+        try:
+            # Delete-then-insert keeps a re-run after a crash idempotent. Only
+            # copies of these same attempts are replaced: a different archived
+            # attempt under one of the IDs fails the insert instead.
+            db.session.query(ArchivedAttempt).filter(
+                tuple_(ArchivedAttempt.id, ArchivedAttempt.created_at).in_(
+                    [(attempt.id, attempt.created_at) for attempt in batch]
+                )
+            ).delete(synchronize_session=False)
+            db.session.execute(insert(ArchivedAttempt), [
+                {
+                    "id": attempt.id,
+                    "category_id": attempt.category_id,
+                    "category_name": category_names.get(attempt.category_id),
+                    "user_id": attempt.user_id,
+                    "session_id": attempt.session_id,
+                    "score": attempt.score,
+                    "total": attempt.total,
+                    "created_at": attempt.created_at,
+                    "archived_at": datetime.utcnow(),
+                    "payload": encode_results(results[attempt.id]),
+                }
+                for attempt in batch
+            ])
+            # Commits the archive bind and the (read-only so far) hot bind.
+            db.session.commit()
+            g.pop("archive_horizon", None)
+
+            report["answers"] += (
+                db.session.query(QuizAnswer)
+                .filter(QuizAnswer.quiz_attempt_id.in_(ids))
+                .delete(synchronize_session=False)
+            )
+            report["attempts"] += (
+                db.session.query(QuizAttempt)
+                .filter(QuizAttempt.id.in_(ids))
+                .delete(synchronize_session=False)
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        report["batches"] += 1
+
+    logger.info(f"Archived {report['attempts']} attempts and {report['answers']} answers")
+    return report
+
+
+def get_archived_results(archived: ArchivedAttempt) -> tuple:
+    """Review rows for an archived attempt, sharing the hot results cache."""
+    return cached_results(results_key(archived), lambda: decode_results(archived.payload))
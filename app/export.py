@@ -0,0 +1,167 @@
+"""
+Streaming NDJSON export for analytics.
+
+Three datasets are exported, one JSON object per line:
+
+- categories: {"id", "name"}
+- questions: {"id", "category_id", "text", "correct_choice", "choices": [{"id", "text", "is_correct"}]}
+- attempts: {"id", "category_id", "user_id", "guest_id", "score", "total", "created_at",
+  "answers": [{"question_id", "selected_choice_id", "is_correct"}]}
+
+Guest attempts are not exported with their session_id, which is what lets a
+browser claim them: guest_id is a keyed hash of it instead, stable across
+exports so a guest's attempts can still be grouped.
+
+Rows are read in primary-key order through yield_per, so memory stays flat
+however large the table is. Every record carries its id, so an interrupted
+export resumes with since_id set to the last id received. Attempts can be
+limited to a created_at range. Archived attempts are not included.
+"""
+import hashlib
+import hmac
+import json
+import zlib
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import select
+
+from app import db
+from app.models import Category, Choice, Question, QuizAnswer, QuizAttempt
+
+YIELD_PER = 1000
+DATASETS = ("categories", "questions", "attempts")
+
+
+def _rows(statement):
+    """
+    Iterate a SELECT in YIELD_PER batches instead of buffering the result.
+
+    The statement only runs once iteration starts, inside the streamed
+    response, so a server-side cursor is not opened in a transaction that
+    ends when the view returns.
+    """
+    yield from db.session.execute(statement.execution_options(yield_per=YIELD_PER))
+
+
+def _grouped(rows, build, add):
+    """Fold consecutive joined rows with the same parent id into one record."""
+    record = None
+    for row in rows:
+        if record is None or record["id"] != row[0]:
+            if record is not None:
+                yield record
+            record = build(row)
+        add(record, row)
+    if record is not None:
+        yield record
+
+
+def iter_categories(since_id: int = None):
+    statement = select(Category.id, Category.name).order_by(Category.id)
+    if since_id is not None:
+        statement = statement.where(Category.id > since_id)
+    for category_id, name in _rows(statement):
+        yield {"id": category_id, "name": name}
+
+
+def iter_questions(since_id: int = None):
+    statement = (
+        select(
+            Question.id, Question.category_id, Question.text, Question.correct_choice,
+            Choice.id, Choice.text, Choice.is_correct
+        )
+        .outerjoin(Choice, Choice.question_id == Question.id)
+        .order_by(Question.id, Choice.id)
+    )
+    if since_id is not None:
+        statement = statement.where(Question.id > since_id)
+
+    def build(row):
+        return {"id": row[0], "category_id": row[1], "text": row[2], "correct_choice": row[3], "choices": []}
+
+    def add(record, row):
+        if row[4] is not None:
+            record["choices"].append({"id": row[4], "text": row[5], "is_correct": bool(row[6])})
+
+    return _grouped(_rows(statement), build, add)
+
+
+def guest_id(session_id: str):
+    """Pseudonym for a guest session_id, keyed with the app's secret key."""
+    if session_id is None:
+        return None
+    key = str(current_app.secret_key).encode("utf-8")
+    return hmac.new(key, session_id.encode("utf-8"), hashlib.sha256).hexdigest()[:32]
+
+
+def iter_attempts(since_id: int = None, start: datetime = None, end: datetime = None):
+    """Attempts with their answers; start is inclusive and end exclusive."""
+    statement = (
+        select(
+            QuizAttempt.id, QuizAttempt.category_id, QuizAttempt.user_id, QuizAttempt.session_id,
+            QuizAttempt.score, QuizAttempt.total, QuizAttempt.created_at,
+            QuizAnswer.question_id, QuizAnswer.selected_choice_id, QuizAnswer.is_correct
+        )
+        .outerjoin(QuizAnswer, QuizAnswer.quiz_attempt_id == QuizAttempt.id)
+        .order_by(QuizAttempt.id, QuizAnswer.id)
+    )
+    if since_id is not None:
+        statement = statement.where(QuizAttempt.id > since_id)
+    if start is not None:
+        statement = statement.where(QuizAttempt.created_at >= start)
+    if end is not None:
+        statement = statement.where(QuizAttempt.created_at < end)
+
+    def build(row):
+        return {
+            "id": row[0],
+            "category_id": row[1],
+            "user_id": row[2],
+            "guest_id": guest_id(row[3]),
+            "score": row[4],
+            "total": row[5],
+            "created_at": row[6].isoformat() if row[6] else None,
+            "answers": [],
+        }
+
+    def add(record, row):
+        if row[7] is not None:
+            record["answers"].append({
+                "question_id": row[7], "selected_choice_id": row[8], "is_correct": bool(row[9])
+            })
+
+    return _grouped(_rows(statement), build, add)
+
+
+def iter_dataset(dataset: str, since_id: int = None, start: datetime = None, end: datetime = None):
+    """Records of one dataset; start and end only apply to attempts."""
+    if dataset == "categories":
+        return iter_categories(since_id)
+    if dataset == "questions":
+        return iter_questions(since_id)
+    if dataset == "attempts":
+        return iter_attempts(since_id, start, end)
+    raise ValueError(f"unknown dataset {dataset!r}; expected one of {', '.join(DATASETS)}")
+
+
+def ndjson_chunks(records, lines_per_chunk: int = 500):
+    """Encode records as NDJSON, yielding a few hundred lines per bytes chunk."""
+    lines = []
+    for record in records:
+        lines.append(json.dumps(record, separators=(",", ":"), ensure_ascii=False))
+        if len(lines) >= lines_per_chunk:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def gzip_chunks(chunks):
+    """Gzip a stream of bytes chunks incrementally."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
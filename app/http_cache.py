@@ -0,0 +1,60 @@
+"""
+Conditional GET support for pages that rarely change between views.
+
+Each page's ETag is built from cheap version counters (the shared category
+and questions versions, the owner's history version in user_stats) rather
+than a hash of the rendered body, so a matching If-None-Match is answered
+with 304 before any template is rendered.
+
+Every ETag also includes a token that is new in each process, so pages
+cached before a restart (possibly with older templates) are never
+revalidated: a browser revalidating against another worker or after a
+restart just gets a fresh 200.
+"""
+import hashlib
+import os
+import uuid
+
+from flask import make_response, request, session
+
+_boot = {"pid": None, "id": None}
+
+
+def boot_id() -> str:
+    """Token unique to this process, renewed in forked workers."""
+    if _boot["pid"] != os.getpid():
+        _boot["pid"] = os.getpid()
+        _boot["id"] = uuid.uuid4().hex[:12]
+    return _boot["id"]
+
+
+def page_etag(*parts) -> str:
+    """
+    Opaque ETag for a page identified by parts.
+
+    Parts are hashed so owners and query arguments never appear in headers.
+    """
+    digest = hashlib.sha1("\x1f".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+    return f"{boot_id()}-{digest[:20]}"
+
+
+def conditional(etag: str, build):
+    """
+    Return 304 if the client already has etag, else the response from build().
+
+    Pages are per user, so they are marked private and must be revalidated on
+    every view. While flashed messages are pending the page is always built
+    and sent without an ETag: the messages are part of the body, and a cached
+    copy must not replay them later.
+    """
+    if "_flashes" in session:
+        return make_response(build())
+
+    if etag in request.if_none_match:
+        response = make_response("", 304)
+    else:
+        response = make_response(build())
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    response.vary.update(("Cookie", "X-User-Id"))
+    return response
@@ -1,8 +1,9 @@
-from flask import Blueprint, render_template, request, jsonify
-from app.models import QuizAttempt, Category
+from flask import Blueprint, render_template, request, jsonify, url_for, current_app
+from app.http_cache import conditional, page_etag
+from dbprofile import read_only
+from app.main.services import history_page, history_version, migrate_guest_attempts, GUEST_MIGRATION_CHUNK_SIZE
+from app.quiz.services import category_cache
 from flask import session
-from app import db
-from sqlalchemy import and_
 import uuid
 
 main_bp = Blueprint("main", __name__)
@@ -44,6 +45,7 @@ def clear_guest_session():
         session.modified = True
 
 @main_bp.route("/")
+@read_only
 def home():
     session.pop("active_quiz", None)
     session.pop("current_question", None)
@@ -62,10 +64,14 @@ def home():
         # Logged-in user - clear any guest session_id to prevent identity mixing
         clear_guest_session()
 
-    categories = Category.query.all()
-    return render_template("home.html", categories=categories)
+    # The page only lists categories, so their shared version identifies it.
+    return conditional(
+        page_etag("home", category_cache.version()),
+        lambda: render_template("home.html", categories=category_cache.all())
+    )
 
 @main_bp.route("/history")
+@read_only
 def history():
     """
     Display quiz history with strict result isolation:
@@ -73,30 +79,72 @@ def history():
     - Guest users: Only see their own guest results (user_id IS NULL, session_id matches)
     
     Identity Source: X-User-Id header (set by Gateway after JWT validation)
+
+    Results are paged newest first; ?before=<cursor> continues after a page.
+    Revisits answer 304 until the owner's attempts change.
+    """
+    user_id, session_id = history_owner()
+
+    def build():
+        quizzes, next_cursor = history_page(user_id, session_id, cursor=request.args.get("before"))
+        return render_template("history.html", history=quizzes, next_cursor=next_cursor)
+
+    return conditional(history_etag("history", user_id, session_id), build)
+
+
+@main_bp.route("/history/data")
+@read_only
+def history_data():
+    """
+    JSON variant of history for incremental loading.
+
+    Same isolation rules as history(). Pass the previous response's
+    next_cursor as ?before= to fetch the next page.
+    """
+    user_id, session_id = history_owner()
+
+    def build():
+        quizzes, next_cursor = history_page(user_id, session_id, cursor=request.args.get("before"))
+        return jsonify({
+            'items': [
+                {
+                    'id': quiz.id,
+                    'category_id': quiz.category_id,
+                    'category_name': quiz.category.name if quiz.category else None,
+                    'score': quiz.score,
+                    'total': quiz.total,
+                    'created_at': quiz.created_at.isoformat() if quiz.created_at else None,
+                    'detail_url': url_for('quiz.detail', quiz_id=quiz.id)
+                }
+                for quiz in quizzes
+            ],
+            'next_cursor': next_cursor
+        }), 200
+
+    return conditional(history_etag("history-data", user_id, session_id), build)
+
+
+def history_etag(page, user_id, session_id):
+    """ETag for one history page: owner, cursor, attempts and category names."""
+    return page_etag(
+        page,
+        f"u{user_id}" if user_id is not None else f"s{session_id}",
+        request.args.get("before", ""),
+        history_version(user_id, session_id),
+        category_cache.version(),
+    )
+
+
+def history_owner():
+    """
+    Resolve whose history to show as (user_id, session_id).
+    Logged-in users drop any guest session; guests get one created if needed.
     """
     user_id = get_user_id_from_header()
-    session_id = session.get('anonymous_session_id')
-    
     if user_id is not None:
         clear_guest_session()
-        query = QuizAttempt.query.filter(
-            and_(
-                QuizAttempt.user_id.isnot(None),
-                QuizAttempt.user_id == user_id
-            )
-        ).order_by(QuizAttempt.created_at.desc())
-        quizzes = query.all()
-    else:
-        session_id = get_or_create_session_id()
-        query = QuizAttempt.query.filter(
-            and_(
-                QuizAttempt.user_id.is_(None),
-                QuizAttempt.session_id == session_id
-            )
-        ).order_by(QuizAttempt.created_at.desc())
-        quizzes = query.all()
-    
-    return render_template("history.html", history=quizzes)
+        return user_id, None
+    return None, get_or_create_session_id()
 
 @main_bp.route("/clear-session", methods=["POST"])
 def clear_session():
@@ -120,11 +168,15 @@ def migrate_guest_results():
     Expected headers:
     - X-User-Id: The user ID to migrate results to
     
-    Expected body (JSON):
-    - session_id: The guest session ID to migrate from (optional, uses current session if not provided)
+    The guest session is always the caller's own (the signed Flask session
+    cookie); a session_id in the body is ignored, so nobody can claim
+    another guest's attempts by naming their session.
     
     Returns:
     - Number of results migrated
+
+    Small migrations are a single UPDATE; guests with more than
+    GUEST_MIGRATION_CHUNK_SIZE attempts are moved in chunks, one commit each.
     """
     # Get user identity from X-User-Id header (ONLY source of identity)
     user_id = get_user_id_from_header()
@@ -132,9 +184,7 @@ def migrate_guest_results():
     if user_id is None:
         return jsonify({'error': 'X-User-Id header is required and must be valid'}), 400
     
-    # Get session_id from request body or current session
-    data = request.get_json() or {}
-    session_id = data.get('session_id') or session.get('anonymous_session_id')
+    session_id = session.get('anonymous_session_id')
     
     if not session_id:
         # No guest session to migrate
@@ -143,21 +193,11 @@ def migrate_guest_results():
             'message': 'No guest session found to migrate'
         }), 200
     
-    guest_quizzes = QuizAttempt.query.filter(
-        and_(
-            QuizAttempt.user_id.is_(None),
-            QuizAttempt.session_id == session_id
-        )
-    ).all()
-    
-    migrated_count = 0
-    for quiz in guest_quizzes:
-        quiz.user_id = user_id
-        quiz.session_id = None
-        migrated_count += 1
-    
-    if migrated_count > 0:
-        db.session.commit()
+    migrated_count = migrate_guest_attempts(
+        session_id,
+        user_id,
+        chunk_size=current_app.config.get('GUEST_MIGRATION_CHUNK_SIZE', GUEST_MIGRATION_CHUNK_SIZE)
+    )
     
     clear_guest_session()
     
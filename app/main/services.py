@@ -0,0 +1,153 @@
+"""
+Read helpers for the main blueprint.
+"""
+from datetime import datetime
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.orm import joinedload
+
+from app import db
+from app.archive import archive_horizon
+from app.models import ArchivedAttempt, QuizAttempt, UserStats
+from app.stats import migrate_guest_stats, move_guest_stats
+
+HISTORY_PAGE_SIZE = 20
+GUEST_MIGRATION_CHUNK_SIZE = 500
+
+
+def encode_history_cursor(attempt: QuizAttempt) -> str:
+    """Cursor pointing just past an attempt in (created_at, id) descending order."""
+    return f"{attempt.created_at.isoformat()}_{attempt.id}"
+
+
+def decode_history_cursor(cursor):
+    """Return (created_at, id) for a cursor, or None if it is missing or malformed."""
+    if not cursor:
+        return None
+    created_at, _, attempt_id = cursor.rpartition("_")
+    try:
+        return datetime.fromisoformat(created_at), int(attempt_id)
+    except ValueError:
+        return None
+
+
+def _owner_filter(model, user_id, session_id):
+    if user_id is not None:
+        return and_(model.user_id.isnot(None), model.user_id == user_id)
+    return and_(model.user_id.is_(None), model.session_id == session_id)
+
+
+def _keyset_page(query, model, position, limit):
+    if position:
+        created_at, attempt_id = position
+        query = query.filter(or_(
+            model.created_at < created_at,
+            and_(model.created_at == created_at, model.id < attempt_id)
+        ))
+    return (
+        query
+        .order_by(model.created_at.desc(), model.id.desc())
+        .limit(limit)
+        .all()
+    )
+
+
+def history_page(user_id=None, session_id=None, cursor=None, limit: int = HISTORY_PAGE_SIZE):
+    """
+    Fetch one page of quiz history for a user or a guest session.
+
+    Keyset pagination on (created_at, id): each page is a range scan on the
+    (user_id, created_at) or (session_id, created_at) index, however deep the
+    page. The category is joined up front so cards do not lazy-load it.
+    Pages that reach back past the archive horizon are merged with archived
+    attempts, which render like hot ones.
+
+    Returns (attempts, next_cursor); next_cursor is None on the last page.
+    """
+    position = decode_history_cursor(cursor)
+
+    attempts = _keyset_page(
+        QuizAttempt.query
+        .options(joinedload(QuizAttempt.category))
+        .filter(_owner_filter(QuizAttempt, user_id, session_id)),
+        QuizAttempt, position, limit + 1
+    )
+
+    horizon = archive_horizon()
+    page_floor = attempts[-1].created_at if len(attempts) > limit else None
+    if horizon is not None and (page_floor is None or page_floor <= horizon):
+        archived = _keyset_page(
+            ArchivedAttempt.query.filter(_owner_filter(ArchivedAttempt, user_id, session_id)),
+            ArchivedAttempt, position, limit + 1
+        )
+        attempts = sorted(attempts + archived, key=lambda a: (a.created_at, a.id), reverse=True)
+
+    next_cursor = None
+    if len(attempts) > limit:
+        attempts = attempts[:limit]
+        next_cursor = encode_history_cursor(attempts[-1])
+    return attempts, next_cursor
+
+
+def history_version(user_id=None, session_id=None) -> str:
+    """
+    Fingerprint of everything history pages show for one owner.
+
+    The sum of the versions of the owner's user_stats rows, a lookup on the
+    owner's unique index over at most one row per category. Recording and
+    claiming attempts write those rows in the same transaction and only ever
+    increase the sum; rows are deleted only with all of their owner's
+    attempts, and archiving moves attempts without changing what history
+    shows.
+    """
+    version = (
+        db.session.query(func.coalesce(func.sum(UserStats.version), 0))
+        .filter(_owner_filter(UserStats, user_id, session_id))
+        .scalar()
+    )
+    return str(version)
+
+
+def migrate_guest_attempts(session_id: str, user_id: int, chunk_size: int = GUEST_MIGRATION_CHUNK_SIZE) -> int:
+    """
+    Re-assign a guest session's attempts to a user with set-based UPDATEs.
+
+    Up to chunk_size attempts move in one UPDATE ... WHERE user_id IS NULL AND
+    session_id = ? RETURNING, and their stats move from the guest's user_stats
+    rows to the user's in the same transaction. Larger migrations commit after
+    every chunk so a single login never holds the SQLite write lock for long;
+    stats stay consistent if one stops halfway. Archived guest attempts are
+    claimed last, together with what is left of the guest's stats. Returns the
+    number of attempts moved.
+    """
+    guest_owner = and_(QuizAttempt.user_id.is_(None), QuizAttempt.session_id == session_id)
+    claim = {"user_id": user_id, "session_id": None}
+
+    migrated = 0
+    try:
+        while True:
+            chunk_ids = select(QuizAttempt.id).where(guest_owner).limit(chunk_size).scalar_subquery()
+            moved = db.session.execute(
+                update(QuizAttempt)
+                .where(QuizAttempt.id.in_(chunk_ids), guest_owner)
+                .values(**claim)
+                .returning(QuizAttempt.category_id, QuizAttempt.score, QuizAttempt.total, QuizAttempt.created_at),
+                execution_options={"synchronize_session": False}
+            ).mappings().all()
+            move_guest_stats(session_id, user_id, moved)
+            migrated += len(moved)
+            if len(moved) < chunk_size:
+                break
+            db.session.commit()
+
+        migrated += (
+            db.session.query(ArchivedAttempt)
+            .filter(_owner_filter(ArchivedAttempt, None, session_id))
+            .update(claim, synchronize_session=False)
+        )
+        migrate_guest_stats(session_id, user_id)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return migrated
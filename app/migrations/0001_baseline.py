@@ -0,0 +1,64 @@
+"""
+Baseline quiz schema: categories, questions, choices, attempts, answers and profiles.
+
+Matches the tables the app created with db.create_all() before migrations
+existed, so databases from that era are adopted without changes.
+"""
+import sqlalchemy as sa
+
+metadata = sa.MetaData()
+
+sa.Table(
+    "categories", metadata,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("name", sa.String(50), nullable=False),
+)
+
+sa.Table(
+    "questions", metadata,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("text", sa.String(255), nullable=False),
+    sa.Column("correct_choice", sa.String(1), nullable=False),
+    sa.Column("category_id", sa.Integer, sa.ForeignKey("categories.id")),
+)
+
+sa.Table(
+    "choices", metadata,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("text", sa.String(255), nullable=False),
+    sa.Column("question_id", sa.Integer, sa.ForeignKey("questions.id")),
+)
+
+sa.Table(
+    "quiz_attempts", metadata,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("category_id", sa.Integer, sa.ForeignKey("categories.id")),
+    sa.Column("user_id", sa.Integer, nullable=True),
+    sa.Column("session_id", sa.String(255), nullable=True, index=True),
+    sa.Column("score", sa.Integer),
+    sa.Column("total", sa.Integer),
+    sa.Column("created_at", sa.DateTime),
+)
+
+sa.Table(
+    "quiz_answers", metadata,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("quiz_attempt_id", sa.Integer),
+    sa.Column("question_id", sa.Integer),
+    sa.Column("selected_choice", sa.String(1)),
+)
+
+sa.Table(
+    "user_profiles", metadata,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("user_id", sa.Integer, unique=True, nullable=False, index=True),
+    sa.Column("notifications_enabled", sa.Boolean),
+    sa.Column("default_category_id", sa.Integer, sa.ForeignKey("categories.id"), nullable=True),
+    sa.Column("created_at", sa.DateTime),
+    sa.Column("updated_at", sa.DateTime),
+)
+
+
+def upgrade(ctx):
+    for table in metadata.sorted_tables:
+        ctx.create_table(table)
@@ -0,0 +1,11 @@
+"""
+Add quiz_attempts.user_id and session_id to databases that predate them.
+
+Replaces migrate_db.py and migrate_add_session_id.py.
+"""
+
+
+def upgrade(ctx):
+    ctx.add_column("quiz_attempts", "user_id", "INTEGER")
+    ctx.add_column("quiz_attempts", "session_id", "VARCHAR(255)")
+    ctx.create_index("ix_quiz_attempts_session_id", "quiz_attempts", "session_id")
@@ -0,0 +1,31 @@
+"""
+Add choices.is_correct and fill it from each question's correct_choice letter.
+
+The letter is an index into the question's choices ordered by ID.
+Replaces backfill_answer_key.py.
+"""
+
+# Position of the correct choice among the question's choices.
+LETTER_INDEX = "CASE UPPER(q.correct_choice) " + " ".join(
+    f"WHEN '{letter}' THEN {index}" for index, letter in enumerate("ABCDEFGH")
+) + " END"
+
+
+def upgrade(ctx):
+    if not ctx.add_column("choices", "is_correct", "BOOLEAN NOT NULL DEFAULT false"):
+        # Already normalized by the application or an earlier run.
+        return
+    if ctx.dry_run:
+        ctx.note("backfill choices.is_correct", ctx.count("questions"))
+        return
+
+    ctx.backfill(
+        "choices",
+        "is_correct = true",
+        f"""is_correct = false AND (
+            SELECT COUNT(*) FROM choices earlier
+            WHERE earlier.question_id = choices.question_id AND earlier.id < choices.id
+        ) = (
+            SELECT {LETTER_INDEX} FROM questions q WHERE q.id = choices.question_id
+        )""",
+    )
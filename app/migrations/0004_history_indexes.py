@@ -0,0 +1,10 @@
+"""
+Composite (owner, created_at) indexes for keyset-paginated history pages.
+
+Replaces migrate_add_history_indexes.py.
+"""
+
+
+def upgrade(ctx):
+    ctx.create_index("ix_quiz_attempts_user_created", "quiz_attempts", ["user_id", "created_at"])
+    ctx.create_index("ix_quiz_attempts_session_created", "quiz_attempts", ["session_id", "created_at"])
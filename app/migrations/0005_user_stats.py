@@ -0,0 +1,47 @@
+"""
+Per-owner, per-category user_stats table, populated from existing attempts.
+
+Populating is one INSERT ... SELECT when the table is first created; run
+rebuild_user_stats.py to recompute it later.
+"""
+import sqlalchemy as sa
+
+metadata = sa.MetaData()
+
+sa.Table("categories", metadata, sa.Column("id", sa.Integer, primary_key=True))
+
+user_stats = sa.Table(
+    "user_stats", metadata,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("user_id", sa.Integer, nullable=True),
+    sa.Column("session_id", sa.String(255), nullable=True),
+    sa.Column("category_id", sa.Integer, sa.ForeignKey("categories.id"), nullable=False),
+    sa.Column("attempt_count", sa.Integer, nullable=False),
+    sa.Column("score_sum", sa.Integer, nullable=False),
+    sa.Column("total_sum", sa.Integer, nullable=False),
+    sa.Column("best_score", sa.Integer, nullable=False),
+    sa.Column("last_attempt_at", sa.DateTime),
+    sa.UniqueConstraint("user_id", "category_id", name="uq_user_stats_user_category"),
+    sa.UniqueConstraint("session_id", "category_id", name="uq_user_stats_session_category"),
+)
+
+OWNED = "(user_id IS NOT NULL OR session_id IS NOT NULL) AND category_id IS NOT NULL"
+
+
+def upgrade(ctx):
+    if not ctx.create_table(user_stats):
+        return
+
+    session_key = "CASE WHEN user_id IS NULL THEN session_id END"
+    ctx.execute(
+        f"""
+        INSERT INTO user_stats (user_id, session_id, category_id, attempt_count,
+                                score_sum, total_sum, best_score, last_attempt_at)
+        SELECT user_id, {session_key}, category_id, COUNT(id),
+               COALESCE(SUM(score), 0), COALESCE(SUM(total), 0), COALESCE(MAX(score), 0), MAX(created_at)
+        FROM quiz_attempts
+        WHERE {OWNED}
+        GROUP BY user_id, {session_key}, category_id
+        """,
+        rows=ctx.count("quiz_attempts", OWNED),
+    )
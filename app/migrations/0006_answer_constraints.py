@@ -0,0 +1,55 @@
+"""
+Foreign keys and indexes for quiz_answers, plus indexes on choices and questions.
+
+Answers pointing at attempts or questions that no longer exist are deleted
+first. SQLite cannot add a foreign key to an existing table, so quiz_answers
+is rebuilt there; other databases add the constraints in place.
+Replaces migrate_add_answer_indexes.py.
+"""
+import sqlalchemy as sa
+
+metadata = sa.MetaData()
+
+sa.Table("quiz_attempts", metadata, sa.Column("id", sa.Integer, primary_key=True))
+sa.Table("questions", metadata, sa.Column("id", sa.Integer, primary_key=True))
+
+quiz_answers = sa.Table(
+    "quiz_answers", metadata,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column(
+        "quiz_attempt_id", sa.Integer,
+        sa.ForeignKey("quiz_attempts.id", ondelete="CASCADE"), nullable=False
+    ),
+    sa.Column("question_id", sa.Integer, sa.ForeignKey("questions.id"), nullable=False),
+    sa.Column("selected_choice", sa.String(1)),
+)
+
+ORPHANED = (
+    "quiz_attempt_id IS NULL OR question_id IS NULL "
+    "OR NOT EXISTS (SELECT 1 FROM quiz_attempts a WHERE a.id = quiz_answers.quiz_attempt_id) "
+    "OR NOT EXISTS (SELECT 1 FROM questions q WHERE q.id = quiz_answers.question_id)"
+)
+
+
+def upgrade(ctx):
+    if not {"quiz_attempt_id", "question_id"} <= ctx.foreign_key_columns("quiz_answers"):
+        ctx.execute(f"DELETE FROM quiz_answers WHERE {ORPHANED}", rows=ctx.count("quiz_answers", ORPHANED))
+
+        if ctx.dialect == "sqlite":
+            ctx.rebuild_table(quiz_answers)
+        else:
+            ctx.execute("ALTER TABLE quiz_answers ALTER COLUMN quiz_attempt_id SET NOT NULL")
+            ctx.execute("ALTER TABLE quiz_answers ALTER COLUMN question_id SET NOT NULL")
+            ctx.execute(
+                "ALTER TABLE quiz_answers ADD CONSTRAINT fk_quiz_answers_quiz_attempt_id "
+                "FOREIGN KEY (quiz_attempt_id) REFERENCES quiz_attempts (id) ON DELETE CASCADE"
+            )
+            ctx.execute(
+                "ALTER TABLE quiz_answers ADD CONSTRAINT fk_quiz_answers_question_id "
+                "FOREIGN KEY (question_id) REFERENCES questions (id)"
+            )
+
+    ctx.create_index("ix_quiz_answers_quiz_attempt_id", "quiz_answers", "quiz_attempt_id")
+    ctx.create_index("ix_quiz_answers_question_id", "quiz_answers", "question_id")
+    ctx.create_index("ix_choices_question_id", "choices", "question_id")
+    ctx.create_index("ix_questions_category_id", "questions", "category_id")
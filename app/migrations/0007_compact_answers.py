@@ -0,0 +1,39 @@
+"""
+Store answers as the selected choice ID plus a correctness bit.
+
+Adds quiz_answers.selected_choice_id and is_correct, matches legacy choice
+text to the question's choices and clears the text. Text that matches no
+choice is kept so the result page can still show it. Replaces
+backfill_compact_answers.py; VACUUM afterwards to return the space.
+"""
+
+MATCHED_CHOICE = (
+    "(SELECT c.id FROM choices c WHERE c.question_id = quiz_answers.question_id "
+    "AND c.text = quiz_answers.selected_choice ORDER BY c.id LIMIT 1)"
+)
+LEGACY = "selected_choice_id IS NULL AND selected_choice IS NOT NULL"
+
+
+def upgrade(ctx):
+    ctx.add_column("quiz_answers", "selected_choice_id", "INTEGER REFERENCES choices (id)")
+    ctx.add_column("quiz_answers", "is_correct", "BOOLEAN NOT NULL DEFAULT false")
+
+    if ctx.dialect != "sqlite":
+        ctx.execute("ALTER TABLE quiz_answers ALTER COLUMN selected_choice TYPE VARCHAR(255)")
+
+    if ctx.dry_run:
+        # Two passes: match the choice, then set is_correct and clear the text.
+        ctx.note("backfill quiz_answers", 2 * ctx.count("quiz_answers", "selected_choice IS NOT NULL"))
+        return
+
+    ctx.backfill(
+        "quiz_answers",
+        f"selected_choice_id = {MATCHED_CHOICE}",
+        f"{LEGACY} AND EXISTS {MATCHED_CHOICE}",
+    )
+    ctx.backfill(
+        "quiz_answers",
+        "is_correct = COALESCE((SELECT c.is_correct FROM choices c "
+        "WHERE c.id = quiz_answers.selected_choice_id), false), selected_choice = NULL",
+        "selected_choice_id IS NOT NULL AND selected_choice IS NOT NULL",
+    )
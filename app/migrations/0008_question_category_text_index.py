@@ -0,0 +1,11 @@
+"""
+Replace the questions.category_id index with (category_id, text).
+
+The composite index still serves per-category lookups, and also lets the
+question pack loader find existing questions by (category, text).
+"""
+
+
+def upgrade(ctx):
+    ctx.create_index("ix_questions_category_text", "questions", ["category_id", "text"])
+    ctx.execute("DROP INDEX IF EXISTS ix_questions_category_id")
@@ -0,0 +1,67 @@
+"""
+Never reuse quiz_attempts IDs on SQLite.
+
+Without AUTOINCREMENT, SQLite hands out max(id) + 1, so archiving the newest
+attempts freed their IDs for new ones: the archived attempt became
+unreachable and cached results could be served for the wrong attempt. The
+table is rebuilt with AUTOINCREMENT, and the ID sequence is moved past every
+ID already in the archive. Other databases use sequences, which never go
+back.
+"""
+import sqlalchemy as sa
+
+metadata = sa.MetaData()
+
+sa.Table("categories", metadata, sa.Column("id", sa.Integer, primary_key=True))
+
+quiz_attempts = sa.Table(
+    "quiz_attempts", metadata,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("category_id", sa.Integer, sa.ForeignKey("categories.id")),
+    sa.Column("user_id", sa.Integer, nullable=True),
+    sa.Column("session_id", sa.String(255), nullable=True),
+    sa.Column("score", sa.Integer),
+    sa.Column("total", sa.Integer),
+    sa.Column("created_at", sa.DateTime),
+    sqlite_autoincrement=True,
+)
+
+
+def archived_max_id() -> int:
+    """Highest attempt ID in the archive bind, if the app has one yet."""
+    from flask import has_app_context
+
+    from app import db
+
+    if not has_app_context():
+        # Migrating a bare engine: there is no archive bind to look at.
+        return 0
+    engine = db.engines.get("archive")
+    if engine is None or not sa.inspect(engine).has_table("archived_attempts"):
+        return 0
+    with engine.connect() as conn:
+        return conn.exec_driver_sql("SELECT MAX(id) FROM archived_attempts").scalar() or 0
+
+
+def upgrade(ctx):
+    if ctx.dialect != "sqlite":
+        return
+
+    definition = ctx.scalar("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'quiz_attempts'")
+    # None in a dry run on a fresh database, where 0001 has not created it yet.
+    if definition is None or "AUTOINCREMENT" not in definition.upper():
+        ctx.rebuild_table(quiz_attempts)
+    ctx.create_index("ix_quiz_attempts_session_id", "quiz_attempts", "session_id")
+    ctx.create_index("ix_quiz_attempts_user_created", "quiz_attempts", ["user_id", "created_at"])
+    ctx.create_index("ix_quiz_attempts_session_created", "quiz_attempts", ["session_id", "created_at"])
+
+    reserved = archived_max_id()
+    if reserved:
+        ctx.execute(
+            "INSERT INTO sqlite_sequence (name, seq) SELECT 'quiz_attempts', 0 "
+            "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'quiz_attempts')"
+        )
+        ctx.execute(
+            "UPDATE sqlite_sequence SET seq = :reserved WHERE name = 'quiz_attempts' AND seq < :reserved",
+            reserved=reserved
+        )
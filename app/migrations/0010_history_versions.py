@@ -0,0 +1,25 @@
+"""
+Add user_stats.version and the shared cache_versions counters.
+
+History ETags are read from user_stats.version instead of counting the
+owner's attempts, and the category list version from cache_versions instead
+of a process-local counter.
+"""
+import sqlalchemy as sa
+
+metadata = sa.MetaData()
+
+cache_versions = sa.Table(
+    "cache_versions", metadata,
+    sa.Column("name", sa.String(50), primary_key=True),
+    sa.Column("version", sa.Integer, nullable=False),
+)
+
+
+def upgrade(ctx):
+    ctx.add_column("user_stats", "version", "INTEGER NOT NULL DEFAULT 1")
+    ctx.create_table(cache_versions)
+    ctx.execute(
+        "INSERT INTO cache_versions (name, version) "
+        "SELECT 'categories', 1 WHERE NOT EXISTS (SELECT 1 FROM cache_versions WHERE name = 'categories')"
+    )
@@ -0,0 +1,10 @@
+"""
+Add the shared questions version checked by every process's question pool.
+"""
+
+
+def upgrade(ctx):
+    ctx.execute(
+        "INSERT INTO cache_versions (name, version) "
+        "SELECT 'questions', 1 WHERE NOT EXISTS (SELECT 1 FROM cache_versions WHERE name = 'questions')"
+    )
@@ -0,0 +1,28 @@
+"""
+Schema migrations for the quiz service databases.
+
+NNNN_name.py files here migrate the main quiz database; archive/ holds the
+migrations for the archive bind. Run them with migrate.py as a deploy step;
+with AUTO_MIGRATE=1, create_app() applies them at startup instead.
+"""
+import os
+
+from dbmigrate import MigrationRunner
+
+from app import db
+
+MIGRATIONS_DIR = os.path.dirname(os.path.abspath(__file__))
+ARCHIVE_MIGRATIONS_DIR = os.path.join(MIGRATIONS_DIR, "archive")
+
+
+def migration_runners() -> dict:
+    """Runner per database, keyed by bind name ("default" for the main database)."""
+    return {
+        "default": MigrationRunner(db.engine, MIGRATIONS_DIR),
+        "archive": MigrationRunner(db.engines["archive"], ARCHIVE_MIGRATIONS_DIR),
+    }
+
+
+def upgrade_database(**options) -> dict:
+    """Apply pending migrations to every database. Options go to MigrationRunner.upgrade."""
+    return {name: runner.upgrade(**options) for name, runner in migration_runners().items()}
@@ -0,0 +1,26 @@
+"""
+archived_attempts table for the archive database.
+"""
+import sqlalchemy as sa
+
+metadata = sa.MetaData()
+
+archived_attempts = sa.Table(
+    "archived_attempts", metadata,
+    sa.Column("id", sa.Integer, primary_key=True, autoincrement=False),
+    sa.Column("category_id", sa.Integer),
+    sa.Column("category_name", sa.String(50)),
+    sa.Column("user_id", sa.Integer, nullable=True),
+    sa.Column("session_id", sa.String(255), nullable=True),
+    sa.Column("score", sa.Integer),
+    sa.Column("total", sa.Integer),
+    sa.Column("created_at", sa.DateTime),
+    sa.Column("archived_at", sa.DateTime),
+    sa.Column("payload", sa.LargeBinary, nullable=False),
+    sa.Index("ix_archived_attempts_user_created", "user_id", "created_at"),
+    sa.Index("ix_archived_attempts_session_created", "session_id", "created_at"),
+)
+
+
+def upgrade(ctx):
+    ctx.create_table(archived_attempts)
@@ -0,0 +1,10 @@
+"""
+Index archived_attempts.created_at for the archive horizon.
+
+History reads the newest archived created_at on every request, so it has to
+be an index lookup rather than a scan of the archive.
+"""
+
+
+def upgrade(ctx):
+    ctx.create_index("ix_archived_attempts_created", "archived_attempts", "created_at")
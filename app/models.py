@@ -17,11 +17,18 @@ class Question(db.Model):
 
     choices = db.relationship("Choice", backref="question")
 
+    __table_args__ = (
+        # Serves per-category lookups and the (category, text) key used by question packs.
+        db.Index("ix_questions_category_text", "category_id", "text"),
+    )
+
 class Choice(db.Model):
     __tablename__ = "choices"
     id = db.Column(db.Integer, primary_key=True)
     text = db.Column(db.String(255), nullable=False)
-    question_id = db.Column(db.Integer, db.ForeignKey("questions.id"))
+    question_id = db.Column(db.Integer, db.ForeignKey("questions.id"), index=True)
+    # Normalized answer key; Question.correct_choice is the authoring letter.
+    is_correct = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
 
 
 class QuizAttempt(db.Model):
@@ -37,15 +44,124 @@ class QuizAttempt(db.Model):
 
     category = db.relationship("Category")
 
+    __table_args__ = (
+        # Keyset pagination of history pages per owner.
+        db.Index("ix_quiz_attempts_user_created", "user_id", "created_at"),
+        db.Index("ix_quiz_attempts_session_created", "session_id", "created_at"),
+        # IDs freed by archiving must never be handed out again (migration 0009).
+        {"sqlite_autoincrement": True},
+    )
+
 
 
 class QuizAnswer(db.Model):
     __tablename__ = "quiz_answers"
 
     id = db.Column(db.Integer, primary_key=True)
-    quiz_attempt_id = db.Column(db.Integer)
-    question_id = db.Column(db.Integer)
-    selected_choice = db.Column(db.String(1))
+    quiz_attempt_id = db.Column(
+        db.Integer, db.ForeignKey("quiz_attempts.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    question_id = db.Column(db.Integer, db.ForeignKey("questions.id"), nullable=False, index=True)
+    selected_choice_id = db.Column(db.Integer, db.ForeignKey("choices.id"), nullable=True)
+    is_correct = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+    # Legacy copy of the selected choice text. New answers leave it NULL;
+    # migration 0007 clears it once selected_choice_id is set.
+    selected_choice = db.Column(db.String(255), nullable=True)
+
+
+class ArchivedAttempt(db.Model):
+    """
+    Cold copy of a submitted attempt, stored in the archive database.
+    Keeps the original attempt ID and card fields as columns; the question
+    review rows are stored as zlib-compressed JSON so an archived attempt is a
+    single row with no joins.
+    """
+    __bind_key__ = "archive"
+    __tablename__ = "archived_attempts"
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    category_id = db.Column(db.Integer)
+    category_name = db.Column(db.String(50))
+    user_id = db.Column(db.Integer, nullable=True)
+    session_id = db.Column(db.String(255), nullable=True)
+    score = db.Column(db.Integer)
+    total = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    payload = db.Column(db.LargeBinary, nullable=False)
+
+    __table_args__ = (
+        db.Index("ix_archived_attempts_user_created", "user_id", "created_at"),
+        db.Index("ix_archived_attempts_session_created", "session_id", "created_at"),
+        # Serves the archive horizon (newest archived created_at).
+        db.Index("ix_archived_attempts_created", "created_at"),
+    )
+
+    @property
+    def category(self):
+        """Category stand-in so templates can render archived and hot attempts alike."""
+        return ArchivedCategory(self.category_id, self.category_name)
+
+
+class ArchivedCategory:
+    def __init__(self, id, name):
+        self.id = id
+        self.name = name or ""
+
+
+class UserStats(db.Model):
+    """
+    Per-owner, per-category attempt aggregates.
+    The owner is either a user_id or, for guests, a session_id. Rows are kept
+    up to date in the same transaction that records each attempt.
+    """
+    __tablename__ = "user_stats"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=True)
+    session_id = db.Column(db.String(255), nullable=True)
+    category_id = db.Column(db.Integer, db.ForeignKey("categories.id"), nullable=False)
+    attempt_count = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.Integer, nullable=False, default=0)
+    total_sum = db.Column(db.Integer, nullable=False, default=0)
+    best_score = db.Column(db.Integer, nullable=False, default=0)
+    last_attempt_at = db.Column(db.DateTime)
+    # Incremented by every write to the row; the sum over an owner's rows
+    # versions their history (see history_version).
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+
+    category = db.relationship("Category")
+
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "category_id", name="uq_user_stats_user_category"),
+        db.UniqueConstraint("session_id", "category_id", name="uq_user_stats_session_category"),
+    )
+
+    def to_dict(self):
+        return {
+            'category_id': self.category_id,
+            'category_name': self.category.name if self.category else None,
+            'attempt_count': self.attempt_count,
+            'score_sum': self.score_sum,
+            'total_sum': self.total_sum,
+            'best_score': self.best_score,
+            'average_score': round(self.score_sum / self.attempt_count, 2) if self.attempt_count else 0,
+            'average_percentage': round(self.score_sum / self.total_sum * 100, 1) if self.total_sum else 0,
+            'last_attempt_at': self.last_attempt_at.isoformat() if self.last_attempt_at else None
+        }
+
+
+class CacheVersion(db.Model):
+    """
+    Named version counters shared by every process.
+
+    Bumped in the same transaction as the change they cover, so a
+    process-local cache can tell whether another process changed its data.
+    """
+    __tablename__ = "cache_versions"
+
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
 
 
 class UserProfile(db.Model):
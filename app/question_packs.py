@@ -0,0 +1,322 @@
+"""
+Bulk loading of question packs.
+
+A pack is a stream of questions, each with a category name, question text,
+choices in display order and the correct choice's letter:
+
+    {"category": "Math", "text": "What is 18 ÷ 3?", "choices": ["4", "5", "6", "9"], "correct": "C"}
+
+Packs are read as a JSON array, JSON Lines (one object per line) or CSV with
+category, text, correct and choice_a, choice_b, ... columns. Files are streamed,
+so a 100k-question bank never has to fit in memory.
+
+Questions are upserted on (category, text): new ones are inserted, existing
+ones get their correct answer and choice texts updated in place, so attempts
+and answers that reference them are kept. Each chunk is written with
+executemany statements in its own transaction.
+"""
+import csv
+import json
+import logging
+import time
+
+from sqlalchemy import bindparam
+
+from app import db
+from app.models import Category, Choice, Question
+from app.quiz.services import (
+    attempt_results, bump_cache_version, category_cache, insert_returning_ids, letter_to_index, question_bundles,
+    question_pool, CATEGORIES_VERSION, IN_CLAUSE_CHUNK, QUESTIONS_VERSION
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 2000
+MAX_ERRORS_REPORTED = 20
+READ_SIZE = 1 << 16
+
+
+def _iter_json_array(fh):
+    """Yield the elements of a top-level JSON array without reading it all."""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    started = False
+    eof = False
+
+    while True:
+        buffer = buffer.lstrip()
+        if not started and buffer:
+            if buffer[0] != "[":
+                raise ValueError("expected a JSON array")
+            buffer = buffer[1:]
+            started = True
+            continue
+        if started and buffer.startswith("]"):
+            return
+        if started and buffer.startswith(","):
+            buffer = buffer[1:]
+            continue
+
+        if buffer and started:
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                yield item
+                buffer = buffer[end:]
+                continue
+
+        if eof:
+            raise ValueError("unexpected end of JSON array")
+        chunk = fh.read(READ_SIZE)
+        eof = not chunk
+        buffer += chunk
+
+
+def _iter_json_lines(fh):
+    for line in fh:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def _iter_csv(fh):
+    for row in csv.DictReader(fh):
+        choice_columns = sorted(k for k in row if k and k.startswith("choice_"))
+        yield {
+            "category": row.get("category"),
+            "text": row.get("text"),
+            "correct": row.get("correct"),
+            "choices": [row[k] for k in choice_columns if row[k]],
+        }
+
+
+def iter_pack(path: str):
+    """Yield raw question records from a .json, .jsonl/.ndjson or .csv pack."""
+    with open(path, newline="" if path.endswith(".csv") else None, encoding="utf-8-sig") as fh:
+        if path.endswith(".csv"):
+            yield from _iter_csv(fh)
+        elif path.endswith((".jsonl", ".ndjson")):
+            yield from _iter_json_lines(fh)
+        else:
+            yield from _iter_json_array(fh)
+
+
+def parse_question(record) -> dict:
+    """Normalize one pack record, raising ValueError if it is unusable."""
+    if not isinstance(record, dict):
+        raise ValueError("question must be an object")
+
+    category = (record.get("category") or "").strip()
+    text = (record.get("text") or "").strip()
+    choices = record.get("choices")
+    correct = (record.get("correct") or "").strip().upper()
+
+    if not category or len(category) > Category.__table__.c.name.type.length:
+        raise ValueError("category must be 1-50 characters")
+    if not text or len(text) > Question.__table__.c.text.type.length:
+        raise ValueError("text must be 1-255 characters")
+    if not isinstance(choices, list) or len(choices) < 2:
+        raise ValueError("choices must be a list of at least two strings")
+    choices = [str(c).strip() for c in choices]
+    if any(not c or len(c) > Choice.__table__.c.text.type.length for c in choices):
+        raise ValueError("each choice must be 1-255 characters")
+    if len(correct) != 1 or not 0 <= letter_to_index(correct) < len(choices):
+        raise ValueError(f"correct must be a letter between A and {chr(ord('A') + len(choices) - 1)}")
+
+    return {"category": category, "text": text, "choices": choices, "correct": correct}
+
+
+def _category_ids(names, known: dict, touched: dict) -> dict:
+    missing = [name for name in names if name not in known]
+    if missing:
+        existing = dict(
+            db.session.query(Category.name, Category.id).filter(Category.name.in_(missing)).all()
+        )
+        known.update(existing)
+        new = [name for name in missing if name not in existing]
+        if new:
+            ids = insert_returning_ids(Category.__table__, [{"name": name} for name in new])
+            known.update(zip(new, ids))
+            bump_cache_version(CATEGORIES_VERSION)
+            touched["category_list"] = True
+    return known
+
+
+def _existing_questions(keys) -> dict:
+    """{(category_id, text): question_id} for the keys that already exist."""
+    texts_by_category = {}
+    for category_id, text in keys:
+        texts_by_category.setdefault(category_id, []).append(text)
+
+    found = {}
+    for category_id, texts in texts_by_category.items():
+        for start in range(0, len(texts), IN_CLAUSE_CHUNK):
+            rows = (
+                db.session.query(Question.text, Question.id)
+                .filter(
+                    Question.category_id == category_id,
+                    Question.text.in_(texts[start:start + IN_CLAUSE_CHUNK])
+                )
+                .all()
+            )
+            for text, question_id in rows:
+                key = (category_id, text)
+                # Keep the oldest question if the bank already has duplicates.
+                found[key] = min(question_id, found.get(key, question_id))
+    return found
+
+
+def _write_chunk(questions: list, categories: dict, report: dict, touched: dict):
+    # Categories are created in order of first appearance.
+    _category_ids(list(dict.fromkeys(q["category"] for q in questions)), categories, touched)
+
+    # The last occurrence of a question within a chunk wins.
+    by_key = {}
+    for question in questions:
+        by_key[(categories[question["category"]], question["text"])] = question
+    existing = _existing_questions(by_key)
+
+    new_keys = [key for key in by_key if key not in existing]
+    new_ids = insert_returning_ids(Question.__table__, [
+        {"text": text, "correct_choice": by_key[(category_id, text)]["correct"], "category_id": category_id}
+        for category_id, text in new_keys
+    ]) if new_keys else []
+
+    choice_rows = []
+    for (category_id, text), question_id in zip(new_keys, new_ids):
+        question = by_key[(category_id, text)]
+        correct_index = letter_to_index(question["correct"])
+        choice_rows.extend(
+            {"text": choice, "question_id": question_id, "is_correct": position == correct_index}
+            for position, choice in enumerate(question["choices"])
+        )
+        touched["categories"].add(category_id)
+    if choice_rows:
+        db.session.execute(Choice.__table__.insert(), choice_rows)
+
+    updated_ids = list(existing.values())
+    current_choices = {}
+    for start in range(0, len(updated_ids), IN_CLAUSE_CHUNK):
+        for choice_id, question_id in (
+            db.session.query(Choice.id, Choice.question_id)
+            .filter(Choice.question_id.in_(updated_ids[start:start + IN_CLAUSE_CHUNK]))
+            .order_by(Choice.question_id, Choice.id)
+        ):
+            current_choices.setdefault(question_id, []).append(choice_id)
+
+    question_updates = []
+    choice_updates = []
+    for key, question_id in existing.items():
+        question = by_key[key]
+        choice_ids = current_choices.get(question_id, [])
+        if len(choice_ids) != len(question["choices"]):
+            # Adding or removing choices would orphan recorded answers.
+            report["conflicts"] += 1
+            continue
+        correct_index = letter_to_index(question["correct"])
+        question_updates.append({"b_id": question_id, "b_correct": question["correct"]})
+        choice_updates.extend(
+            {"b_id": choice_id, "b_text": choice, "b_is_correct": position == correct_index}
+            for position, (choice_id, choice) in enumerate(zip(choice_ids, question["choices"]))
+        )
+        touched["questions"].add(question_id)
+
+    questions_table = Question.__table__
+    choices_table = Choice.__table__
+    if question_updates:
+        db.session.execute(
+            questions_table.update()
+            .where(questions_table.c.id == bindparam("b_id"))
+            .values(correct_choice=bindparam("b_correct")),
+            question_updates,
+        )
+    if choice_updates:
+        db.session.execute(
+            choices_table.update()
+            .where(choices_table.c.id == bindparam("b_id"))
+            .values(text=bindparam("b_text"), is_correct=bindparam("b_is_correct")),
+            choice_updates,
+        )
+    if new_keys or question_updates:
+        # Tells the pools, bundles and review rows of every process to reload.
+        bump_cache_version(QUESTIONS_VERSION)
+
+    report["inserted"] += len(new_ids)
+    report["updated"] += len(question_updates)
+    report["rows"] += len(new_ids) + len(choice_rows) + len(question_updates) + len(choice_updates)
+
+
+def _invalidate_caches(touched: dict):
+    """Core writes bypass the ORM session events that keep the caches coherent."""
+    if touched["category_list"]:
+        category_cache.invalidate()
+    for category_id in touched["categories"]:
+        question_pool.invalidate(category_id)
+    for question_id in touched["questions"]:
+        question_bundles.evict(question_id)
+    if touched["questions"]:
+        attempt_results.clear()
+
+
+def _update_rate(report: dict, started: float):
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    report["rows_per_second"] = round(report["rows"] / report["seconds"]) if report["seconds"] else 0
+
+
+def load_questions(records, chunk_size: int = DEFAULT_CHUNK_SIZE, progress=None) -> dict:
+    """
+    Upsert an iterable of pack records, chunk_size questions per transaction.
+
+    Invalid records are skipped and reported. progress, if given, is called
+    with the running report after each chunk. Returns the report: questions
+    inserted, updated and skipped, rows written and rows per second.
+    """
+    report = {"inserted": 0, "updated": 0, "invalid": 0, "conflicts": 0, "rows": 0, "errors": []}
+    touched = {"categories": set(), "questions": set(), "category_list": False}
+    categories = {}
+    started = time.perf_counter()
+
+    def flush(chunk):
+        try:
+            _write_chunk(chunk, categories, report, touched)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            _invalidate_caches(touched)
+            raise
+        _update_rate(report, started)
+        if progress:
+            progress(report)
+
+    chunk = []
+    for index, record in enumerate(records):
+        try:
+            chunk.append(parse_question(record))
+        except ValueError as e:
+            report["invalid"] += 1
+            if len(report["errors"]) < MAX_ERRORS_REPORTED:
+                report["errors"].append({"index": index, "error": str(e)})
+            continue
+        if len(chunk) >= chunk_size:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+
+    _update_rate(report, started)
+    _invalidate_caches(touched)
+    logger.info(
+        f"Loaded questions: {report['inserted']} inserted, {report['updated']} updated, "
+        f"{report['rows_per_second']} rows/s"
+    )
+    return report
+
+
+def load_pack(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE, progress=None) -> dict:
+    """Stream a pack file into the database. See load_questions."""
+    report = load_questions(iter_pack(path), chunk_size=chunk_size, progress=progress)
+    report["pack"] = path
+    return report
@@ -1,47 +1,61 @@
 from flask import Blueprint, render_template, session, redirect, url_for, request, flash
-from datetime import datetime
-from app import db
-from app.models import QuizAttempt, QuizAnswer, Category, Choice
+from app.models import QuizAttempt
 import random
-from app.models import Question
-from sqlalchemy.sql import func
+from app.quiz.services import (
+    cache_version, category_cache, question_pool, question_bundles, record_attempt,
+    get_attempt_results, QUESTIONS_PER_QUIZ, QUESTIONS_VERSION
+)
+from app.http_cache import conditional, page_etag
+from dbprofile import read_only
+from app.quiz.state import get_quiz_state_store
+from app.archive import get_archived_attempt, get_archived_results
+from sqlalchemy.orm import joinedload
 import uuid
 
 
 quiz_bp=Blueprint('quiz',__name__)
+
+
+def load_active_quiz():
+    """Return (state_id, state) for the quiz referenced by the session cookie."""
+    state_id = session.get("quiz_state_id")
+    if not state_id:
+        return None, None
+    return state_id, get_quiz_state_store().load(state_id)
+
+
+def discard_active_quiz():
+    """Drop the active quiz from the state store and the session cookie."""
+    state_id = session.pop("quiz_state_id", None)
+    if state_id:
+        get_quiz_state_store().delete(state_id)
+
+
 @quiz_bp.route("/start", methods=["POST"])
 def start_quiz():
     #  Enforce single active quiz by resetting any previous one
-    session.pop("question_ids", None)
-    session.pop("answers", None)
-    session.pop("category_id", None)
+    discard_active_quiz()
 
     category_id = request.form.get("category_id")
     if not category_id:
         flash("Please select a category.")
         return redirect(url_for("main.home"))
 
-    category = Category.query.get(int(category_id))
+    category = category_cache.get(int(category_id))
     if not category:
         flash("Invalid category.")
         return redirect(url_for("main.home"))
 
-    session["category_id"] = category.id
+    question_ids = question_pool.sample(category.id, QUESTIONS_PER_QUIZ)
 
-    questions = (
-        Question.query
-        .filter_by(category_id=category.id)
-        .order_by(func.random())
-        .limit(5)
-        .all()
-    )
-
-    if len(questions) < 5:
+    if len(question_ids) < QUESTIONS_PER_QUIZ:
         flash("Not enough questions in this category.")
         return redirect(url_for("main.home"))
 
-    session["question_ids"] = [q.id for q in questions]
-    session["answers"] = {}
+    # Warm the bundle cache so paging through the quiz needs no queries.
+    question_bundles.get_many(question_ids)
+
+    session["quiz_state_id"] = get_quiz_state_store().create(category.id, question_ids)
 
     return redirect(url_for("quiz.question", index=1))
 
@@ -49,36 +63,38 @@ def start_quiz():
 
 @quiz_bp.route("/question/<int:index>", methods=["GET", "POST"])
 def question(index):
-    # print("SESSION AFTER POST:", session.get("answers"))
-    question_ids = session.get("question_ids")
-    if not question_ids:
+    state_id, state = load_active_quiz()
+    if not state:
         flash("No active quiz.")
         return redirect(url_for("main.home"))
 
+    question_ids = state["question_ids"]
     total = len(question_ids)
     if index < 1 or index > total:
         flash("Invalid question.")
         return redirect(url_for("main.home"))
 
     question_id = question_ids[index - 1]
-    question = Question.query.get(question_id)
+    question = question_bundles.get(question_id)
+    if question is None:
+        flash("Invalid question.")
+        return redirect(url_for("main.home"))
 
-    
-    choice_order_key = f"choice_order_{question_id}"
+    choice_order = state["choice_orders"].get(str(question_id))
 
-    if choice_order_key not in session:
+    if choice_order is None:
         choices = list(question.choices)
         random.shuffle(choices)
-        session[choice_order_key] = [c.id for c in choices]
-        session.modified = True
-    else:
-        choices = (
-            Choice.query
-            .filter(Choice.id.in_(session[choice_order_key]))
-            .all()
+        choice_order = get_quiz_state_store().set_choice_order(
+            state_id, question_id, [c.id for c in choices]
         )
-        # preserve order
-        choices.sort(key=lambda c: session[choice_order_key].index(c.id))
+
+    # preserve order
+    position = {choice_id: i for i, choice_id in enumerate(choice_order)}
+    choices = sorted(
+        (c for c in question.choices if c.id in position),
+        key=lambda c: position[c.id]
+    )
 
 
     if request.method == "POST":
@@ -88,38 +104,35 @@ def question(index):
             return redirect(url_for("quiz.question", index=index))
 
         #  store choice_id as INT
-        session["answers"][str(question_id)] = int(answer)
-        session.modified = True
+        if not get_quiz_state_store().set_answer(state_id, question_id, int(answer)):
+            session.pop("quiz_state_id", None)
+            flash("Your quiz has expired. Please start again.")
+            return redirect(url_for("main.home"))
 
         if index < total:
             return redirect(url_for("quiz.question", index=index + 1))
         else:
             return redirect(url_for("quiz.submit"))
-        
-    print("SESSION CONTENT:", dict(session))
-    print("ANSWERS:", session.get("answers"))
-    print("CURRENT QUESTION ID:", question_id)
-    print("----------")
-    print("EXPECTING ANSWER FOR:", question_id)
-    print("FOUND:", session["answers"].get(str(question_id)))
-
 
     return render_template(
         "quiz_question.html",
         question=question,
         choices=choices,
+        selected_choice_id=state["answers"].get(str(question_id)),
         index=index,
         total=total
     )
 
 
-def letter_to_index(letter: str) -> int:
-    return ord(letter.upper()) - ord("A")
-
 @quiz_bp.route("/submit", methods=["POST"])
 def submit():
-    answers = session.get("answers", {})
-    question_ids = session.get("question_ids", [])
+    state_id, state = load_active_quiz()
+    if not state:
+        flash("No active quiz.")
+        return redirect(url_for("main.home"))
+
+    answers = state["answers"]
+    question_ids = state["question_ids"]
     total = len(question_ids)
 
     # SAVE LAST QUESTION ANSWER FIRST (THIS FIXES THE BUG)
@@ -128,8 +141,7 @@ def submit():
 
     if last_qid and last_answer:
         answers[str(last_qid)] = int(last_answer)
-        session["answers"] = answers
-        session.modified = True
+        get_quiz_state_store().set_answer(state_id, last_qid, int(last_answer))
 
 
     # NOW validation works
@@ -171,66 +183,16 @@ def submit():
             session['anonymous_session_id'] = str(uuid.uuid4())
         session_id = session.get('anonymous_session_id')
     
-    quiz = QuizAttempt(
-        category_id=session["category_id"],
+    quiz = record_attempt(
+        category_id=state["category_id"],
         user_id=user_id,
         session_id=session_id,
-        score=0,
-        total=total
+        question_ids=question_ids,
+        answers=answers
     )
-    db.session.add(quiz)
-    db.session.commit()
-
-    score = 0
-
-    for q_id in question_ids:
-        selected_choice_id = answers.get(str(q_id))
-        question = Question.query.get(q_id)
-
-        if not selected_choice_id or not question:
-            continue
-
-        selected_choice = Choice.query.get(selected_choice_id)
-
-        ordered_choices = (
-            Choice.query
-            .filter_by(question_id=q_id)
-            .order_by(Choice.id)
-            .all()
-        )
-
-        correct_index = letter_to_index(question.correct_choice)
-        correct_text = (
-            ordered_choices[correct_index].text
-            if 0 <= correct_index < len(ordered_choices)
-            else None
-        )
-
-        selected_text = selected_choice.text if selected_choice else None
-
-        if selected_text and selected_text == correct_text:
-            score += 1
-
-        db.session.add(
-            QuizAnswer(
-                quiz_attempt_id=quiz.id,
-                question_id=q_id,
-                selected_choice=selected_text
-            )
-        )
-
-    quiz.score = score
-    db.session.commit()
-
-   # clear quiz state
-    for key in list(session.keys()):
-        if key.startswith("choice_order_"):
-            session.pop(key)
-
-    session.pop("category_id", None)
-    session.pop("question_ids", None)
-    session.pop("answers", None)
 
+    # clear quiz state
+    discard_active_quiz()
 
     return redirect(url_for("quiz.detail", quiz_id=quiz.id))
 
@@ -243,10 +205,10 @@ def submit():
 @quiz_bp.route("/result")
 def result():
     return render_template("quiz_result.html")
-def letter_to_index(letter: str) -> int:
-    return ord(letter.upper()) - ord("A")
+
 
 @quiz_bp.route("/detail/<int:quiz_id>")
+@read_only
 def detail(quiz_id):
     """
     Display quiz detail with strict permission checks:
@@ -266,7 +228,16 @@ def detail(quiz_id):
     user_id = get_user_id_from_header()
     session_id = session.get('anonymous_session_id')
     
-    quiz = QuizAttempt.query.get(quiz_id)
+    quiz = (
+        QuizAttempt.query
+        .options(joinedload(QuizAttempt.category))
+        .filter(QuizAttempt.id == quiz_id)
+        .first()
+    )
+    archived = False
+    if not quiz:
+        quiz = get_archived_attempt(quiz_id)
+        archived = quiz is not None
     if not quiz:
         flash("Quiz not found.")
         return redirect(url_for("main.history"))
@@ -283,33 +254,18 @@ def detail(quiz_id):
             flash("You don't have permission to view this quiz.")
             return redirect(url_for("main.history"))
 
-    rows = (
-        db.session.query(QuizAnswer, Question)
-        .join(Question, QuizAnswer.question_id == Question.id)
-        .filter(QuizAnswer.quiz_attempt_id == quiz.id)
-        .all()
+    def build():
+        results = get_archived_results(quiz) if archived else get_attempt_results(quiz)
+        return render_template("quiz_detail.html", quiz=quiz, results=results)
+
+    # Submitted attempts never change; their review rows only do when questions
+    # are edited, which bumps the shared questions version.
+    return conditional(
+        page_etag(
+            "detail", quiz.id, quiz.created_at.isoformat(), cache_version(QUESTIONS_VERSION), category_cache.version()
+        ),
+        build
     )
 
-    results = []
-    for ans, question in rows:
-        choices = (
-            Choice.query
-            .filter_by(question_id=question.id)
-            .order_by(Choice.id)
-            .all()
-        )
-
-        correct_idx = letter_to_index(question.correct_choice)
-        correct_text = choices[correct_idx].text if 0 <= correct_idx < len(choices) else "N/A"
-
-        results.append({
-            "question_text": question.text,
-            "selected_text": ans.selected_choice,
-            "correct_text": correct_text,
-            "is_correct": ans.selected_choice == correct_text
-        })
-
-    return render_template("quiz_detail.html", quiz=quiz, results=results)
-
 
 
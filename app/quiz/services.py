@@ -1,3 +1,701 @@
+"""
+Quiz domain services.
+
+Hot-path helpers used by the quiz routes. Anything cached here is process-local
+and kept coherent with the database through SQLAlchemy session events. Caches
+that must also notice changes made by other processes compare against a
+shared counter in cache_versions, bumped in the transaction that made them.
+"""
+import logging
+import os
+import random
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timezone
+
+from sqlalchemy import and_, event, insert, inspect, select, update
+from sqlalchemy.orm import Session, aliased
+
+from app import db
+from app.models import CacheVersion, Category, Choice, Question, QuizAnswer, QuizAttempt
+from app.stats import record_attempt_stats
+
+logger = logging.getLogger(__name__)
+
+QUESTIONS_PER_QUIZ = 5
+IN_CLAUSE_CHUNK = 500
+CATEGORIES_VERSION = "categories"
+QUESTIONS_VERSION = "questions"
+
+
+def cache_version(name: str) -> int:
+    """Current value of a shared cache version (0 if it was never bumped)."""
+    return db.session.scalar(select(CacheVersion.version).where(CacheVersion.name == name)) or 0
+
+
+def bump_cache_version(name: str, session=None):
+    """Increment a shared cache version inside the caller's transaction."""
+    session = session or db.session
+    bumped = session.execute(
+        update(CacheVersion).where(CacheVersion.name == name).values(version=CacheVersion.version + 1),
+        execution_options={"synchronize_session": False}
+    ).rowcount
+    if not bumped:
+        session.execute(insert(CacheVersion).values(name=name, version=1))
+
+
+class QuestionPool:
+    """
+    Process-level pool of question IDs per category.
+
+    Each category's IDs are loaded once with a single indexed column query and
+    kept in memory, so starting a quiz samples k IDs in O(k) instead of running
+    ORDER BY random() over the whole category. Every commit that writes a
+    question or choice bumps the shared "questions" cache version (bulk Core
+    writes must bump it themselves), and entries loaded under an older
+    version are reloaded, whichever process made the change. Checking costs
+    one primary key lookup per quiz start.
+    """
+
+    def __init__(self):
+        # category_id -> (questions version, question IDs)
+        self._ids = {}
+        self._lock = threading.Lock()
+
+    def get(self, category_id: int) -> tuple:
+        """Return the cached question IDs for a category, loading them if needed."""
+        version = cache_version(QUESTIONS_VERSION)
+        cached = self._ids.get(category_id)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        # Loaded after reading the version: a change committed in between
+        # only makes the next call load again.
+        rows = (
+            db.session.query(Question.id)
+            .filter(Question.category_id == category_id)
+            .all()
+        )
+        ids = tuple(row[0] for row in rows)
+        with self._lock:
+            self._ids[category_id] = (version, ids)
+        return ids
+
+    def sample(self, category_id: int, k: int = QUESTIONS_PER_QUIZ) -> list:
+        """
+        Pick k distinct question IDs at random from a category.
+
+        Returns fewer than k IDs only when the category is too small.
+        """
+        ids = self.get(category_id)
+        if len(ids) <= k:
+            return list(ids)
+        return random.sample(ids, k)
+
+    def invalidate(self, category_id=None):
+        """Drop one category from the pool, or every category when None."""
+        with self._lock:
+            if category_id is None:
+                self._ids.clear()
+            else:
+                self._ids.pop(category_id, None)
+
+
+question_pool = QuestionPool()
+
+
+CategoryView = namedtuple("CategoryView", ["id", "name"])
+
+
+class CategoryCache:
+    """
+    Process-level copy of the category list, in ID order.
+
+    The home page and quiz start read categories on every request but they
+    change only when a pack is loaded. Every commit that touches a category
+    bumps the shared "categories" cache version, so a read costs one primary
+    key lookup of that counter, and the list is reloaded with one query once
+    any process has changed it. version() is part of the page ETags that
+    show category names.
+    """
+
+    def __init__(self):
+        # (version, categories, categories by ID), replaced as a whole.
+        self._loaded = None
+
+    def version(self) -> int:
+        return cache_version(CATEGORIES_VERSION)
+
+    def _load(self) -> tuple:
+        version = self.version()
+        loaded = self._loaded
+        if loaded is not None and loaded[0] == version:
+            return loaded
+
+        # Read after the version: a change committed in between only makes
+        # the next read reload again.
+        rows = db.session.query(Category.id, Category.name).order_by(Category.id).all()
+        categories = tuple(CategoryView(category_id, name) for category_id, name in rows)
+        loaded = self._loaded = (version, categories, {category.id: category for category in categories})
+        return loaded
+
+    def all(self) -> tuple:
+        """Return every category as CategoryView tuples, reloading them if they changed."""
+        return self._load()[1]
+
+    def get(self, category_id: int):
+        """Return one category's CategoryView, or None if it does not exist."""
+        return self._load()[2].get(category_id)
+
+    def invalidate(self):
+        """Drop this process's copy."""
+        self._loaded = None
+
+
+category_cache = CategoryCache()
+
+
+ChoiceView = namedtuple("ChoiceView", ["id", "text"])
+QuestionBundle = namedtuple("QuestionBundle", ["id", "text", "choices"])
+
+
+class LRUCache:
+    """
+    Small thread-safe LRU mapping with a fixed number of entries.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class QuestionBundleCache:
+    """
+    Bounded LRU of immutable question bundles keyed by question ID.
+
+    A bundle holds the question text and its choices (ID order) as tuples, so
+    rendering a quiz page needs no ORM objects. Bundles are evicted once a
+    commit in this process touches the question or any of its choices, and
+    bundles loaded under an older "questions" cache version are reloaded, so
+    edits made by other processes are seen too.
+    """
+
+    def __init__(self, maxsize: int = 2048):
+        # question_id -> (questions version, bundle)
+        self._bundles = LRUCache(maxsize)
+
+    def get(self, question_id: int):
+        """Return the bundle for one question, or None if it does not exist."""
+        return self.get_many([question_id]).get(question_id)
+
+    def get_many(self, question_ids) -> dict:
+        """Return {question_id: bundle}, loading every missing bundle with one query."""
+        version = cache_version(QUESTIONS_VERSION)
+        found = {}
+        missing = []
+        for question_id in question_ids:
+            cached = self._bundles.get(question_id)
+            if cached is not None and cached[0] == version:
+                found[question_id] = cached[1]
+            else:
+                missing.append(question_id)
+
+        if missing:
+            # Loaded after reading the version, like QuestionPool.get.
+            loaded = self._load(missing)
+            for question_id, bundle in loaded.items():
+                self._bundles.put(question_id, (version, bundle))
+            found.update(loaded)
+        return found
+
+    def _load(self, question_ids) -> dict:
+        rows = (
+            db.session.query(Question.id, Question.text, Choice.id, Choice.text)
+            .outerjoin(Choice, Choice.question_id == Question.id)
+            .filter(Question.id.in_(question_ids))
+            .order_by(Question.id, Choice.id)
+            .all()
+        )
+
+        texts = {}
+        choices = {}
+        for question_id, question_text, choice_id, choice_text in rows:
+            texts[question_id] = question_text
+            if choice_id is not None:
+                choices.setdefault(question_id, []).append(ChoiceView(choice_id, choice_text))
+
+        return {
+            question_id: QuestionBundle(question_id, text, tuple(choices.get(question_id, ())))
+            for question_id, text in texts.items()
+        }
+
+    def evict(self, question_id=None):
+        """Drop one bundle, or every bundle when None."""
+        if question_id is None:
+            self._bundles.clear()
+        else:
+            self._bundles.pop(question_id)
+
+
+question_bundles = QuestionBundleCache(
+    maxsize=int(os.environ.get("QUESTION_BUNDLE_CACHE_SIZE", 2048))
+)
+
+# Submitted attempts never change, so their review rows are cached per attempt
+# (see results_key) as (questions version, rows); see cached_results. Callers
+# must still run their permission checks before reading from it.
+attempt_results = LRUCache(maxsize=int(os.environ.get("ATTEMPT_RESULTS_CACHE_SIZE", 4096)))
+
+
+def results_key(attempt) -> tuple:
+    """
+    attempt_results key for a hot or archived attempt.
+
+    The owner and created_at are part of it so an entry can never be served
+    for a different attempt that ended up with the same ID.
+    """
+    return attempt.id, attempt.user_id, attempt.session_id, attempt.created_at
+
+
+def cached_results(key, build) -> tuple:
+    """
+    Return the review rows cached under key, calling build() to make them.
+
+    Rows embed question and choice text, so rows cached under an older
+    "questions" cache version are rebuilt, whichever process edited them.
+    """
+    version = cache_version(QUESTIONS_VERSION)
+    cached = attempt_results.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    results = build()
+    attempt_results.put(key, (version, results))
+    return results
+
+
+def build_attempt_results(attempt_ids) -> dict:
+    """
+    Build review rows for several attempts with one joined query.
+
+    Returns {attempt_id: tuple of row dicts}; attempts without answers map to
+    an empty tuple. Nothing is cached here.
+    """
+    attempt_ids = list(attempt_ids)
+    correct_choice = aliased(Choice)
+    selected_choice = aliased(Choice)
+    rows = (
+        db.session.query(
+            QuizAnswer.quiz_attempt_id, QuizAnswer.selected_choice_id, QuizAnswer.is_correct,
+            QuizAnswer.selected_choice, selected_choice.text, Question.text, correct_choice.text
+        )
+        .join(Question, QuizAnswer.question_id == Question.id)
+        .outerjoin(selected_choice, selected_choice.id == QuizAnswer.selected_choice_id)
+        .outerjoin(
+            correct_choice,
+            and_(correct_choice.question_id == Question.id, correct_choice.is_correct.is_(True))
+        )
+        .filter(QuizAnswer.quiz_attempt_id.in_(attempt_ids))
+        .order_by(QuizAnswer.quiz_attempt_id, QuizAnswer.id)
+        .all()
+    )
+
+    results = {attempt_id: [] for attempt_id in attempt_ids}
+    for (attempt_id, selected_choice_id, is_correct, legacy_text,
+         selected_text, question_text, correct_text) in rows:
+        correct_text = correct_text if correct_text is not None else "N/A"
+        if selected_choice_id is None:
+            # Legacy answer not yet converted by migration 0007.
+            selected_text = legacy_text
+            is_correct = legacy_text is not None and legacy_text == correct_text
+        results[attempt_id].append({
+            "question_text": question_text,
+            "selected_text": selected_text,
+            "correct_text": correct_text,
+            "is_correct": bool(is_correct)
+        })
+    return {attempt_id: tuple(rows) for attempt_id, rows in results.items()}
+
+
+def get_attempt_results(attempt) -> tuple:
+    """
+    Return the question review rows for a submitted attempt.
+
+    Built from one query joining answers to their question and correct choice,
+    then served from attempt_results on later views.
+    """
+    return cached_results(results_key(attempt), lambda: build_attempt_results([attempt.id])[attempt.id])
+
+
+def _stale(session) -> dict:
+    return session.info.setdefault(
+        "stale_quiz_caches",
+        {"categories": set(), "questions": set(), "category_list": False, "versions_bumped": set()}
+    )
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_stale_entries(session, flush_context):
+    for obj in session.new | session.dirty | session.deleted:
+        if isinstance(obj, Question):
+            _stale(session)["questions"].add(obj.id)
+            if obj in session.dirty:
+                history = inspect(obj).attrs.category_id.history
+                if not history.has_changes():
+                    continue
+                if history.deleted:
+                    _stale(session)["categories"].update(history.added or ())
+                    _stale(session)["categories"].update(history.deleted)
+                else:
+                    # The previous category was never loaded, so drop everything.
+                    _stale(session)["categories"].add(None)
+            else:
+                _stale(session)["categories"].add(obj.category_id)
+        elif isinstance(obj, Choice):
+            _stale(session)["questions"].add(obj.question_id)
+            history = inspect(obj).attrs.question_id.history
+            _stale(session)["questions"].update(history.deleted or ())
+        elif isinstance(obj, Category):
+            _stale(session)["category_list"] = True
+
+    # Other processes learn about the change from the shared versions, bumped
+    # once per transaction in that same transaction.
+    stale = session.info.get("stale_quiz_caches")
+    if stale is None:
+        return
+    for name, changed in (
+        (CATEGORIES_VERSION, stale["category_list"]),
+        (QUESTIONS_VERSION, stale["categories"] or stale["questions"]),
+    ):
+        if changed and name not in stale["versions_bumped"]:
+            bump_cache_version(name, session)
+            stale["versions_bumped"].add(name)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_stale_entries(session):
+    stale = session.info.pop("stale_quiz_caches", None)
+    if not stale:
+        return
+
+    if stale["category_list"]:
+        category_cache.invalidate()
+
+    for question_id in stale["questions"]:
+        question_bundles.evict(question_id)
+    if stale["questions"]:
+        # Review rows embed question and choice text.
+        attempt_results.clear()
+
+    if None in stale["categories"]:
+        question_pool.invalidate()
+    else:
+        for category_id in stale["categories"]:
+            question_pool.invalidate(category_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_stale_entries(session):
+    session.info.pop("stale_quiz_caches", None)
+
+
+AnswerKey = namedtuple("AnswerKey", ["correct_choice_id", "correct_text", "choices"])
+
+
+def letter_to_index(letter: str) -> int:
+    return ord(letter.upper()) - ord("A")
+
+
+def load_answer_key(question_ids) -> dict:
+    """
+    Build the answer key for a set of questions with a single query
+    (one per IN_CLAUSE_CHUNK questions for very large sets).
+
+    Returns {question_id: AnswerKey} where choices maps choice ID to text,
+    in choice ID order. The correct choice comes from Choice.is_correct.
+    """
+    question_ids = list(question_ids)
+    rows = []
+    # Large ID lists are split to stay under the driver's bound-parameter limit.
+    for start in range(0, len(question_ids), IN_CLAUSE_CHUNK):
+        rows.extend(
+            db.session.query(Choice.id, Choice.question_id, Choice.text, Choice.is_correct)
+            .filter(Choice.question_id.in_(question_ids[start:start + IN_CLAUSE_CHUNK]))
+            .order_by(Choice.question_id, Choice.id)
+            .all()
+        )
+
+    grouped = {}
+    correct = {}
+    for choice_id, question_id, text, is_correct in rows:
+        grouped.setdefault(question_id, {})[choice_id] = text
+        if is_correct:
+            correct[question_id] = choice_id
+
+    return {
+        question_id: AnswerKey(correct.get(question_id), choices.get(correct.get(question_id)), choices)
+        for question_id, choices in grouped.items()
+    }
+
+
+def grade_answers(question_ids, answers: dict, answer_key: dict):
+    """
+    Score answers against an in-memory answer key.
+
+    Returns (score, rows) where rows are QuizAnswer column dicts without the
+    attempt ID: the selected choice ID and whether it was correct. Choices
+    that do not belong to the question are stored as NULL and count as wrong.
+    """
+    score = 0
+    rows = []
+    for q_id in question_ids:
+        selected_choice_id = answers.get(str(q_id))
+        key = answer_key.get(q_id)
+        if not selected_choice_id or key is None:
+            continue
+
+        if selected_choice_id not in key.choices:
+            selected_choice_id = None
+        is_correct = selected_choice_id is not None and selected_choice_id == key.correct_choice_id
+        if is_correct:
+            score += 1
+
+        rows.append({"question_id": q_id, "selected_choice_id": selected_choice_id, "is_correct": is_correct})
+    return score, rows
+
+
+def record_attempt(category_id, user_id, session_id, question_ids, answers: dict) -> QuizAttempt:
+    """
+    Score and persist a quiz attempt in one transaction.
+
+    One query loads the answer key, the attempt row is flushed to get its ID,
+    the answers go in as a single executemany, the owner's user_stats row is
+    upserted, and the whole thing commits once.
+    """
+    answer_key = load_answer_key(question_ids)
+    score, rows = grade_answers(question_ids, answers, answer_key)
+
+    quiz = QuizAttempt(
+        category_id=category_id,
+        user_id=user_id,
+        session_id=session_id,
+        score=score,
+        total=len(question_ids)
+    )
+    try:
+        db.session.add(quiz)
+        db.session.flush()
+        if rows:
+            for row in rows:
+                row["quiz_attempt_id"] = quiz.id
+            db.session.execute(insert(QuizAnswer), rows)
+        record_attempt_stats([{
+            "user_id": user_id,
+            "session_id": session_id,
+            "category_id": category_id,
+            "score": score,
+            "total": quiz.total,
+            "created_at": quiz.created_at,
+        }])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return quiz
+
+
+def _is_int(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _parse_batch_item(item, category_ids):
+    """
+    Normalize one uploaded attempt, raising ValueError if it is unusable.
+
+    Every field is type-checked before it is used, so a malformed item can
+    only ever fail itself, never the batch.
+    """
+    if not isinstance(item, dict):
+        raise ValueError("attempt must be an object")
+
+    category_id = item.get("category_id")
+    if not _is_int(category_id) or category_id not in category_ids:
+        raise ValueError(f"unknown category_id {category_id!r}")
+
+    user_id = item.get("user_id")
+    session_id = item.get("session_id")
+    if user_id is not None and not _is_int(user_id):
+        raise ValueError("user_id must be an integer")
+    if session_id is not None and not (isinstance(session_id, str) and 0 < len(session_id) <= 255):
+        raise ValueError("session_id must be a string of at most 255 characters")
+    if user_id is None and not session_id:
+        raise ValueError("user_id or session_id is required")
+
+    raw_answers = item.get("answers")
+    if isinstance(raw_answers, list):
+        pairs = [(a.get("question_id"), a.get("choice_id")) for a in raw_answers if isinstance(a, dict)]
+    elif isinstance(raw_answers, dict):
+        pairs = list(raw_answers.items())
+    else:
+        pairs = None
+    if not pairs:
+        raise ValueError("answers must be a non-empty object or list")
+    answers = {}
+    for q_id, choice_id in pairs:
+        # Object keys are always strings; list items carry real integers.
+        if isinstance(q_id, str) and q_id.isascii() and q_id.isdigit():
+            q_id = int(q_id)
+        if not _is_int(q_id) or not _is_int(choice_id):
+            raise ValueError("answers must map question IDs to choice IDs")
+        answers[str(q_id)] = choice_id
+
+    # Questions may be left unanswered, but a quiz never has more than
+    # QUESTIONS_PER_QUIZ of them.
+    total = item.get("total")
+    if total is None:
+        total = len(answers)
+    elif not _is_int(total) or not len(answers) <= total <= max(len(answers), QUESTIONS_PER_QUIZ):
+        raise ValueError(f"total must be an integer from {len(answers)} to {max(len(answers), QUESTIONS_PER_QUIZ)}")
+
+    created_at = item.get("created_at")
+    if created_at is not None:
+        try:
+            created_at = datetime.fromisoformat(created_at)
+        except (TypeError, ValueError):
+            raise ValueError("created_at must be an ISO 8601 timestamp")
+        if created_at.tzinfo is not None:
+            # Stored as naive UTC, like datetime.utcnow().
+            created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+
+    return {
+        "category_id": category_id,
+        "user_id": user_id,
+        "session_id": None if user_id is not None else session_id,
+        "question_ids": [int(q_id) for q_id in answers],
+        "answers": answers,
+        "total": total,
+        "created_at": created_at or datetime.utcnow(),
+    }
+
+
+def insert_returning_ids(table, rows: list) -> list:
+    """Insert rows with executemany and return their new IDs in row order."""
+    if db.session.get_bind().dialect.name == "sqlite":
+        # SQLAlchemy can only guarantee RETURNING order on SQLite by inserting
+        # row by row. Within one transaction SQLite hands out ascending rowids
+        # in VALUES order, so sorting the returned IDs restores row order.
+        return sorted(db.session.scalars(table.insert().returning(table.c.id), rows).all())
+    return db.session.scalars(
+        table.insert().returning(table.c.id, sort_by_parameter_order=True), rows
+    ).all()
+
+
+def ingest_attempts(items: list, chunk_size: int = 500) -> list:
+    """
+    Score and store a batch of completed attempts, e.g. from offline kiosks.
+
+    Every question's answer key is loaded up front, attempts are graded in
+    memory, and each chunk of attempts is written with two Core executemany
+    statements (attempts with RETURNING ids, then answers) plus the
+    user_stats upsert, in its own transaction. A failing chunk is rolled back
+    without affecting the others.
+
+    Returns one result dict per input item, in input order.
+    """
+    category_ids = {category.id for category in category_cache.all()}
+
+    results = [None] * len(items)
+    parsed = []
+    for index, item in enumerate(items):
+        try:
+            parsed.append((index, _parse_batch_item(item, category_ids)))
+        except (TypeError, ValueError) as e:
+            results[index] = {"index": index, "status": "error", "error": str(e)}
+
+    all_question_ids = {q_id for _, attempt in parsed for q_id in attempt["question_ids"]}
+    answer_key = load_answer_key(all_question_ids)
+
+    graded = []
+    for index, attempt in parsed:
+        unknown = [q_id for q_id in attempt["question_ids"] if q_id not in answer_key]
+        if unknown:
+            results[index] = {"index": index, "status": "error", "error": f"unknown question_ids {unknown}"}
+            continue
+        attempt["score"], attempt["answer_rows"] = grade_answers(
+            attempt["question_ids"], attempt["answers"], answer_key
+        )
+        graded.append((index, attempt))
+
+    for start in range(0, len(graded), chunk_size):
+        chunk = graded[start:start + chunk_size]
+        attempt_rows = [
+            {
+                "category_id": attempt["category_id"],
+                "user_id": attempt["user_id"],
+                "session_id": attempt["session_id"],
+                "score": attempt["score"],
+                "total": attempt["total"],
+                "created_at": attempt["created_at"],
+            }
+            for _, attempt in chunk
+        ]
+        try:
+            attempt_ids = insert_returning_ids(QuizAttempt.__table__, attempt_rows)
+
+            answer_rows = []
+            for attempt_id, (_, attempt) in zip(attempt_ids, chunk):
+                for row in attempt["answer_rows"]:
+                    answer_rows.append(dict(row, quiz_attempt_id=attempt_id))
+            if answer_rows:
+                db.session.execute(QuizAnswer.__table__.insert(), answer_rows)
+
+            record_attempt_stats(attempt_rows)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Batch attempt chunk failed: {str(e)}")
+            for index, _ in chunk:
+                results[index] = {"index": index, "status": "error", "error": f"write failed: {str(e)}"}
+            continue
+
+        for attempt_id, (index, attempt) in zip(attempt_ids, chunk):
+            results[index] = {
+                "index": index,
+                "status": "created",
+                "attempt_id": attempt_id,
+                "score": attempt["score"],
+                "total": attempt["total"],
+            }
+
+    for index, item in enumerate(items):
+        if isinstance(item, dict) and item.get("client_id") is not None:
+            results[index]["client_id"] = item["client_id"]
+    return results
+
+
 def validate_all_answers(answers: dict, total: int) -> bool:
     """
     Validate that all questions have been answered.
@@ -0,0 +1,375 @@
+"""
+Server-side storage for in-progress quizzes.
+
+The Flask session cookie only carries an opaque quiz state ID; the chosen
+questions, per-question choice order and answers live in a QuizStateStore.
+Two backends are provided: Redis (the instance Celery already uses) and a local
+SQLite file for setups without Redis. Every write refreshes the state's TTL, so
+abandoned quizzes expire on their own; a write to a quiz that has already
+expired or been deleted changes nothing and reports False, so it can never
+leave a partial state behind.
+
+State returned by load():
+    {
+        "category_id": int,
+        "question_ids": [int, ...],
+        "answers": {"<question_id>": choice_id, ...},
+        "choice_orders": {"<question_id>": [choice_id, ...], ...}
+    }
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 2 * 60 * 60  # seconds
+
+
+class QuizStateStore:
+    """Interface for quiz state backends."""
+
+    def __init__(self, ttl: int = DEFAULT_TTL):
+        self.ttl = ttl
+
+    def create(self, category_id: int, question_ids: list) -> str:
+        """Start a new quiz and return its state ID."""
+        raise NotImplementedError
+
+    def load(self, state_id: str):
+        """Return the quiz state dict, or None if it expired or never existed."""
+        raise NotImplementedError
+
+    def set_answer(self, state_id: str, question_id: int, choice_id: int) -> bool:
+        """Atomically record the answer to one question. False if the quiz is gone."""
+        raise NotImplementedError
+
+    def set_choice_order(self, state_id: str, question_id: int, choice_ids: list) -> list:
+        """
+        Record the shuffled choice order for a question unless one exists.
+
+        Returns the order that is stored, which is the earlier one if two
+        requests raced to shuffle the same question. If the quiz is gone,
+        nothing is stored and choice_ids is returned as is.
+        """
+        raise NotImplementedError
+
+    def delete(self, state_id: str):
+        raise NotImplementedError
+
+    def purge_expired(self) -> int:
+        """Remove abandoned quizzes past their TTL. Returns how many were removed."""
+        return 0
+
+    @staticmethod
+    def new_id() -> str:
+        return uuid.uuid4().hex
+
+
+class RedisQuizStateStore(QuizStateStore):
+    """
+    Keeps each quiz in one Redis hash with a key-level TTL.
+
+    Answers and choice orders are separate hash fields, so recording an answer
+    is a single HSET rather than a read-modify-write of the whole state. Each
+    write is a WATCH transaction that checks the key still exists first: an
+    HSET on an expired key would recreate it without its category and
+    questions.
+    """
+
+    KEY_PREFIX = 'quiz_state:'
+
+    def __init__(self, client, ttl: int = DEFAULT_TTL):
+        super().__init__(ttl)
+        self.client = client
+
+    def _key(self, state_id):
+        return f'{self.KEY_PREFIX}{state_id}'
+
+    def create(self, category_id, question_ids):
+        state_id = self.new_id()
+        key = self._key(state_id)
+        pipe = self.client.pipeline()
+        pipe.hset(key, mapping={
+            'category_id': category_id,
+            'question_ids': json.dumps(list(question_ids)),
+        })
+        pipe.expire(key, self.ttl)
+        pipe.execute()
+        return state_id
+
+    def load(self, state_id):
+        fields = self.client.hgetall(self._key(state_id))
+        if not fields:
+            return None
+
+        fields = {
+            (k.decode() if isinstance(k, bytes) else k): (v.decode() if isinstance(v, bytes) else v)
+            for k, v in fields.items()
+        }
+        if 'category_id' not in fields or 'question_ids' not in fields:
+            # Fields written to an already expired key; not a quiz.
+            return None
+        state = {
+            'category_id': int(fields['category_id']),
+            'question_ids': json.loads(fields['question_ids']),
+            'answers': {},
+            'choice_orders': {},
+        }
+        for field, value in fields.items():
+            if field.startswith('answer:'):
+                state['answers'][field[len('answer:'):]] = int(value)
+            elif field.startswith('order:'):
+                state['choice_orders'][field[len('order:'):]] = json.loads(value)
+        return state
+
+    def set_answer(self, state_id, question_id, choice_id):
+        key = self._key(state_id)
+
+        def write(pipe):
+            if not pipe.exists(key):
+                return False
+            pipe.multi()
+            pipe.hset(key, f'answer:{question_id}', int(choice_id))
+            pipe.expire(key, self.ttl)
+            return True
+
+        return self.client.transaction(write, key, value_from_callable=True)
+
+    def set_choice_order(self, state_id, question_id, choice_ids):
+        key = self._key(state_id)
+        field = f'order:{question_id}'
+        order = json.dumps(list(choice_ids))
+
+        def write(pipe):
+            if not pipe.exists(key):
+                return order
+            stored = pipe.hget(key, field)
+            pipe.multi()
+            if not stored:
+                pipe.hset(key, field, order)
+            pipe.expire(key, self.ttl)
+            return stored or order
+
+        return json.loads(self.client.transaction(write, key, value_from_callable=True))
+
+    def delete(self, state_id):
+        self.client.delete(self._key(state_id))
+
+
+class SQLiteQuizStateStore(QuizStateStore):
+    """
+    Fallback store in a standalone SQLite file.
+
+    Kept out of the main quiz database so in-progress answers do not compete
+    with submissions for its write lock. Expired quizzes are purged in bounded
+    batches every PURGE_EVERY creates.
+    """
+
+    PURGE_EVERY = 100
+    PURGE_BATCH_SIZE = 500
+
+    def __init__(self, path: str, ttl: int = DEFAULT_TTL):
+        super().__init__(ttl)
+        self.path = path
+        self._local = threading.local()
+        self._creates = 0
+        self._init_schema()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._connect()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS quiz_states (
+                id TEXT PRIMARY KEY,
+                category_id INTEGER NOT NULL,
+                question_ids TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_quiz_states_expires_at ON quiz_states (expires_at);
+            CREATE TABLE IF NOT EXISTS quiz_state_entries (
+                state_id TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                question_id INTEGER NOT NULL,
+                value TEXT NOT NULL,
+                PRIMARY KEY (state_id, kind, question_id)
+            );
+        """)
+
+    def create(self, category_id, question_ids):
+        self._creates += 1
+        if self._creates % self.PURGE_EVERY == 0:
+            self.purge_expired()
+
+        state_id = self.new_id()
+        self._connect().execute(
+            'INSERT INTO quiz_states (id, category_id, question_ids, expires_at) VALUES (?, ?, ?, ?)',
+            (state_id, category_id, json.dumps(list(question_ids)), time.time() + self.ttl)
+        )
+        return state_id
+
+    def load(self, state_id):
+        conn = self._connect()
+        row = conn.execute(
+            'SELECT category_id, question_ids FROM quiz_states WHERE id = ? AND expires_at > ?',
+            (state_id, time.time())
+        ).fetchone()
+        if row is None:
+            return None
+
+        state = {
+            'category_id': row[0],
+            'question_ids': json.loads(row[1]),
+            'answers': {},
+            'choice_orders': {},
+        }
+        entries = conn.execute(
+            'SELECT kind, question_id, value FROM quiz_state_entries WHERE state_id = ?',
+            (state_id,)
+        )
+        for kind, question_id, value in entries:
+            if kind == 'answer':
+                state['answers'][str(question_id)] = int(value)
+            elif kind == 'order':
+                state['choice_orders'][str(question_id)] = json.loads(value)
+        return state
+
+    def _write_entry(self, state_id, kind, question_id, value, replace):
+        """Write one entry and return the stored value, or None if the quiz is gone."""
+        conn = self._connect()
+        conflict = 'DO UPDATE SET value = excluded.value' if replace else 'DO NOTHING'
+        with _transaction(conn):
+            # Refreshing the TTL first doubles as the check that the quiz is
+            # still live, so an expired or deleted one gets no orphan entries.
+            refreshed = conn.execute(
+                'UPDATE quiz_states SET expires_at = ? WHERE id = ? AND expires_at > ?',
+                (time.time() + self.ttl, state_id, time.time())
+            ).rowcount
+            if not refreshed:
+                return None
+            conn.execute(
+                'INSERT INTO quiz_state_entries (state_id, kind, question_id, value) VALUES (?, ?, ?, ?) '
+                f'ON CONFLICT (state_id, kind, question_id) {conflict}',
+                (state_id, kind, question_id, value)
+            )
+            row = conn.execute(
+                'SELECT value FROM quiz_state_entries WHERE state_id = ? AND kind = ? AND question_id = ?',
+                (state_id, kind, question_id)
+            ).fetchone()
+        return row[0]
+
+    def set_answer(self, state_id, question_id, choice_id):
+        return self._write_entry(state_id, 'answer', question_id, str(int(choice_id)), replace=True) is not None
+
+    def set_choice_order(self, state_id, question_id, choice_ids):
+        stored = self._write_entry(
+            state_id, 'order', question_id, json.dumps(list(choice_ids)), replace=False
+        )
+        return json.loads(stored) if stored else list(choice_ids)
+
+    def delete(self, state_id):
+        conn = self._connect()
+        with _transaction(conn):
+            conn.execute('DELETE FROM quiz_state_entries WHERE state_id = ?', (state_id,))
+            conn.execute('DELETE FROM quiz_states WHERE id = ?', (state_id,))
+
+    def purge_expired(self):
+        conn = self._connect()
+        purged = 0
+        while True:
+            with _transaction(conn):
+                ids = [row[0] for row in conn.execute(
+                    'SELECT id FROM quiz_states WHERE expires_at <= ? LIMIT ?',
+                    (time.time(), self.PURGE_BATCH_SIZE)
+                )]
+                if not ids:
+                    break
+                placeholders = ','.join('?' * len(ids))
+                conn.execute(f'DELETE FROM quiz_state_entries WHERE state_id IN ({placeholders})', ids)
+                conn.execute(f'DELETE FROM quiz_states WHERE id IN ({placeholders})', ids)
+            purged += len(ids)
+        if purged:
+            logger.info(f"Purged {purged} abandoned quiz states")
+        return purged
+
+
+class _transaction:
+    """BEGIN IMMEDIATE ... COMMIT on an autocommit sqlite3 connection."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        return False
+
+
+def _redis_store(app, ttl):
+    import redis
+
+    client = redis.Redis.from_url(
+        app.config['QUIZ_STATE_REDIS_URL'], socket_connect_timeout=0.5
+    )
+    # Fail at startup rather than on the first quiz: falling back to SQLite
+    # here would split processes of one deployment across two stores.
+    client.ping()
+    return RedisQuizStateStore(client, ttl=ttl)
+
+
+def init_quiz_state_store(app):
+    """
+    Create the quiz state store for an app from its config.
+
+    QUIZ_STATE_BACKEND is 'redis', 'sqlite' or 'auto'. 'auto' is resolved
+    from configuration alone, so every process of a deployment picks the
+    same store: Redis when QUIZ_STATE_REDIS_URL or REDIS_URL is set,
+    otherwise SQLite. A configured Redis that cannot be reached is an error,
+    never a silent switch to SQLite.
+    """
+    app.config.setdefault('QUIZ_STATE_BACKEND', os.environ.get('QUIZ_STATE_BACKEND', 'auto'))
+    redis_url = app.config.get('QUIZ_STATE_REDIS_URL') or os.environ.get(
+        'QUIZ_STATE_REDIS_URL', os.environ.get('REDIS_URL')
+    )
+    app.config['QUIZ_STATE_REDIS_URL'] = redis_url or 'redis://127.0.0.1:6379/0'
+    app.config.setdefault(
+        'QUIZ_STATE_SQLITE_PATH', os.path.join(app.instance_path, 'quiz_state.db')
+    )
+    app.config.setdefault('QUIZ_STATE_TTL', int(os.environ.get('QUIZ_STATE_TTL', DEFAULT_TTL)))
+
+    backend = app.config['QUIZ_STATE_BACKEND']
+    ttl = app.config['QUIZ_STATE_TTL']
+    if backend == 'auto':
+        backend = 'redis' if redis_url else 'sqlite'
+    if backend not in ('redis', 'sqlite'):
+        raise ValueError(f"QUIZ_STATE_BACKEND must be 'redis', 'sqlite' or 'auto', not {backend!r}")
+
+    if backend == 'redis':
+        store = _redis_store(app, ttl)
+    else:
+        store = SQLiteQuizStateStore(app.config['QUIZ_STATE_SQLITE_PATH'], ttl=ttl)
+    logger.info(f"Quiz state store: {backend}")
+
+    app.extensions['quiz_state'] = store
+    return store
+
+
+def get_quiz_state_store() -> QuizStateStore:
+    return current_app.extensions['quiz_state']
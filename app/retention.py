@@ -0,0 +1,232 @@
+"""
+Retention for guest quiz attempts nobody can read any more.
+
+Guest attempts are only reachable through the anonymous_session_id in the
+Flask session cookie, which is cleared on logout and never persisted. Once a
+guest session has been idle for longer than the retention window and was not
+migrated to a user, its attempts, answers and stats are dead weight.
+"""
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, exists, func, select, text
+from sqlalchemy.orm import aliased
+
+from app import db
+from app.models import ArchivedAttempt, QuizAnswer, QuizAttempt, UserStats
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RETENTION_DAYS = 30
+DEFAULT_BATCH_SIZE = 500
+SESSION_CHUNK = 200
+
+
+def find_orphaned_guest_sessions(cutoff: datetime) -> list:
+    """Guest session IDs whose most recent attempt, hot or archived, is older than cutoff."""
+    rows = (
+        db.session.query(QuizAttempt.session_id)
+        .filter(QuizAttempt.user_id.is_(None), QuizAttempt.session_id.isnot(None))
+        .group_by(QuizAttempt.session_id)
+        .having(func.max(QuizAttempt.created_at) < cutoff)
+        .all()
+    )
+    sessions = [row[0] for row in rows]
+
+    # Sessions whose older attempts were moved to the archive are orphaned
+    # when the archive holds nothing recent for them and the hot tables
+    # nothing at all past the cutoff.
+    archived = {
+        row[0] for row in
+        db.session.query(ArchivedAttempt.session_id)
+        .filter(ArchivedAttempt.user_id.is_(None), ArchivedAttempt.session_id.isnot(None))
+        .group_by(ArchivedAttempt.session_id)
+        .having(func.max(ArchivedAttempt.created_at) < cutoff)
+        .all()
+    }
+    archived.difference_update(sessions)
+    candidates = sorted(archived)
+    for start in range(0, len(candidates), SESSION_CHUNK):
+        group = candidates[start:start + SESSION_CHUNK]
+        active = {
+            row[0] for row in
+            db.session.query(QuizAttempt.session_id)
+            .filter(QuizAttempt.user_id.is_(None), QuizAttempt.session_id.in_(group))
+            .distinct()
+            .all()
+        }
+        sessions.extend(session_id for session_id in group if session_id not in active)
+    return sessions
+
+
+def _free_bytes():
+    if db.session.get_bind().dialect.name != "sqlite":
+        return None
+    page_size = db.session.execute(text("PRAGMA page_size")).scalar()
+    free_pages = db.session.execute(text("PRAGMA freelist_count")).scalar()
+    return page_size * free_pages
+
+
+def _session_filter(group: list, cutoff: datetime):
+    """
+    Attempts of the guest sessions in group that are older than cutoff, as
+    long as the session has no attempt at or after cutoff.
+
+    Sessions are picked before anything is deleted, so a guest can come back
+    in between; evaluated again in every deleting statement, this keeps the
+    whole history of such a guest.
+    """
+    recent = aliased(QuizAttempt)
+    return and_(
+        QuizAttempt.user_id.is_(None),
+        QuizAttempt.session_id.in_(group),
+        QuizAttempt.created_at < cutoff,
+        ~exists().where(
+            recent.user_id.is_(None),
+            recent.session_id == QuizAttempt.session_id,
+            recent.created_at >= cutoff
+        )
+    )
+
+
+def _delete_attempts(owner_filter, batch_size: int, report: dict):
+    """Delete matching attempts and their answers, batch_size attempts per transaction."""
+    while True:
+        ids = [
+            row[0] for row in
+            db.session.query(QuizAttempt.id).filter(owner_filter).limit(batch_size).all()
+        ]
+        if not ids:
+            return
+
+        try:
+            # owner_filter is checked again as the rows are deleted.
+            report["answers"] += (
+                db.session.query(QuizAnswer)
+                .filter(QuizAnswer.quiz_attempt_id.in_(
+                    select(QuizAttempt.id).where(QuizAttempt.id.in_(ids), owner_filter)
+                ))
+                .delete(synchronize_session=False)
+            )
+            report["attempts"] += (
+                db.session.query(QuizAttempt)
+                .filter(QuizAttempt.id.in_(ids), owner_filter)
+                .delete(synchronize_session=False)
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        report["batches"] += 1
+
+
+def _count_attempts(owner_filter, report: dict):
+    """Add the attempts _delete_attempts would remove, and their answers, to report."""
+    doomed = db.session.query(QuizAttempt.id).filter(owner_filter)
+    report["attempts"] += doomed.count()
+    report["answers"] += (
+        db.session.query(func.count(QuizAnswer.id))
+        .filter(QuizAnswer.quiz_attempt_id.in_(doomed.scalar_subquery()))
+        .scalar()
+    )
+
+
+def compact_guest_attempts(retention_days: int = DEFAULT_RETENTION_DAYS,
+                           batch_size: int = DEFAULT_BATCH_SIZE,
+                           dry_run: bool = False) -> dict:
+    """
+    Delete unreachable guest attempts, their answers and their stats rows.
+
+    A guest session is unreachable once its newest attempt is older than the
+    retention window. Anonymous attempts from before session tracking (no
+    session_id at all) are unreachable too and go once they pass the window.
+    Work is done in bounded batches, each in its own short transaction.
+
+    Returns a report of what was (or, with dry_run, would be) removed.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    sessions = find_orphaned_guest_sessions(cutoff)
+    legacy_filter = and_(
+        QuizAttempt.user_id.is_(None),
+        QuizAttempt.session_id.is_(None),
+        QuizAttempt.created_at < cutoff
+    )
+
+    report = {
+        "cutoff": cutoff.isoformat(),
+        "sessions": len(sessions),
+        "attempts": 0,
+        "answers": 0,
+        "archived_attempts": 0,
+        "stats_rows": 0,
+        "batches": 0,
+        "dry_run": dry_run,
+    }
+
+    if dry_run:
+        # Counted in the same session groups the real run deletes in, so no
+        # statement binds more than SESSION_CHUNK session IDs.
+        for start in range(0, len(sessions), SESSION_CHUNK):
+            group = sessions[start:start + SESSION_CHUNK]
+            _count_attempts(_session_filter(group, cutoff), report)
+            report["archived_attempts"] += (
+                db.session.query(func.count(ArchivedAttempt.id))
+                .filter(ArchivedAttempt.user_id.is_(None), ArchivedAttempt.session_id.in_(group))
+                .scalar()
+            )
+            report["stats_rows"] += (
+                db.session.query(func.count(UserStats.id))
+                .filter(UserStats.user_id.is_(None), UserStats.session_id.in_(group))
+                .scalar()
+            )
+        _count_attempts(legacy_filter, report)
+        return report
+
+    free_before = _free_bytes()
+
+    for start in range(0, len(sessions), SESSION_CHUNK):
+        group = sessions[start:start + SESSION_CHUNK]
+        _delete_attempts(_session_filter(group, cutoff), batch_size, report)
+        try:
+            # Stats and archived history go only with the session's last hot
+            # attempt. The stats delete comes first: on SQLite it takes the
+            # write lock, so no attempt can be recorded before the check.
+            report["stats_rows"] += (
+                db.session.query(UserStats)
+                .filter(
+                    UserStats.user_id.is_(None),
+                    UserStats.session_id.in_(group),
+                    ~exists().where(QuizAttempt.user_id.is_(None), QuizAttempt.session_id == UserStats.session_id)
+                )
+                .delete(synchronize_session=False)
+            )
+            active = {
+                row[0] for row in
+                db.session.query(QuizAttempt.session_id)
+                .filter(QuizAttempt.user_id.is_(None), QuizAttempt.session_id.in_(group))
+                .distinct()
+                .all()
+            }
+            orphaned = [session_id for session_id in group if session_id not in active]
+            if orphaned:
+                report["archived_attempts"] += (
+                    db.session.query(ArchivedAttempt)
+                    .filter(ArchivedAttempt.user_id.is_(None), ArchivedAttempt.session_id.in_(orphaned))
+                    .delete(synchronize_session=False)
+                )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    _delete_attempts(legacy_filter, batch_size, report)
+
+    free_after = _free_bytes()
+    if free_before is not None:
+        report["reclaimable_bytes"] = max(free_after - free_before, 0)
+
+    logger.info(
+        f"Guest compaction removed {report['attempts']} attempts, {report['answers']} answers "
+        f"and {report['stats_rows']} stats rows from {report['sessions']} sessions"
+    )
+    return report
@@ -0,0 +1,28 @@
+"""
+Authentication for endpoints only other services may call.
+
+The gateway proxies every /api/* path to this service, so bulk and export
+endpoints cannot rely on being unreachable from outside. They are wrapped in
+service_only, which requires the shared SERVICE_TOKEN in the X-Service-Token
+header. With no SERVICE_TOKEN configured they refuse every request.
+"""
+import functools
+import hmac
+
+from flask import current_app, jsonify, request
+
+SERVICE_TOKEN_HEADER = "X-Service-Token"
+
+
+def service_only(view):
+    """Reject requests without the shared service token with 401 (403 if none is configured)."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        expected = current_app.config.get("SERVICE_TOKEN")
+        if not expected:
+            return jsonify({"error": "Service endpoints are disabled: SERVICE_TOKEN is not set"}), 403
+        given = request.headers.get(SERVICE_TOKEN_HEADER, "")
+        if not hmac.compare_digest(given.encode("utf-8"), expected.encode("utf-8")):
+            return jsonify({"error": f"{SERVICE_TOKEN_HEADER} header is missing or invalid"}), 401
+        return view(*args, **kwargs)
+    return wrapper
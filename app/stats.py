@@ -0,0 +1,289 @@
+"""
+Maintenance of the user_stats aggregate table.
+
+Stats are applied as deltas with an INSERT ... ON CONFLICT DO UPDATE upsert, so
+recording an attempt touches one row per (owner, category) no matter how many
+attempts the owner already has. Nothing here commits; callers fold the update
+into the transaction that writes the attempts themselves.
+
+Every write to a row also increments its version, and rows are only deleted
+together with their owner, so the sum of an owner's versions grows with
+every change to the owner's attempts (see history_version).
+"""
+from sqlalchemy import bindparam, case, func, literal, or_
+
+from app import db
+from app.models import ArchivedAttempt, QuizAttempt, UserStats
+
+
+def _insert_for_dialect():
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return insert
+
+
+def _stats_key(row):
+    if row.get("user_id") is not None:
+        return ("user_id", row["user_id"], row["category_id"])
+    return ("session_id", row.get("session_id"), row["category_id"])
+
+
+def aggregate_attempts(attempts) -> list:
+    """
+    Fold attempt rows into one stats delta per (owner, category).
+
+    attempts is an iterable of dicts with user_id, session_id, category_id,
+    score, total and created_at. Attempts with neither a user_id nor a
+    session_id are skipped; they cannot be attributed to anyone.
+    """
+    deltas = {}
+    for row in attempts:
+        if row.get("user_id") is None and row.get("session_id") is None:
+            continue
+        key = _stats_key(row)
+        delta = deltas.get(key)
+        if delta is None:
+            delta = deltas[key] = {
+                "user_id": row.get("user_id"),
+                "session_id": None if row.get("user_id") is not None else row.get("session_id"),
+                "category_id": row["category_id"],
+                "attempt_count": 0,
+                "score_sum": 0,
+                "total_sum": 0,
+                "best_score": 0,
+                "last_attempt_at": None,
+            }
+        delta["attempt_count"] += 1
+        delta["score_sum"] += row.get("score") or 0
+        delta["total_sum"] += row.get("total") or 0
+        delta["best_score"] = max(delta["best_score"], row.get("score") or 0)
+        created_at = row.get("created_at")
+        if created_at is not None and (delta["last_attempt_at"] is None or created_at > delta["last_attempt_at"]):
+            delta["last_attempt_at"] = created_at
+    return list(deltas.values())
+
+
+def apply_stats_deltas(deltas: list):
+    """Add stats deltas into user_stats, creating rows as needed."""
+    if not deltas:
+        return
+
+    insert = _insert_for_dialect()
+    if insert is None:
+        _apply_stats_deltas_orm(deltas)
+        return
+
+    for owner in ("user_id", "session_id"):
+        rows = [d for d in deltas if (owner == "user_id") == (d["user_id"] is not None)]
+        if not rows:
+            continue
+
+        stmt = insert(UserStats)
+        excluded = stmt.excluded
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[getattr(UserStats, owner), UserStats.category_id],
+            set_={
+                "attempt_count": UserStats.attempt_count + excluded.attempt_count,
+                "score_sum": UserStats.score_sum + excluded.score_sum,
+                "total_sum": UserStats.total_sum + excluded.total_sum,
+                "version": UserStats.version + 1,
+                "best_score": case(
+                    (excluded.best_score > UserStats.best_score, excluded.best_score),
+                    else_=UserStats.best_score
+                ),
+                "last_attempt_at": case(
+                    (UserStats.last_attempt_at.is_(None), excluded.last_attempt_at),
+                    (excluded.last_attempt_at > UserStats.last_attempt_at, excluded.last_attempt_at),
+                    else_=UserStats.last_attempt_at
+                ),
+            }
+        )
+        db.session.execute(stmt, rows)
+
+
+def _apply_stats_deltas_orm(deltas: list):
+    for delta in deltas:
+        owner = "user_id" if delta["user_id"] is not None else "session_id"
+        stats = UserStats.query.filter_by(
+            **{owner: delta[owner], "category_id": delta["category_id"]}
+        ).first()
+        if stats is None:
+            db.session.add(UserStats(**delta))
+            continue
+        stats.attempt_count += delta["attempt_count"]
+        stats.score_sum += delta["score_sum"]
+        stats.total_sum += delta["total_sum"]
+        stats.version += 1
+        stats.best_score = max(stats.best_score, delta["best_score"])
+        if delta["last_attempt_at"] and (
+            stats.last_attempt_at is None or delta["last_attempt_at"] > stats.last_attempt_at
+        ):
+            stats.last_attempt_at = delta["last_attempt_at"]
+    db.session.flush()
+
+
+def record_attempt_stats(attempts):
+    """Fold new attempts (dicts, see aggregate_attempts) into user_stats."""
+    apply_stats_deltas(aggregate_attempts(attempts))
+
+
+def migrate_guest_stats(session_id: str, user_id: int):
+    """Merge a guest session's stats rows into a user's rows and drop the guest rows."""
+    guest_rows = UserStats.query.filter(
+        UserStats.user_id.is_(None),
+        UserStats.session_id == session_id
+    ).all()
+    if not guest_rows:
+        return
+
+    apply_stats_deltas([
+        {
+            "user_id": user_id,
+            "session_id": None,
+            "category_id": row.category_id,
+            "attempt_count": row.attempt_count,
+            "score_sum": row.score_sum,
+            "total_sum": row.total_sum,
+            "best_score": row.best_score,
+            "last_attempt_at": row.last_attempt_at,
+        }
+        for row in guest_rows
+    ])
+    for row in guest_rows:
+        db.session.delete(row)
+
+
+def move_guest_stats(session_id: str, user_id: int, attempts):
+    """
+    Move the stats of some of a guest session's attempts (dicts with
+    category_id, score, total and created_at) to a user, as they are claimed.
+
+    Counts and sums leave the guest rows exactly. The guest rows keep their
+    best_score and last_attempt_at, and rows left with no attempts are kept
+    too, so the guest's version never goes back: migrate_guest_stats merges
+    them all into the same user, so the user's rows end up exact either way.
+    """
+    deltas = aggregate_attempts(
+        dict(attempt, user_id=user_id, session_id=None)
+        for attempt in attempts if attempt["category_id"] is not None
+    )
+    if not deltas:
+        return
+
+    apply_stats_deltas(deltas)
+    guest = (UserStats.user_id.is_(None), UserStats.session_id == session_id)
+    for delta in deltas:
+        db.session.query(UserStats).filter(*guest, UserStats.category_id == delta["category_id"]).update({
+            UserStats.attempt_count: UserStats.attempt_count - delta["attempt_count"],
+            UserStats.score_sum: UserStats.score_sum - delta["score_sum"],
+            UserStats.total_sum: UserStats.total_sum - delta["total_sum"],
+            UserStats.version: UserStats.version + 1,
+        }, synchronize_session=False)
+
+
+def rebuild_user_stats() -> int:
+    """
+    Recompute user_stats from quiz_attempts in one set-based pass, plus the
+    archived attempts, and commit. Each owner's version is carried over and
+    incremented.
+    Returns the number of stats rows written.
+    """
+    versions = {
+        (user_id, session_id): version for user_id, session_id, version in
+        db.session.query(UserStats.user_id, UserStats.session_id, func.sum(UserStats.version))
+        .group_by(UserStats.user_id, UserStats.session_id)
+    }
+    db.session.query(UserStats).delete(synchronize_session=False)
+
+    owned = or_(QuizAttempt.user_id.isnot(None), QuizAttempt.session_id.isnot(None))
+    session_key = case((QuizAttempt.user_id.is_(None), QuizAttempt.session_id), else_=None)
+    aggregates = (
+        db.session.query(
+            QuizAttempt.user_id,
+            session_key,
+            QuizAttempt.category_id,
+            func.count(QuizAttempt.id),
+            func.coalesce(func.sum(QuizAttempt.score), 0),
+            func.coalesce(func.sum(QuizAttempt.total), 0),
+            func.coalesce(func.max(QuizAttempt.score), 0),
+            func.max(QuizAttempt.created_at),
+            literal(1),
+        )
+        .filter(owned, QuizAttempt.category_id.isnot(None))
+        .group_by(QuizAttempt.user_id, session_key, QuizAttempt.category_id)
+    )
+
+    db.session.execute(
+        UserStats.__table__.insert().from_select(
+            ["user_id", "session_id", "category_id", "attempt_count",
+             "score_sum", "total_sum", "best_score", "last_attempt_at", "version"],
+            aggregates
+        )
+    )
+    apply_stats_deltas(_archived_stats_deltas())
+    _carry_over_versions(versions)
+    db.session.commit()
+    return db.session.query(func.count(UserStats.id)).scalar()
+
+
+def _carry_over_versions(versions: dict):
+    """Add each owner's version from before a rebuild to one of its new rows."""
+    table = UserStats.__table__
+    rows = [
+        {"b_id": row_id, "b_version": versions[(user_id, session_id)]}
+        for user_id, session_id, row_id in
+        db.session.query(UserStats.user_id, UserStats.session_id, func.min(UserStats.id))
+        .group_by(UserStats.user_id, UserStats.session_id)
+        if (user_id, session_id) in versions
+    ]
+    if rows:
+        db.session.execute(
+            table.update()
+            .where(table.c.id == bindparam("b_id"))
+            .values(version=table.c.version + bindparam("b_version")),
+            rows
+        )
+
+
+def _archived_stats_deltas() -> list:
+    """
+    Per-(owner, category) aggregates of archived attempts.
+
+    The archive is a separate database, so these cannot join the hot
+    INSERT ... SELECT; they are folded in as upsert deltas instead.
+    """
+    owned = or_(ArchivedAttempt.user_id.isnot(None), ArchivedAttempt.session_id.isnot(None))
+    session_key = case((ArchivedAttempt.user_id.is_(None), ArchivedAttempt.session_id), else_=None)
+    rows = (
+        db.session.query(
+            ArchivedAttempt.user_id,
+            session_key,
+            ArchivedAttempt.category_id,
+            func.count(ArchivedAttempt.id),
+            func.coalesce(func.sum(ArchivedAttempt.score), 0),
+            func.coalesce(func.sum(ArchivedAttempt.total), 0),
+            func.coalesce(func.max(ArchivedAttempt.score), 0),
+            func.max(ArchivedAttempt.created_at),
+        )
+        .filter(owned, ArchivedAttempt.category_id.isnot(None))
+        .group_by(ArchivedAttempt.user_id, session_key, ArchivedAttempt.category_id)
+        .all()
+    )
+    return [
+        {
+            "user_id": user_id,
+            "session_id": session_id,
+            "category_id": category_id,
+            "attempt_count": attempt_count,
+            "score_sum": score_sum,
+            "total_sum": total_sum,
+            "best_score": best_score,
+            "last_attempt_at": last_attempt_at,
+        }
+        for user_id, session_id, category_id, attempt_count, score_sum, total_sum, best_score, last_attempt_at in rows
+    ]
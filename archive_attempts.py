@@ -0,0 +1,32 @@
+"""
+Move old quiz attempts into the archive database.
+
+Attempts older than the window leave quiz_attempts/quiz_answers and are stored
+compressed in the archive bind (ARCHIVE_DATABASE_URL, default
+instance/quiz_archive.db). History and result pages keep serving them.
+
+Usage:
+    python archive_attempts.py [--older-than-days 180] [--batch-size 500] [--dry-run]
+"""
+import argparse
+import json
+
+from app import create_app
+from app.archive import archive_attempts, DEFAULT_ARCHIVE_AFTER_DAYS, DEFAULT_BATCH_SIZE
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--older-than-days", type=int, default=DEFAULT_ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="report what would be moved")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        report = archive_attempts(args.older_than_days, args.batch_size, args.dry_run)
+    print(json.dumps(report))
+
+
+if __name__ == "__main__":
+    main()
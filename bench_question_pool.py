@@ -0,0 +1,94 @@
+"""
+Benchmark quiz start latency against question bank size.
+
+Compares the old ORDER BY random() selection with the in-memory question pool
+used by quiz.start_quiz. Each bank is built in a throwaway SQLite file.
+
+Usage:
+    python bench_question_pool.py [--sizes 100 1000 10000 100000] [--runs 200]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from sqlalchemy.sql import func
+
+from app import create_app, db
+from app.models import Category, Question
+from app.quiz.services import question_pool, QUESTIONS_PER_QUIZ
+
+
+def build_bank(size):
+    category = Category(name="Bench")
+    db.session.add(category)
+    db.session.commit()
+    db.session.execute(
+        Question.__table__.insert(),
+        [
+            {"text": f"Question {i}", "correct_choice": "A", "category_id": category.id}
+            for i in range(size)
+        ],
+    )
+    db.session.commit()
+    question_pool.invalidate()
+    return category.id
+
+
+def time_per_call(fn, runs):
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    return (time.perf_counter() - start) / runs * 1000
+
+
+def bench_size(size, runs):
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+            "SQLALCHEMY_BINDS": {"archive": f"sqlite:///{os.path.join(tmp, 'archive.db')}"},
+            "QUIZ_STATE_BACKEND": "sqlite",
+            "QUIZ_STATE_SQLITE_PATH": os.path.join(tmp, "quiz_state.db"),
+            "AUTO_MIGRATE": True,
+            "TESTING": True,
+        })
+        with app.app_context():
+            category_id = build_bank(size)
+
+            def order_by_random():
+                (
+                    Question.query
+                    .filter_by(category_id=category_id)
+                    .order_by(func.random())
+                    .limit(QUESTIONS_PER_QUIZ)
+                    .all()
+                )
+
+            # Warm the pool so we measure steady-state starts.
+            question_pool.get(category_id)
+            legacy_ms = time_per_call(order_by_random, runs)
+            pool_ms = time_per_call(lambda: question_pool.sample(category_id), runs)
+
+            client = app.test_client()
+            route_ms = time_per_call(
+                lambda: client.post("/quiz/start", data={"category_id": category_id}),
+                runs,
+            )
+            db.engine.dispose()
+    return legacy_ms, pool_ms, route_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'bank size':>10} {'ORDER BY random()':>18} {'pool sample':>12} {'POST /quiz/start':>17}")
+    for size in args.sizes:
+        legacy_ms, pool_ms, route_ms = bench_size(size, args.runs)
+        print(f"{size:>10} {legacy_ms:>15.3f} ms {pool_ms:>9.4f} ms {route_ms:>14.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark batch registration against one chained saga per user.
+
+Registers --users users with start_registration_batch (bulk endpoints,
+parallel chunks) and --sagas users with start_registration_saga, waits for
+both to finish and reports users per second and the projected time for
+10,000 users. Also times password hashing on this machine, which bounds
+what user_service can do per core either way.
+
+Needs Redis, user_service, the quiz service and at least one worker running.
+
+Usage:
+    python bench_saga_batch.py [--users 1000] [--sagas 100] [--timeout 1800]
+"""
+import argparse
+import os
+import time
+import uuid
+
+from werkzeug.security import generate_password_hash
+
+from saga_orchestrator.saga_log import TERMINAL, saga_log
+from saga_orchestrator.tasks import start_registration_batch, start_registration_saga
+
+
+def new_users(count, prefix):
+    run_id = uuid.uuid4().hex[:8]
+    return [
+        {"username": f"{prefix}_{run_id}_{i}", "email": f"{prefix}_{run_id}_{i}@example.com", "password": "bench"}
+        for i in range(count)
+    ]
+
+
+def run_batch(count, timeout):
+    batch_id = str(uuid.uuid4())
+    started = time.perf_counter()
+    start_registration_batch(batch_id, new_users(count, "batch"))
+    while time.perf_counter() < started + timeout:
+        batch = saga_log.get_batch(batch_id)
+        if batch["chunks_done"] == batch["chunks"]:
+            break
+        time.sleep(0.2)
+    created = sum(result["status"] == "created" for result in batch["results"])
+    return time.perf_counter() - started, created
+
+
+def run_sagas(count, timeout):
+    started = time.perf_counter()
+    pending = set()
+    for user in new_users(count, "saga"):
+        saga_id = str(uuid.uuid4())
+        start_registration_saga(saga_id, user)
+        pending.add(saga_id)
+    created = 0
+    while pending and time.perf_counter() < started + timeout:
+        for saga_id in list(pending):
+            status = saga_log.get(saga_id)["status"]
+            if status in TERMINAL:
+                pending.discard(saga_id)
+                created += status == "completed"
+        time.sleep(0.2)
+    return time.perf_counter() - started, created
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=1000, help="users registered as one batch")
+    parser.add_argument("--sagas", type=int, default=100, help="users registered with one saga each")
+    parser.add_argument("--timeout", type=float, default=1800)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    for _ in range(20):
+        generate_password_hash("bench")
+    hash_seconds = (time.perf_counter() - started) / 20
+    print(f"password hash: {hash_seconds * 1000:.0f} ms, {os.cpu_count()} CPU(s) on this machine")
+
+    print(f"{'mode':>6} {'users':>6} {'seconds':>8} {'users/s':>8} {'created':>8} {'10k users':>10}")
+    for mode, count, run in (("saga", args.sagas, run_sagas), ("batch", args.users, run_batch)):
+        if not count:
+            continue
+        seconds, created = run(count, args.timeout)
+        rate = count / seconds
+        print(f"{mode:>6} {count:>6} {seconds:>8.1f} {rate:>8.1f} {created:>8} {10000 / rate:>9.0f}s")
+
+
+if __name__ == "__main__":
+    main()
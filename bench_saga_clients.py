@@ -0,0 +1,51 @@
+"""
+Benchmark saga step HTTP calls with and without the pooled clients.
+
+Sends the same requests to user_service once through module-level
+requests calls (a new TCP connection each time, as the steps used to) and
+once through saga_orchestrator.clients, and reports latency per call.
+GET /health isolates connection cost; POST /users/validate with an unknown
+user is a cheap call that goes through the database.
+
+Needs user_service running, ideally with HTTP/1.1 keep-alive (python user_service/app.py).
+
+Usage:
+    python bench_saga_clients.py [--calls 500]
+"""
+import argparse
+import time
+
+import requests
+
+from saga_orchestrator.clients import USER_SERVICE_URL, user_service
+
+CALLS = {
+    "GET /health": ("GET", "/health", None),
+    "POST /users/validate": ("POST", "/users/validate", {"username": "bench-missing", "password": "x"}),
+}
+
+
+def per_call_ms(fn, calls):
+    fn()  # warm up: the pooled client opens its connection here
+    started = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - started) / calls * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"{'request':>22} {'new connection':>15} {'pooled client':>14}")
+    for name, (method, path, body) in CALLS.items():
+        fresh = per_call_ms(
+            lambda: requests.request(method, f"{USER_SERVICE_URL}{path}", json=body, timeout=10), args.calls
+        )
+        pooled = per_call_ms(lambda: user_service.request(method, path, json=body), args.calls)
+        print(f"{name:>22} {fresh:>12.3f} ms {pooled:>11.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
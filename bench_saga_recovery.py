@@ -0,0 +1,109 @@
+"""
+Measure how long chained registration sagas take to recover from a worker crash.
+
+Starts a Celery worker with embedded beat, submits a burst of sagas, kills
+the worker with SIGKILL part way through, starts a new one and waits until
+every saga is finished in the saga log. Reports how the sagas ended, how many
+went through recovery, the time from the crash until the last saga finished,
+and checks that none left an orphan behind: completed sagas must have a
+profile, compensated ones no user.
+
+Needs Redis, user_service and the quiz service running, and no other worker.
+
+Usage:
+    python bench_saga_recovery.py [--sagas 50] [--kill-after 3] [--stall 15] [--interval 5] [--timeout 300]
+"""
+import argparse
+import collections
+import os
+import signal
+import subprocess
+import sys
+import time
+import uuid
+
+from saga_orchestrator.clients import quiz_service, user_service
+from saga_orchestrator.saga_log import TERMINAL, saga_log
+from saga_orchestrator.tasks import start_registration_saga
+
+
+def start_worker(stall, interval, schedule):
+    env = dict(os.environ, SAGA_STALL_SECONDS=str(stall), SAGA_RECOVERY_INTERVAL=str(interval))
+    return subprocess.Popen(
+        [sys.executable, "-m", "celery", "-A", "saga_orchestrator.celery_app", "worker",
+         "--pool=solo", "--loglevel=warning", "-B", "-s", schedule],
+        env=env, start_new_session=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+def kill(worker):
+    # The embedded beat runs in its own process: take down the whole group.
+    os.killpg(worker.pid, signal.SIGKILL)
+    worker.wait()
+
+
+def orphan(state):
+    user_id = state.get("user_id")
+    if state["status"] == "completed":
+        return quiz_service.get(f"/api/users/{user_id}/profile").status_code != 200
+    if state["status"] == "compensated":
+        return user_service.get(f"/users/{user_id}").status_code != 404
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sagas", type=int, default=50)
+    parser.add_argument("--kill-after", type=float, default=3, help="seconds between submitting and the crash")
+    parser.add_argument("--stall", type=float, default=15, help="SAGA_STALL_SECONDS for the worker")
+    parser.add_argument("--interval", type=float, default=5, help="SAGA_RECOVERY_INTERVAL for the worker")
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    schedule = os.path.join("/tmp", f"bench_saga_recovery_{os.getpid()}")
+    worker = start_worker(args.stall, args.interval, schedule)
+    try:
+        run_id = uuid.uuid4().hex[:8]
+        saga_ids = []
+        for i in range(args.sagas):
+            name = f"recover_{run_id}_{i}"
+            saga_id = str(uuid.uuid4())
+            start_registration_saga(saga_id, {
+                "username": name, "email": f"{name}@example.com", "password": "bench"
+            })
+            saga_ids.append(saga_id)
+
+        time.sleep(args.kill_after)
+        kill(worker)
+        crashed = time.perf_counter()
+        worker = start_worker(args.stall, args.interval, schedule)
+
+        pending = set(saga_ids)
+        while pending and time.perf_counter() < crashed + args.timeout:
+            for saga_id in list(pending):
+                if saga_log.get(saga_id)["status"] in TERMINAL:
+                    pending.discard(saga_id)
+            if pending:
+                time.sleep(0.2)
+        recovered_in = time.perf_counter() - crashed
+    finally:
+        kill(worker)
+        for suffix in ("", ".db", ".dat", ".dir", ".bak"):
+            if os.path.exists(schedule + suffix):
+                os.remove(schedule + suffix)
+
+    states = [saga_log.get(saga_id) for saga_id in saga_ids]
+    outcomes = collections.Counter(state["status"] for state in states)
+    recovered = sum(state["attempt"] > 0 for state in states)
+    orphans = sum(orphan(state) for state in states)
+
+    print(f"{args.sagas} sagas, worker killed after {args.kill_after:g}s, "
+          f"stall {args.stall:g}s, sweep every {args.interval:g}s")
+    print("outcomes: " + ", ".join(f"{status} {count}" for status, count in sorted(outcomes.items())))
+    print(f"recovered: {recovered}, unfinished: {len(pending)}, orphans: {orphans}")
+    print(f"crash to last saga finished: {recovered_in:.1f}s "
+          f"(bound {args.stall + args.interval:g}s plus queue and step time)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark registration saga throughput per Celery worker.
+
+Submits a burst of registration sagas with the chained orchestration
+(start_registration_saga) or the inline one (orchestrate_registration_saga),
+waits until every saga has stored its result and reports sagas per second
+divided by the number of workers that answered a ping.
+
+Needs Redis, user_service, the quiz service and at least one worker running:
+    python -m celery -A saga_orchestrator.celery_app worker --pool=solo
+
+Usage:
+    python bench_saga_throughput.py [--sagas 200] [--modes inline chain] [--timeout 300]
+"""
+import argparse
+import time
+import uuid
+
+from saga_orchestrator.celery_app import celery_app
+from saga_orchestrator.tasks import (
+    orchestrate_registration_saga, saga_result_id, start_registration_saga
+)
+
+
+def submit(mode, saga_id, user_data):
+    if mode == "inline":
+        return orchestrate_registration_saga.apply_async(
+            args=[saga_id, user_data], task_id=saga_result_id(saga_id)
+        ).id
+    return start_registration_saga(saga_id, user_data)
+
+
+def run(mode, sagas, timeout):
+    run_id = uuid.uuid4().hex[:8]
+    started = time.perf_counter()
+    pending = set()
+    for i in range(sagas):
+        name = f"bench_{run_id}_{i}"
+        pending.add(submit(mode, str(uuid.uuid4()), {
+            "username": name, "email": f"{name}@example.com", "password": "bench"
+        }))
+
+    succeeded = 0
+    deadline = started + timeout
+    while pending and time.perf_counter() < deadline:
+        for task_id in list(pending):
+            result = celery_app.AsyncResult(task_id)
+            if result.state == "SUCCESS":
+                pending.discard(task_id)
+                succeeded += bool(result.result.get("success"))
+        if pending:
+            time.sleep(0.05)
+    return time.perf_counter() - started, succeeded, len(pending)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sagas", type=int, default=200)
+    parser.add_argument("--modes", nargs="+", default=["inline", "chain"], choices=["inline", "chain"])
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    workers = len(celery_app.control.ping(timeout=1.0))
+    if not workers:
+        raise SystemExit("no Celery workers answered a ping")
+
+    print(f"{args.sagas} sagas, {workers} worker(s)")
+    print(f"{'mode':>7} {'seconds':>8} {'sagas/s':>8} {'per worker':>11} {'succeeded':>10} {'unfinished':>11}")
+    for mode in args.modes:
+        seconds, succeeded, unfinished = run(mode, args.sagas, args.timeout)
+        rate = (args.sagas - unfinished) / seconds
+        print(f"{mode:>7} {seconds:>8.2f} {rate:>8.1f} {rate / workers:>11.1f} {succeeded:>10} {unfinished:>11}")
+
+
+if __name__ == "__main__":
+    main()
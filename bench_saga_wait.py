@@ -0,0 +1,75 @@
+"""
+Compare registration latency when polling /saga/status with /saga/wait.
+
+Registers users one after another through the saga orchestrator API. Each
+registration either polls /saga/status once a second, as the gateway did,
+or makes a single blocking /saga/wait call. Reports latency from the POST
+until the result is known, and the number of status requests per
+registration.
+
+Needs the orchestrator API, Redis, user_service, the quiz service and a
+worker running.
+
+Usage:
+    python bench_saga_wait.py [--registrations 20] [--url http://127.0.0.1:5002] [--poll-interval 1]
+"""
+import argparse
+import time
+import uuid
+
+import requests
+
+
+def register(session, url):
+    name = f"wait_{uuid.uuid4().hex[:10]}"
+    response = session.post(f"{url}/saga/register", json={
+        "username": name, "email": f"{name}@example.com", "password": "bench"
+    })
+    response.raise_for_status()
+    return response.json()["task_id"]
+
+
+def poll(session, url, task_id, interval):
+    requests_made = 0
+    while True:
+        time.sleep(interval)
+        requests_made += 1
+        if session.get(f"{url}/saga/status/{task_id}").json()["status"] != "PENDING":
+            return requests_made
+
+
+def wait(session, url, task_id, interval):
+    session.get(f"{url}/saga/wait/{task_id}", params={"timeout": 30})
+    return 1
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--registrations", type=int, default=20)
+    parser.add_argument("--url", default="http://127.0.0.1:5002")
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    args = parser.parse_args()
+
+    session = requests.Session()
+    print(f"{args.registrations} registrations per mode")
+    print(f"{'mode':>5} {'p50':>9} {'p95':>9} {'max':>9} {'requests':>9}")
+    for mode, follow in (("poll", poll), ("wait", wait)):
+        latencies, requests_made = [], 0
+        for _ in range(args.registrations):
+            started = time.perf_counter()
+            task_id = register(session, args.url)
+            requests_made += follow(session, args.url, task_id, args.poll_interval)
+            latencies.append(time.perf_counter() - started)
+        print(
+            f"{mode:>5} {percentile(latencies, 0.5):>6.0f} ms {percentile(latencies, 0.95):>6.0f} ms "
+            f"{max(latencies) * 1000:>6.0f} ms {requests_made / args.registrations:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
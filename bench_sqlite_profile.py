@@ -0,0 +1,167 @@
+"""
+Benchmark concurrent reads and writes under each SQLite storage profile.
+
+Writer threads take and submit quizzes while reader threads load history and
+quiz detail pages, all through the Flask test client against a throwaway
+SQLite file. Runs once with SQLite's stock settings ("default", no read-only
+engine) and once with the dbprofile "tuned" pragmas plus the read-only bind,
+and reports throughput, latency percentiles and failed requests.
+
+Usage:
+    python bench_sqlite_profile.py [--seconds 10] [--writers 4] [--readers 8] [--attempts 2000]
+"""
+import argparse
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+
+from dbprofile import PROFILES
+
+from app import create_app, db
+from app.question_packs import load_pack
+from app.quiz.services import (
+    attempt_results, category_cache, question_bundles, question_pool, record_attempt
+)
+
+STARTER_PACK = os.path.join(os.path.dirname(os.path.abspath(__file__)), "question_packs", "starter.json")
+ANSWER = re.compile(rb'name="answer_(\d+)"\s+value="(\d+)"')
+USERS = 50
+
+
+def reset_caches():
+    question_pool.invalidate()
+    question_bundles.evict()
+    attempt_results.clear()
+    category_cache.invalidate()
+
+
+def seed_attempts(count):
+    """Give every bench user some history so reads have pages to scan."""
+    categories = [category.id for category in category_cache.all()]
+    attempt_ids = {}
+    for i in range(count):
+        user_id = i % USERS + 1
+        category_id = categories[i % len(categories)]
+        question_ids = question_pool.sample(category_id)
+        attempt = record_attempt(category_id, user_id, None, question_ids, {})
+        attempt_ids.setdefault(user_id, []).append(attempt.id)
+    return attempt_ids
+
+
+def take_quiz(client, headers, category_id):
+    client.post("/quiz/start", data={"category_id": category_id}, headers=headers)
+    for index in range(1, 6):
+        page = client.get(f"/quiz/question/{index}", headers=headers)
+        match = ANSWER.search(page.data)
+        client.post(
+            f"/quiz/question/{index}",
+            data={f"answer_{int(match.group(1))}": int(match.group(2))},
+            headers=headers
+        )
+    return client.post("/quiz/submit", headers=headers)
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] * 1000
+
+
+def run_profile(name, seconds, writers, readers, attempts):
+    reset_caches()
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+            "SQLALCHEMY_BINDS": {"archive": f"sqlite:///{os.path.join(tmp, 'archive.db')}"},
+            "QUIZ_STATE_BACKEND": "sqlite",
+            "QUIZ_STATE_SQLITE_PATH": os.path.join(tmp, "quiz_state.db"),
+            "SQLITE_PRAGMAS": PROFILES[name],
+            "SQLITE_READ_BIND": name != "default",
+            "AUTO_MIGRATE": True,
+            "TESTING": True,
+        })
+        with app.app_context():
+            load_pack(STARTER_PACK)
+            attempt_ids = seed_attempts(attempts)
+            categories = [category.id for category in category_cache.all()]
+
+        stop = time.perf_counter() + seconds
+        latencies = {"submit": [], "history": [], "detail": []}
+        failures = {"submit": 0, "history": 0, "detail": 0}
+        lock = threading.Lock()
+
+        def record(kind, started, ok):
+            elapsed = time.perf_counter() - started
+            with lock:
+                if ok:
+                    latencies[kind].append(elapsed)
+                else:
+                    failures[kind] += 1
+
+        def writer(number):
+            client = app.test_client()
+            headers = {"X-User-Id": str(number % USERS + 1)}
+            while time.perf_counter() < stop:
+                started = time.perf_counter()
+                try:
+                    ok = take_quiz(client, headers, random.choice(categories)).status_code == 302
+                except Exception:
+                    ok = False
+                record("submit", started, ok)
+
+        def reader(number):
+            client = app.test_client()
+            user_id = number % USERS + 1
+            headers = {"X-User-Id": str(user_id)}
+            while time.perf_counter() < stop:
+                for kind, url in (
+                    ("history", "/history"),
+                    ("detail", f"/quiz/detail/{random.choice(attempt_ids[user_id])}"),
+                ):
+                    started = time.perf_counter()
+                    try:
+                        ok = client.get(url, headers=headers).status_code == 200
+                    except Exception:
+                        ok = False
+                    record(kind, started, ok)
+
+        threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+        threads += [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose()
+    return latencies, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--attempts", type=int, default=2000, help="attempts seeded before the run")
+    parser.add_argument("--profiles", nargs="+", default=["default", "tuned"], choices=sorted(PROFILES))
+    args = parser.parse_args()
+
+    print(f"{args.writers} writers, {args.readers} readers, {args.seconds:g}s per profile")
+    print(f"{'profile':>8} {'request':>8} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'failed':>7}")
+    for name in args.profiles:
+        latencies, failures = run_profile(name, args.seconds, args.writers, args.readers, args.attempts)
+        for kind, values in latencies.items():
+            print(
+                f"{name:>8} {kind:>8} {len(values) / args.seconds:>8.1f} "
+                f"{percentile(values, 0.5):>6.1f} ms {percentile(values, 0.95):>6.1f} ms "
+                f"{percentile(values, 0.99):>6.1f} ms {failures[kind]:>7}"
+            )
+
+
+if __name__ == "__main__":
+    main()
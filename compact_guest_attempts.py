@@ -0,0 +1,47 @@
+"""
+Retention job for orphaned guest quiz attempts.
+Deletes guest attempts (and their answers and stats) whose session has been idle
+longer than the retention window. Run it once, or keep it running in the
+background with --interval.
+
+Usage:
+    python compact_guest_attempts.py [--retention-days 30] [--batch-size 500]
+                                     [--dry-run] [--vacuum] [--interval SECONDS]
+"""
+import argparse
+import json
+import time
+
+from sqlalchemy import text
+
+from app import create_app, db
+from app.retention import compact_guest_attempts, DEFAULT_RETENTION_DAYS, DEFAULT_BATCH_SIZE
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--retention-days", type=int, default=DEFAULT_RETENTION_DAYS)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="report what would be removed")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM afterwards to shrink the file")
+    parser.add_argument("--interval", type=int, default=0, help="repeat every N seconds")
+    args = parser.parse_args()
+
+    app = create_app()
+
+    while True:
+        with app.app_context():
+            report = compact_guest_attempts(args.retention_days, args.batch_size, args.dry_run)
+            if args.vacuum and not args.dry_run and report["attempts"]:
+                with db.engine.connect() as conn:
+                    conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM"))
+                report["vacuumed"] = True
+            print(json.dumps(report))
+
+        if not args.interval:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
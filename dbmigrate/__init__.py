@@ -0,0 +1,426 @@
+"""
+Versioned schema migrations shared by the quiz service and user_service.
+
+Each service keeps its migrations in a directory of NNNN_name.py files. A
+migration module defines upgrade(ctx), and the first line of its docstring is
+the description. Applied versions are recorded in a schema_migrations table in
+the migrated database.
+
+Migrations run online: there is no transaction around a whole migration.
+Every step commits on its own, and data backfills update one key range at a
+time with a pause between batches, so the write lock is released and the app
+keeps serving while a large table is converted. A migration interrupted
+halfway is simply run again, so every step must be idempotent. The
+MigrationContext helpers (create_table, add_column, create_index, backfill)
+already are.
+
+With dry_run, nothing is written. Each pending migration reports an estimate
+of the rows it would touch.
+
+Only one process upgrades a database at a time: upgrade() takes a lock row
+in schema_migrations_lock and decides what is pending only once it holds it,
+so workers started together never run the same migration twice. The holder
+refreshes the row while it works; a lock not refreshed for LOCK_STALE
+seconds was left by a crashed process and is taken over.
+"""
+import importlib.util
+import logging
+import os
+import re
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+from sqlalchemy.exc import IntegrityError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_PAUSE = 0.05  # seconds between backfill batches
+LOCK_WAIT = 600  # seconds to wait for another process's upgrade
+LOCK_HEARTBEAT = 15
+LOCK_STALE = 120
+MIGRATION_FILE = re.compile(r"^(\d{4})_(\w+)\.py$")
+
+
+class Migration:
+    def __init__(self, version: str, name: str, path: str):
+        self.version = version
+        self.name = name
+        self.path = path
+        self._module = None
+
+    @property
+    def module(self):
+        if self._module is None:
+            spec = importlib.util.spec_from_file_location(
+                f"migration_{self.version}_{self.name}", self.path
+            )
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            self._module = module
+        return self._module
+
+    @property
+    def description(self) -> str:
+        doc = (self.module.__doc__ or "").strip()
+        return doc.splitlines()[0] if doc else self.name
+
+    def __repr__(self):
+        return f"<Migration {self.version}_{self.name}>"
+
+
+class MigrationContext:
+    """Idempotent schema and data helpers handed to upgrade(ctx)."""
+
+    def __init__(self, engine, dry_run: bool = False,
+                 batch_size: int = DEFAULT_BATCH_SIZE, pause: float = DEFAULT_PAUSE):
+        self.engine = engine
+        self.dialect = engine.dialect.name
+        self.dry_run = dry_run
+        self.batch_size = batch_size
+        self.pause = pause
+        self.rows = 0
+        self.steps = []
+
+    def note(self, description: str, rows: int = 0):
+        """Record a step and the rows it touches (or would touch, in a dry run)."""
+        self.rows += rows
+        self.steps.append(description)
+        logger.info(("[dry run] " if self.dry_run else "") + description)
+
+    # Introspection
+
+    def has_table(self, table: str) -> bool:
+        return sa.inspect(self.engine).has_table(table)
+
+    def has_column(self, table: str, column: str) -> bool:
+        if not self.has_table(table):
+            return False
+        return column in {c["name"] for c in sa.inspect(self.engine).get_columns(table)}
+
+    def foreign_key_columns(self, table: str) -> set:
+        if not self.has_table(table):
+            return set()
+        return {
+            column
+            for fk in sa.inspect(self.engine).get_foreign_keys(table)
+            for column in fk["constrained_columns"]
+        }
+
+    def scalar(self, sql: str, **params):
+        with self.engine.connect() as conn:
+            return conn.execute(sa.text(sql), params).scalar()
+
+    def count(self, table: str, where: str = "1 = 1", **params) -> int:
+        if not self.has_table(table):
+            return 0
+        return self.scalar(f"SELECT COUNT(*) FROM {table} WHERE {where}", **params) or 0
+
+    # Schema changes
+
+    def execute(self, sql: str, rows: int = 0, **params):
+        """Run one statement in its own transaction."""
+        self.note(sql, rows)
+        if self.dry_run:
+            return None
+        with self.engine.begin() as conn:
+            return conn.execute(sa.text(sql), params).rowcount
+
+    def create_table(self, table: sa.Table) -> bool:
+        """Create a table and its indexes unless it exists. Returns True if created."""
+        if self.has_table(table.name):
+            return False
+        self.note(f"create table {table.name}")
+        if not self.dry_run:
+            table.create(self.engine, checkfirst=True)
+        return True
+
+    def add_column(self, table: str, column: str, ddl: str) -> bool:
+        """ALTER TABLE ... ADD COLUMN unless it exists. Returns True if added."""
+        if self.has_column(table, column):
+            return False
+        self.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+        return True
+
+    def create_index(self, name: str, table: str, columns, unique: bool = False):
+        columns = ", ".join([columns] if isinstance(columns, str) else columns)
+        self.execute(
+            f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} ON {table} ({columns})"
+        )
+
+    @contextmanager
+    def transaction(self, conn=None):
+        """
+        One explicit transaction for steps that must be atomic.
+
+        On SQLite the driver leaves DDL outside its implicit transactions, so
+        BEGIN IMMEDIATE is issued by hand. Yields a Connection (conn, or a new
+        one), or None in a dry run.
+        """
+        if self.dry_run:
+            yield None
+            return
+        if conn is None:
+            with self.engine.connect() as conn:
+                with self.transaction(conn) as tx:
+                    yield tx
+            return
+
+        if self.dialect == "sqlite":
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except Exception:
+            conn.rollback()
+            raise
+        conn.commit()
+
+    def rebuild_table(self, table: sa.Table):
+        """
+        Recreate a SQLite table with a new definition, keeping its rows.
+
+        For changes SQLite cannot ALTER, such as adding foreign keys: the new
+        table is created alongside, rows are copied, the old table dropped
+        and the new one renamed, all in one transaction. Indexes are dropped
+        with the old table; recreate them with create_index afterwards.
+        """
+        rows = self.count(table.name)
+        self.note(f"rebuild table {table.name}", rows)
+        if self.dry_run:
+            return
+
+        existing = {c["name"] for c in sa.inspect(self.engine).get_columns(table.name)}
+        dropped = existing - {c.name for c in table.columns}
+        if dropped:
+            raise RuntimeError(f"rebuilding {table.name} would drop columns {sorted(dropped)}")
+
+        staging = table.to_metadata(table.metadata, name=f"{table.name}__new")
+        columns = ", ".join(c.name for c in table.columns if c.name in existing)
+
+        with self.engine.connect() as conn:
+            # Has no effect inside a transaction, so it is switched before BEGIN.
+            foreign_keys = conn.exec_driver_sql("PRAGMA foreign_keys").scalar()
+            conn.exec_driver_sql("PRAGMA foreign_keys=OFF")
+            conn.commit()
+            try:
+                with self.transaction(conn) as tx:
+                    staging.create(tx)
+                    tx.exec_driver_sql(
+                        f"INSERT INTO {staging.name} ({columns}) SELECT {columns} FROM {table.name}"
+                    )
+                    tx.exec_driver_sql(f"DROP TABLE {table.name}")
+                    tx.exec_driver_sql(f"ALTER TABLE {staging.name} RENAME TO {table.name}")
+                    problems = tx.exec_driver_sql(f"PRAGMA foreign_key_check({table.name})").fetchall()
+                    if problems:
+                        raise RuntimeError(f"foreign key check failed for {len(problems)} rows of {table.name}")
+            finally:
+                table.metadata.remove(staging)
+                conn.exec_driver_sql(f"PRAGMA foreign_keys={'ON' if foreign_keys else 'OFF'}")
+                conn.commit()
+
+    # Data changes
+
+    def backfill(self, table: str, assignments: str, where: str, key: str = "id", **params) -> int:
+        """
+        UPDATE table SET assignments WHERE where, one key range at a time.
+
+        Each range of batch_size keys is its own transaction, followed by a
+        short pause so other writers get the lock. where must stop matching
+        rows once they are updated, so an interrupted backfill resumes
+        cleanly. Returns the rows updated (estimated in a dry run).
+        """
+        if self.dry_run:
+            estimate = self.count(table, where, **params)
+            self.note(f"backfill {table}: SET {assignments} WHERE {where}", estimate)
+            return estimate
+
+        with self.engine.connect() as conn:
+            low, high = conn.execute(
+                sa.text(f"SELECT MIN({key}), MAX({key}) FROM {table} WHERE {where}"), params
+            ).one()
+
+        updated = 0
+        if low is not None:
+            statement = sa.text(
+                f"UPDATE {table} SET {assignments} "
+                f"WHERE {key} >= :_low AND {key} < :_high AND ({where})"
+            )
+            for start in range(low, high + 1, self.batch_size):
+                with self.engine.begin() as conn:
+                    result = conn.execute(statement, dict(params, _low=start, _high=start + self.batch_size))
+                updated += result.rowcount
+                if self.pause:
+                    time.sleep(self.pause)
+        self.note(f"backfill {table}: SET {assignments} WHERE {where}", updated)
+        return updated
+
+
+class MigrationRunner:
+    """Discovers, records and applies the migrations in one directory against one engine."""
+
+    TABLE = "schema_migrations"
+    LOCK_TABLE = "schema_migrations_lock"
+
+    def __init__(self, engine, directory: str):
+        self.engine = engine
+        self.directory = directory
+        metadata = sa.MetaData()
+        self.table = sa.Table(
+            self.TABLE, metadata,
+            sa.Column("version", sa.String(32), primary_key=True),
+            sa.Column("name", sa.String(255), nullable=False),
+            sa.Column("applied_at", sa.DateTime, nullable=False),
+            sa.Column("rows_touched", sa.Integer, nullable=False, default=0),
+        )
+        self.lock_table = sa.Table(
+            self.LOCK_TABLE, metadata,
+            sa.Column("name", sa.String(32), primary_key=True),
+            sa.Column("holder", sa.String(255), nullable=False),
+            sa.Column("heartbeat_at", sa.DateTime, nullable=False),
+        )
+
+    def migrations(self) -> list:
+        found = []
+        for filename in sorted(os.listdir(self.directory)):
+            match = MIGRATION_FILE.match(filename)
+            if match:
+                found.append(Migration(match.group(1), match.group(2), os.path.join(self.directory, filename)))
+        return found
+
+    def applied(self) -> dict:
+        if not sa.inspect(self.engine).has_table(self.TABLE):
+            return {}
+        with self.engine.connect() as conn:
+            return {row.version: row for row in conn.execute(sa.select(self.table))}
+
+    def pending(self, target: str = None) -> list:
+        applied = self.applied()
+        return [
+            m for m in self.migrations()
+            if m.version not in applied and (target is None or m.version <= target)
+        ]
+
+    def status(self) -> list:
+        applied = self.applied()
+        return [
+            {
+                "version": m.version,
+                "name": m.name,
+                "description": m.description,
+                "applied_at": applied[m.version].applied_at.isoformat() if m.version in applied else None,
+            }
+            for m in self.migrations()
+        ]
+
+    def _create(self, table: sa.Table):
+        """CREATE TABLE unless it exists, tolerating another process creating it first."""
+        try:
+            table.create(self.engine, checkfirst=True)
+        except sa.exc.DatabaseError:
+            if not sa.inspect(self.engine).has_table(table.name):
+                raise
+
+    def _try_lock(self, holder: str) -> bool:
+        now = datetime.utcnow()
+        with self.engine.begin() as conn:
+            conn.execute(self.lock_table.delete().where(
+                self.lock_table.c.name == "upgrade",
+                self.lock_table.c.heartbeat_at < now - timedelta(seconds=LOCK_STALE),
+            ))
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(self.lock_table.insert().values(name="upgrade", holder=holder, heartbeat_at=now))
+        except IntegrityError:
+            return False
+        return True
+
+    def _heartbeat(self, holder: str, stop: threading.Event):
+        while not stop.wait(LOCK_HEARTBEAT):
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(
+                        self.lock_table.update()
+                        .where(self.lock_table.c.holder == holder)
+                        .values(heartbeat_at=datetime.utcnow())
+                    )
+            except sa.exc.SQLAlchemyError as e:
+                logger.warning(f"Could not refresh the migration lock: {e}")
+
+    @contextmanager
+    def lock(self, wait: float = LOCK_WAIT):
+        """Hold the upgrade lock for this database, waiting up to wait seconds for it."""
+        self._create(self.lock_table)
+        holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        deadline = time.monotonic() + wait
+        while not self._try_lock(holder):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"another process has held the migration lock for over {wait:g}s")
+            logger.info("Waiting for another process to finish migrating")
+            time.sleep(0.5)
+
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(holder, stop), daemon=True)
+        heartbeat.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            heartbeat.join()
+            with self.engine.begin() as conn:
+                conn.execute(self.lock_table.delete().where(self.lock_table.c.holder == holder))
+
+    def upgrade(self, target: str = None, dry_run: bool = False,
+                batch_size: int = DEFAULT_BATCH_SIZE, pause: float = DEFAULT_PAUSE) -> list:
+        """
+        Apply pending migrations in version order, up to target if given.
+
+        Holds the upgrade lock throughout (except in a dry run) and only then
+        reads what is pending, so a migration another process finished while
+        this one waited is not run again.
+
+        Returns one report per migration with the rows touched (estimated in
+        a dry run) and the steps taken.
+        """
+        if dry_run:
+            return self._apply(target, dry_run, batch_size, pause)
+
+        self._create(self.table)
+        with self.lock():
+            return self._apply(target, dry_run, batch_size, pause)
+
+    def _apply(self, target, dry_run, batch_size, pause) -> list:
+        reports = []
+        for migration in self.pending(target):
+            ctx = MigrationContext(self.engine, dry_run=dry_run, batch_size=batch_size, pause=pause)
+            started = time.perf_counter()
+            logger.info(f"{'Planning' if dry_run else 'Applying'} migration {migration.version}_{migration.name}")
+            migration.module.upgrade(ctx)
+
+            if not dry_run:
+                try:
+                    with self.engine.begin() as conn:
+                        conn.execute(self.table.insert().values(
+                            version=migration.version,
+                            name=migration.name,
+                            applied_at=datetime.utcnow(),
+                            rows_touched=ctx.rows,
+                        ))
+                except IntegrityError:
+                    # Applied meanwhile by a process that does not take the lock
+                    # (an older release); the steps are idempotent.
+                    logger.info(f"Migration {migration.version} was recorded by another process")
+
+            reports.append({
+                "version": migration.version,
+                "name": migration.name,
+                "dry_run": dry_run,
+                "rows": ctx.rows,
+                "steps": ctx.steps,
+                "seconds": round(time.perf_counter() - started, 3),
+            })
+        return reports
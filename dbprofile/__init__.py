@@ -0,0 +1,255 @@
+"""
+Database engine configuration shared by the quiz service and user_service.
+
+engine_options() builds pool and cache settings for any database URL from
+DB_* variables (see ENGINE_ENV). Pooled engines use TimedQueuePool, which
+counts how long requests waited for a connection; pool_stats() reports it.
+
+The rest of this module is the SQLite storage profile.
+
+With SQLite's stock settings (rollback journal, synchronous=FULL) a
+writer locks out every reader while it commits, so concurrent
+submissions stall history and detail pages. The "tuned" profile switches
+the database to WAL, where readers never wait for the writer, relaxes fsync
+to synchronous=NORMAL (still durable against application crashes, and
+consistent after power loss) and enlarges the page cache and memory map.
+
+Pragmas are applied to every new connection through a connect event hook.
+SQLITE_PROFILE picks the base profile ("tuned" or "default"); each pragma
+can then be overridden on its own with SQLITE_JOURNAL_MODE,
+SQLITE_SYNCHRONOUS, SQLITE_MMAP_SIZE, SQLITE_CACHE_SIZE and
+SQLITE_BUSY_TIMEOUT (an empty value leaves that pragma at SQLite's default).
+
+Read-only views can also be served from a separate read-only engine on the
+same file. Register it as the READ_BIND bind (see read_only_url), build the
+SQLAlchemy object with session_options={"class_": RoutingSession}, register
+clear_read_only with app.teardown_request and decorate the views with
+read_only.
+"""
+import functools
+import os
+import threading
+import time
+
+from flask import g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import QueuePool
+
+READ_BIND = "read"
+
+# Engine option: (environment variable, default, type).
+ENGINE_ENV = {
+    "pool_size": ("DB_POOL_SIZE", 10, int),
+    "max_overflow": ("DB_MAX_OVERFLOW", 20, int),
+    "pool_timeout": ("DB_POOL_TIMEOUT", 30, float),
+    "pool_recycle": ("DB_POOL_RECYCLE", 1800, int),
+    "pool_pre_ping": ("DB_POOL_PRE_PING", True, lambda value: value.lower() not in ("0", "false", "no")),
+    "query_cache_size": ("DB_STATEMENT_CACHE_SIZE", 500, int),
+}
+POOL_OPTIONS = {"pool_size", "max_overflow", "pool_timeout", "pool_recycle"}
+
+PROFILES = {
+    "default": {},
+    "tuned": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -32000,  # negative: KiB, so 32 MB
+        "busy_timeout": 5000,  # milliseconds
+    },
+}
+
+ENV_OVERRIDES = {
+    "journal_mode": "SQLITE_JOURNAL_MODE",
+    "synchronous": "SQLITE_SYNCHRONOUS",
+    "mmap_size": "SQLITE_MMAP_SIZE",
+    "cache_size": "SQLITE_CACHE_SIZE",
+    "busy_timeout": "SQLITE_BUSY_TIMEOUT",
+}
+
+
+def is_memory_sqlite(url) -> bool:
+    url = make_url(url)
+    return url.get_backend_name() == "sqlite" and (
+        url.database in (None, "", ":memory:") or url.query.get("mode") == "memory"
+    )
+
+
+def engine_options(url, environ=os.environ) -> dict:
+    """
+    create_engine() options for url from the DB_* variables in ENGINE_ENV.
+
+    In-memory SQLite keeps Flask-SQLAlchemy's single static connection, so
+    only the options that apply to any pool are set for it.
+    """
+    options = {}
+    for name, (variable, default, convert) in ENGINE_ENV.items():
+        value = environ.get(variable, "").strip()
+        options[name] = convert(value) if value else default
+
+    if is_memory_sqlite(url):
+        for name in POOL_OPTIONS:
+            options.pop(name)
+    else:
+        options["poolclass"] = TimedQueuePool
+    return options
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    def __init__(self, *args, max_overflow: int = 10, **kwargs):
+        super().__init__(*args, max_overflow=max_overflow, **kwargs)
+        self.max_overflow = max_overflow
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeout:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_seconds += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+
+def pool_stats(engines: dict) -> dict:
+    """Connection pool usage per bind ("default" for the main database)."""
+    stats = {}
+    for bind_key, engine in engines.items():
+        pool = engine.pool
+        entry = {"pool": type(pool).__name__}
+        if isinstance(pool, QueuePool):
+            entry.update({
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "timeout": pool.timeout(),
+            })
+        if isinstance(pool, TimedQueuePool):
+            with pool._stats_lock:
+                entry.update({
+                    "max_overflow": pool.max_overflow,
+                    "checkouts": pool.checkouts,
+                    "timeouts": pool.timeouts,
+                    "wait_ms_avg": round(pool.wait_seconds / pool.checkouts * 1000, 3) if pool.checkouts else 0.0,
+                    "wait_ms_max": round(pool.max_wait_seconds * 1000, 3),
+                })
+        stats[bind_key or "default"] = entry
+    return stats
+
+
+def pragmas_from_env(environ=os.environ) -> dict:
+    """The pragmas selected by SQLITE_PROFILE and the per-pragma overrides."""
+    profile = environ.get("SQLITE_PROFILE", "tuned")
+    if profile not in PROFILES:
+        raise ValueError(f"unknown SQLITE_PROFILE {profile!r}; expected one of {', '.join(PROFILES)}")
+
+    pragmas = dict(PROFILES[profile])
+    for name, variable in ENV_OVERRIDES.items():
+        if variable in environ:
+            value = environ[variable].strip()
+            if value:
+                pragmas[name] = value
+            else:
+                pragmas.pop(name, None)
+    return pragmas
+
+
+def apply_pragmas(engine, pragmas: dict, read_only: bool = False) -> bool:
+    """
+    Run the pragmas on every new connection of a SQLite engine.
+
+    Read-only connections skip journal_mode, which they cannot change, and
+    add query_only as a second guard against writes. Returns False, doing
+    nothing, for other databases.
+    """
+    if engine.dialect.name != "sqlite":
+        return False
+
+    statements = [
+        f"PRAGMA {name}={value}"
+        for name, value in pragmas.items()
+        if not (read_only and name == "journal_mode")
+    ]
+    if read_only:
+        statements.append("PRAGMA query_only=ON")
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+    return True
+
+
+def read_only_url(url: str, base_dir: str):
+    """
+    URL opening the same SQLite file read-only, or None if there is no file.
+
+    Relative paths are resolved against base_dir, as Flask-SQLAlchemy does
+    with the instance path. In-memory databases and other dialects return
+    None: a second engine would not see the same data.
+    """
+    url = make_url(url)
+    if url.get_backend_name() != "sqlite" or is_memory_sqlite(url) or url.database.startswith("file:"):
+        return None
+
+    path = url.database
+    if not os.path.isabs(path):
+        path = os.path.join(base_dir, path)
+    return url.set(database=f"file:{path}", query=dict(url.query, mode="ro", uri="true")).render_as_string()
+
+
+class RoutingSession(Session):
+    """
+    Flask-SQLAlchemy session that sends a read_only view's default-bind
+    queries to the READ_BIND engine when one is configured.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if bind is None and has_app_context() and g.get("read_only_db"):
+            engines = self._db.engines
+            if READ_BIND in engines and engine is engines.get(None):
+                return engines[READ_BIND]
+        return engine
+
+
+def read_only(view):
+    """
+    Serve a view's queries from the read-only engine. The view must not write.
+
+    The flag lives on g for the rest of the request, so streamed responses
+    keep reading from the same engine, and clear_read_only drops it when
+    the request is torn down: a later request in the same app context (a
+    test client inside app.app_context(), a CLI command) writes normally.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        g.read_only_db = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def clear_read_only(exc=None):
+    """teardown_request handler ending read_only routing with the request."""
+    g.pop("read_only_db", None)
@@ -0,0 +1,46 @@
+"""
+Export quiz data as NDJSON for analytics.
+
+Streams categories, questions (with choices) or attempts (with answers) in
+id order with flat memory use. Resume an interrupted export with --since-id
+set to the last id written; limit attempts with --from/--to.
+
+Usage:
+    python export_data.py {categories,questions,attempts} [-o FILE] [--gzip]
+                          [--since-id ID] [--from ISO_DATE] [--to ISO_DATE]
+"""
+import argparse
+import sys
+from datetime import datetime
+
+from app import create_app
+from app.export import DATASETS, gzip_chunks, iter_dataset, ndjson_chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("dataset", choices=DATASETS)
+    parser.add_argument("-o", "--output", help="file to write (default: stdout)")
+    parser.add_argument("--gzip", action="store_true", help="gzip the output")
+    parser.add_argument("--since-id", type=int, help="only records with a greater id")
+    parser.add_argument("--from", dest="start", type=datetime.fromisoformat, help="attempts created at or after")
+    parser.add_argument("--to", dest="end", type=datetime.fromisoformat, help="attempts created before")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        chunks = ndjson_chunks(iter_dataset(args.dataset, args.since_id, args.start, args.end))
+        if args.gzip:
+            chunks = gzip_chunks(chunks)
+
+        out = open(args.output, "wb") if args.output else sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                out.write(chunk)
+        finally:
+            if args.output:
+                out.close()
+
+
+if __name__ == "__main__":
+    main()
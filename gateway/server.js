@@ -11,6 +11,8 @@ const JWT_SECRET = 'your-secret-key-change-in-production';
 const USER_SERVICE_URL = 'http://localhost:5001';
 const QUIZ_SERVICE_URL = 'http://localhost:5000';
 const SAGA_ORCHESTRATOR_URL = 'http://localhost:5002';
+// How long /auth/register waits for the registration saga before answering 202.
+const SAGA_WAIT_SECONDS = 30;
 
 // CORS middleware - allow requests from Flask app with credentials
 // CRITICAL: Cannot use '*' with credentials: true - must specify exact origin
@@ -153,80 +155,75 @@ app.post('/auth/register', async (req, res) => {
     const { saga_id, task_id } = sagaResponse.data;
     console.log(`Saga started: ${saga_id}, Task ID: ${task_id}`);
 
-    // Poll for saga completion (with timeout)
-    const maxAttempts = 30; // 30 attempts
-    const pollInterval = 1000; // 1 second
-    let attempts = 0;
-
-    while (attempts < maxAttempts) {
-      await new Promise(resolve => setTimeout(resolve, pollInterval));
-      
-      try {
-        const statusResponse = await axios.get(`${SAGA_ORCHESTRATOR_URL}/saga/status/${task_id}`);
-        const { status, result, error } = statusResponse.data;
-
-        if (status === 'SUCCESS') {
-          // Saga completed successfully
-          // The saga returns: { success: true, saga_id: ..., result: { user: ..., profile: ... } }
-          const sagaResult = result?.result || result;
-          const user = sagaResult?.user;
-          
-          if (!user) {
-            console.error('Saga result structure:', JSON.stringify(result, null, 2));
-            return res.status(500).json({ 
-              error: 'Saga completed but no user data returned',
-              debug: { result, sagaResult }
-            });
-          }
-
-          // Sign JWT with user info
-          const token = jwt.sign(
-            { 
-              sub: user.id.toString(),
-              userId: user.id,
-              username: user.username 
-            },
-            JWT_SECRET,
-            { expiresIn: '24h' }
-          );
-
-          // Set token in cookie for navigation
-          // CRITICAL: Set cookie with proper settings for cross-origin requests
-          res.cookie('authToken', token, { 
-            httpOnly: false, 
-            maxAge: 24 * 60 * 60 * 1000,
-            path: '/',
-            sameSite: 'lax'  // Allow cookie to be sent with cross-site requests
-          });
-          
-          console.log(`Registration Saga completed successfully for user: ${username}`);
-          return res.status(201).json({ 
-            token, 
-            user,
-            saga_id,
-            message: 'Registration completed via Saga Orchestrator'
-          });
-        } else if (status === 'FAILURE') {
-          // Saga failed - check if compensation was executed
-          const errorMsg = error || result?.error || 'Registration saga failed';
-          const compensationExecuted = result?.compensation?.executed || false;
-          
-          console.error(`Registration Saga failed: ${errorMsg}`);
-          console.log(`Compensation executed: ${compensationExecuted}`);
-          
-          return res.status(400).json({ 
-            error: errorMsg,
-            saga_id,
-            compensation_executed: compensationExecuted,
-            message: 'Registration failed - transaction rolled back via Saga compensation'
+    // Wait for the saga to finish: the orchestrator holds the request open
+    // and answers as soon as the result is stored, instead of us polling.
+    try {
+      const statusResponse = await axios.get(`${SAGA_ORCHESTRATOR_URL}/saga/wait/${task_id}`, {
+        params: { timeout: SAGA_WAIT_SECONDS },
+        timeout: (SAGA_WAIT_SECONDS + 5) * 1000
+      });
+      const { status, result, error } = statusResponse.data;
+      // Failed sagas store their result as a successful task with success: false.
+      const failed = status === 'FAILURE' || result?.success === false;
+      if (status === 'SUCCESS' && !failed) {
+        // Saga completed successfully
+        // The saga returns: { success: true, saga_id: ..., result: { user: ..., profile: ... } }
+        const sagaResult = result?.result || result;
+        const user = sagaResult?.user;
+        
+        if (!user) {
+          console.error('Saga result structure:', JSON.stringify(result, null, 2));
+          return res.status(500).json({ 
+            error: 'Saga completed but no user data returned',
+            debug: { result, sagaResult }
           });
         }
-        // Status is PENDING, continue polling
-        attempts++;
-      } catch (pollError) {
-        console.error(`Error polling saga status: ${pollError.message}`);
-        attempts++;
+
+        // Sign JWT with user info
+        const token = jwt.sign(
+          { 
+            sub: user.id.toString(),
+            userId: user.id,
+            username: user.username 
+          },
+          JWT_SECRET,
+          { expiresIn: '24h' }
+        );
+
+        // Set token in cookie for navigation
+        // CRITICAL: Set cookie with proper settings for cross-origin requests
+        res.cookie('authToken', token, { 
+          httpOnly: false, 
+          maxAge: 24 * 60 * 60 * 1000,
+          path: '/',
+          sameSite: 'lax'  // Allow cookie to be sent with cross-site requests
+        });
+        
+        console.log(`Registration Saga completed successfully for user: ${username}`);
+        return res.status(201).json({ 
+          token, 
+          user,
+          saga_id,
+          message: 'Registration completed via Saga Orchestrator'
+        });
+      } else if (failed) {
+        // Saga failed - check if compensation was executed
+        const errorMsg = error || result?.error || 'Registration saga failed';
+        const compensationExecuted = result?.compensation?.executed || false;
+        
+        console.error(`Registration Saga failed: ${errorMsg}`);
+        console.log(`Compensation executed: ${compensationExecuted}`);
+        
+        return res.status(400).json({ 
+          error: errorMsg,
+          saga_id,
+          compensation_executed: compensationExecuted,
+          message: 'Registration failed - transaction rolled back via Saga compensation'
+        });
       }
+      // Still PENDING after SAGA_WAIT_SECONDS
+    } catch (waitError) {
+      console.error(`Error waiting for saga status: ${waitError.message}`);
     }
 
     // Timeout - saga took too long
@@ -235,7 +232,7 @@ app.post('/auth/register', async (req, res) => {
       saga_id,
       task_id,
       status: 'pending',
-      message: 'Registration is being processed asynchronously. Use /auth/register/status/<task_id> to check status.',
+      message: 'Registration is being processed asynchronously. Use /auth/register/status/<task_id>?wait=<seconds> to check status.',
       status_url: `/auth/register/status/${task_id}`
     });
 
@@ -255,11 +252,19 @@ app.post('/auth/register', async (req, res) => {
 app.get('/auth/register/status/:task_id', async (req, res) => {
   try {
     const { task_id } = req.params;
+    // ?wait=<seconds> blocks until the saga finishes instead of answering at once.
+    const wait = Math.min(Number(req.query.wait) || 0, SAGA_WAIT_SECONDS);
     
-    const statusResponse = await axios.get(`${SAGA_ORCHESTRATOR_URL}/saga/status/${task_id}`);
+    const statusResponse = wait > 0
+      ? await axios.get(`${SAGA_ORCHESTRATOR_URL}/saga/wait/${task_id}`, {
+          params: { timeout: wait },
+          timeout: (wait + 5) * 1000
+        })
+      : await axios.get(`${SAGA_ORCHESTRATOR_URL}/saga/status/${task_id}`);
     const { status, result, error } = statusResponse.data;
+    const failed = status === 'FAILURE' || result?.success === false;
     
-    if (status === 'SUCCESS') {
+    if (status === 'SUCCESS' && !failed) {
       const sagaResult = result?.result || result;
       const user = sagaResult?.user;
       
@@ -296,7 +301,7 @@ app.get('/auth/register/status/:task_id', async (req, res) => {
         user,
         message: 'Registration completed successfully'
       });
-    } else if (status === 'FAILURE') {
+    } else if (failed) {
       const errorMsg = error || result?.error || 'Registration saga failed';
       return res.status(400).json({ 
         status: 'failed',
@@ -0,0 +1,45 @@
+"""
+Load question packs into the quiz database.
+
+Streams each pack (.json array, .jsonl/.ndjson or .csv) and upserts its
+categories, questions and choices in chunks, one transaction per chunk.
+Existing questions are matched on (category, text) and updated in place, so
+recorded attempts are kept. Running quiz servers pick up new categories and
+new or edited questions on their next request.
+
+Usage:
+    python load_questions.py PACK [PACK ...] [--chunk-size 2000] [--quiet]
+"""
+import argparse
+import json
+import sys
+
+from app import create_app
+from app.question_packs import load_pack, DEFAULT_CHUNK_SIZE
+
+
+def print_progress(report):
+    print(
+        f"  {report['inserted']} inserted, {report['updated']} updated, "
+        f"{report['rows']} rows, {report['rows_per_second']} rows/s",
+        file=sys.stderr
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("packs", nargs="+")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--quiet", action="store_true", help="only print the final reports")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        for path in args.packs:
+            print(f"Loading {path}", file=sys.stderr)
+            report = load_pack(path, args.chunk_size, progress=None if args.quiet else print_progress)
+            print(json.dumps(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Versioned schema migrations for the quiz service and user_service.
+
+Shows migration status or applies pending migrations. Backfills run in
+batches with a pause between them, so this is safe to run against a live
+database. --dry-run reports the rows each pending migration would touch.
+
+Usage:
+    python migrate.py [quiz|user_service] [status|upgrade] [--dry-run]
+                      [--target VERSION] [--batch-size 5000] [--pause 0.05]
+"""
+import argparse
+import importlib.util
+import json
+import logging
+import os
+import sys
+
+from dbmigrate import DEFAULT_BATCH_SIZE, DEFAULT_PAUSE, MigrationRunner
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def quiz_runners():
+    from app import create_app
+    from app.migrations import migration_runners
+
+    app = create_app({"AUTO_MIGRATE": False})
+    with app.app_context():
+        return migration_runners()
+
+
+def user_service_runners():
+    # Loaded from its file: user_service/app.py would clash with the quiz "app" package.
+    path = os.path.join(ROOT, "user_service", "app.py")
+    spec = importlib.util.spec_from_file_location("user_service_app", path)
+    module = importlib.util.module_from_spec(spec)
+    # Registered first so Flask resolves its instance folder next to the file.
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    with module.app.app_context():
+        return {"default": MigrationRunner(module.db.engine, module.MIGRATIONS_DIR)}
+
+
+SERVICES = {"quiz": quiz_runners, "user_service": user_service_runners}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("service", choices=sorted(SERVICES))
+    parser.add_argument("command", choices=["status", "upgrade"], nargs="?", default="upgrade")
+    parser.add_argument("--dry-run", action="store_true", help="report what would change")
+    parser.add_argument("--target", help="stop after this version")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--pause", type=float, default=DEFAULT_PAUSE, help="seconds between backfill batches")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    for name, runner in SERVICES[args.service]().items():
+        if args.command == "status":
+            result = runner.status()
+        else:
+            result = runner.upgrade(
+                target=args.target, dry_run=args.dry_run, batch_size=args.batch_size, pause=args.pause
+            )
+        print(json.dumps({"database": name, args.command: result}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
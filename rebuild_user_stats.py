@@ -0,0 +1,14 @@
+"""
+Rebuild the user_stats aggregate table from quiz_attempts.
+Use after restoring data, bulk edits, or if the aggregates are ever suspected
+to have drifted. Safe to re-run; it replaces the table contents in one transaction.
+"""
+from app import create_app
+from app.stats import rebuild_user_stats
+
+app = create_app()
+
+with app.app_context():
+    print("Rebuilding user_stats from quiz_attempts...")
+    rows = rebuild_user_stats()
+    print(f"\nRebuild complete! Wrote {rows} stats rows.")
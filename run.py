@@ -1,5 +1,8 @@
 from app import create_app
+from werkzeug.serving import WSGIRequestHandler
 app=create_app()
 
 if __name__=="__main__":
+    # HTTP/1.1 keep-alive, so the saga workers' pooled clients reuse connections.
+    WSGIRequestHandler.protocol_version = "HTTP/1.1"
     app.run(debug=True, port=5000)
\ No newline at end of file
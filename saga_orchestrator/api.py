@@ -2,8 +2,15 @@
 Flask API for Saga Orchestrator.
 Provides HTTP endpoints to trigger saga orchestrations.
 """
-from flask import Flask, request, jsonify
-from saga_orchestrator.tasks import orchestrate_registration_saga
+from flask import Flask, Response, request, jsonify
+from saga_orchestrator.celery_app import celery_app
+from saga_orchestrator.saga_log import saga_log
+from saga_orchestrator.tasks import (
+    orchestrate_registration_saga, saga_result_id, start_registration_batch, start_registration_saga
+)
+import json
+import os
+import time
 import uuid
 import logging
 
@@ -11,6 +18,17 @@ app = Flask(__name__)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 'chain' runs each saga step as its own task; 'inline' uses the older
+# single-task orchestrator.
+SAGA_EXECUTION = os.environ.get('SAGA_EXECUTION', 'chain')
+
+# /saga/wait and /saga/stream hold the request open until the saga finishes.
+SAGA_WAIT_DEFAULT_TIMEOUT = float(os.environ.get('SAGA_WAIT_DEFAULT_TIMEOUT', 25))
+SAGA_WAIT_MAX_TIMEOUT = float(os.environ.get('SAGA_WAIT_MAX_TIMEOUT', 60))
+SSE_KEEPALIVE_SECONDS = 15
+
+SAGA_BATCH_MAX_USERS = int(os.environ.get('SAGA_BATCH_MAX_USERS', 20000))
+
 
 @app.route('/health', methods=['GET'])
 def health():
@@ -58,17 +76,20 @@ def trigger_registration_saga():
             'password': data['password']
         }
         
-        task = orchestrate_registration_saga.apply_async(
-            args=[saga_id, user_data],
-            task_id=f'saga_{saga_id}'
-        )
+        if SAGA_EXECUTION == 'inline':
+            task_id = orchestrate_registration_saga.apply_async(
+                args=[saga_id, user_data],
+                task_id=saga_result_id(saga_id)
+            ).id
+        else:
+            task_id = start_registration_saga(saga_id, user_data)
         
-        logger.info(f"Registration saga triggered: saga_id={saga_id}, task_id={task.id}")
+        logger.info(f"Registration saga triggered: saga_id={saga_id}, task_id={task_id}")
         
         return jsonify({
             'saga_id': saga_id,
             'status': 'pending',
-            'task_id': task.id,
+            'task_id': task_id,
             'message': 'Registration saga started'
         }), 202
         
@@ -77,6 +98,136 @@ def trigger_registration_saga():
         return jsonify({'error': f'Failed to trigger saga: {str(e)}'}), 500
 
 
+def saga_status(task_id):
+    """Status of a saga's result task, as returned by /saga/status and /saga/wait."""
+    task = celery_app.AsyncResult(task_id)
+    
+    if task.state == 'PENDING':
+        return {
+            'task_id': task_id,
+            'status': 'PENDING',
+            'message': 'Task is still processing'
+        }
+    elif task.state == 'SUCCESS':
+        return {
+            'task_id': task_id,
+            'status': 'SUCCESS',
+            'result': task.result
+        }
+    elif task.state == 'FAILURE':
+        return {
+            'task_id': task_id,
+            'status': 'FAILURE',
+            'error': str(task.info) if task.info else 'Task failed'
+        }
+    return {
+        'task_id': task_id,
+        'status': task.state,
+        'result': task.result if task.ready() else None
+    }
+
+
+@app.route('/saga/register/batch', methods=['POST'])
+def trigger_registration_batch():
+    """
+    Register many users at once (e.g. a whole school) with the batch saga.
+    Users are created in parallel chunks through the services' bulk
+    endpoints; a user that fails is reported (and compensated) on its own
+    without affecting the rest.
+    
+    Request Body:
+    {
+        "users": [{"username": "string", "email": "string", "password": "string"}, ...]
+    }
+    
+    Returns:
+    {
+        "batch_id": "uuid",
+        "total": int,
+        "chunks": int,
+        "status_url": "/saga/batch/<batch_id>"
+    }
+    """
+    try:
+        data = request.get_json(silent=True)
+        
+        if not data or not isinstance(data.get('users'), list) or not data['users']:
+            return jsonify({'error': 'Request body must contain a non-empty users list'}), 400
+        
+        users = data['users']
+        if len(users) > SAGA_BATCH_MAX_USERS:
+            return jsonify({'error': f'At most {SAGA_BATCH_MAX_USERS} users per batch'}), 413
+        if not all(isinstance(user, dict) for user in users):
+            return jsonify({'error': 'Every user must be an object'}), 400
+        
+        batch_id = str(uuid.uuid4())
+        chunks = start_registration_batch(batch_id, [
+            {'username': user.get('username'), 'email': user.get('email'), 'password': user.get('password')}
+            for user in users
+        ])
+        
+        logger.info(f"Registration batch triggered: batch_id={batch_id}, users={len(users)}, chunks={chunks}")
+        
+        return jsonify({
+            'batch_id': batch_id,
+            'status': 'pending',
+            'total': len(users),
+            'chunks': chunks,
+            'status_url': f'/saga/batch/{batch_id}'
+        }), 202
+        
+    except Exception as e:
+        logger.error(f"Error triggering registration batch: {str(e)}")
+        return jsonify({'error': f'Failed to trigger registration batch: {str(e)}'}), 500
+
+
+@app.route('/saga/batch/<batch_id>', methods=['GET'])
+def get_batch_status(batch_id):
+    """
+    Progress of a batch registration.
+    
+    Query Parameters:
+        details: 1 to include every item's result, not only the failures
+    
+    Returns:
+    {
+        "batch_id": "uuid",
+        "status": "PENDING|SUCCESS|PARTIAL|FAILURE",
+        "total": int, "created": int, "failed": int, "pending": int,
+        "chunks": int, "chunks_done": int,
+        "seconds": float (time from start to the last finished chunk),
+        "failures": [{"index", "username", "error", "user_id", "compensated"}],
+        "results": [...] (with details=1)
+    }
+    """
+    batch = saga_log.get_batch(batch_id)
+    if not batch:
+        return jsonify({'error': f'Batch {batch_id} not found'}), 404
+    
+    results = batch.pop('results')
+    failures = [result for result in results if result['status'] != 'created']
+    created = len(results) - len(failures)
+    if batch['chunks_done'] < batch['chunks']:
+        status = 'PENDING'
+    elif not failures:
+        status = 'SUCCESS'
+    else:
+        status = 'PARTIAL' if created else 'FAILURE'
+    
+    body = dict(
+        batch,
+        status=status,
+        created=created,
+        failed=len(failures),
+        pending=batch['total'] - len(results),
+        seconds=round(batch['updated_at'] - batch['created_at'], 3) if batch['updated_at'] else None,
+        failures=failures
+    )
+    if request.args.get('details') == '1':
+        body['results'] = results
+    return jsonify(body), 200
+
+
 @app.route('/saga/status/<task_id>', methods=['GET'])
 def get_saga_status(task_id):
     """
@@ -93,41 +244,123 @@ def get_saga_status(task_id):
     }
     """
     try:
-        from saga_orchestrator.celery_app import celery_app
-        
-        task = celery_app.AsyncResult(task_id)
-        
-        if task.state == 'PENDING':
-            response = {
-                'task_id': task_id,
-                'status': 'PENDING',
-                'message': 'Task is still processing'
-            }
-        elif task.state == 'SUCCESS':
-            response = {
-                'task_id': task_id,
-                'status': 'SUCCESS',
-                'result': task.result
-            }
-        elif task.state == 'FAILURE':
-            response = {
-                'task_id': task_id,
-                'status': 'FAILURE',
-                'error': str(task.info) if task.info else 'Task failed'
-            }
-        else:
-            response = {
-                'task_id': task_id,
-                'status': task.state,
-                'result': task.result if task.ready() else None
-            }
-        
-        return jsonify(response), 200
+        return jsonify(saga_status(task_id)), 200
         
     except Exception as e:
         logger.error(f"Error getting saga status: {str(e)}")
         return jsonify({'error': f'Failed to get saga status: {str(e)}'}), 500
 
 
+def wait_timeout():
+    timeout = request.args.get('timeout', SAGA_WAIT_DEFAULT_TIMEOUT, type=float)
+    return min(max(timeout, 0.0), SAGA_WAIT_MAX_TIMEOUT)
+
+
+def result_channel(task_id):
+    # The Redis result backend publishes every stored result on its key.
+    return celery_app.backend.get_key_for_task(task_id).decode()
+
+
+@app.route('/saga/wait/<task_id>', methods=['GET'])
+def wait_saga(task_id):
+    """
+    Block until the saga's result is stored or ?timeout= seconds pass
+    (default SAGA_WAIT_DEFAULT_TIMEOUT, at most SAGA_WAIT_MAX_TIMEOUT), then
+    answer like /saga/status. A timeout returns status PENDING.
+    """
+    timeout = wait_timeout()
+    try:
+        pubsub = saga_log.redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(result_channel(task_id))
+        try:
+            # Subscribed before the first check, so a result stored in
+            # between still wakes us up.
+            deadline = time.monotonic() + timeout
+            while not celery_app.AsyncResult(task_id).ready():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                pubsub.get_message(timeout=remaining)
+        finally:
+            pubsub.close()
+        return jsonify(saga_status(task_id)), 200
+
+    except Exception as e:
+        logger.error(f"Error waiting for saga: {str(e)}")
+        return jsonify({'error': f'Failed to wait for saga: {str(e)}'}), 500
+
+
+def sse(event, data):
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+
+@app.route('/saga/stream/<task_id>', methods=['GET'])
+def stream_saga(task_id):
+    """
+    Server-sent events for a saga: one "step" event per logged transition
+    (those already logged first), then a "result" event with the
+    /saga/status body, or "timeout" with the PENDING status once ?timeout=
+    seconds pass. Sagas run by the inline orchestrator have no step events.
+    """
+    timeout = wait_timeout()
+    saga_id = task_id[len('saga_'):] if task_id.startswith('saga_') else task_id
+
+    def generate():
+        pubsub = saga_log.redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(result_channel(task_id), saga_log.progress_channel(saga_id))
+        try:
+            deadline = time.monotonic() + timeout
+            quiet_since = time.monotonic()
+            seen = set()
+            for event in saga_log.events(saga_id):
+                seen.add((event['status'], event['attempt'], event['at']))
+                yield sse('step', event)
+            while not celery_app.AsyncResult(task_id).ready():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    yield sse('timeout', saga_status(task_id))
+                    return
+                message = pubsub.get_message(timeout=min(remaining, SSE_KEEPALIVE_SECONDS))
+                if message and message['channel'] == saga_log.progress_channel(saga_id):
+                    event = json.loads(message['data'])
+                    if (event['status'], event['attempt'], event['at']) not in seen:
+                        quiet_since = time.monotonic()
+                        yield sse('step', event)
+                elif time.monotonic() - quiet_since >= SSE_KEEPALIVE_SECONDS:
+                    # Keeps proxies from closing an idle stream.
+                    quiet_since = time.monotonic()
+                    yield ': keepalive\n\n'
+            yield sse('result', saga_status(task_id))
+        finally:
+            pubsub.close()
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+
+@app.route('/saga/state/<saga_id>', methods=['GET'])
+def get_saga_state(saga_id):
+    """
+    Logged state and step transitions of a chained saga.
+
+    Returns:
+    {
+        "saga_id": "uuid",
+        "status": "started|creating_user|user_created|creating_profile|completed|compensating|compensated|failed",
+        "attempt": int,
+        "events": [{"status", "attempt", "at"}, ...]
+    }
+    """
+    state = saga_log.get(saga_id)
+    if not state:
+        return jsonify({'error': f'Saga {saga_id} not found'}), 404
+
+    state.pop('user_data', None)
+    state['events'] = saga_log.events(saga_id)
+    return jsonify(state), 200
+
+
 if __name__ == '__main__':
     app.run(debug=True, port=5002)
\ No newline at end of file
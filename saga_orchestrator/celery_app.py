@@ -6,6 +6,9 @@ import os
 # Redis connection URL (default to localhost)
 REDIS_URL = os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/0')
 
+# How often beat runs the stalled-saga sweep (see saga_orchestrator.tasks).
+SAGA_RECOVERY_INTERVAL = float(os.environ.get('SAGA_RECOVERY_INTERVAL', 30))
+
 # Create Celery app
 celery_app = Celery(
     'saga_orchestrator',
@@ -26,6 +29,12 @@ celery_app.conf.update(
     task_soft_time_limit=25 * 60,  # 25 minutes soft limit
     worker_prefetch_multiplier=1,
     worker_max_tasks_per_child=50,
+    beat_schedule={
+        'recover-stalled-sagas': {
+            'task': 'saga.recovery.sweep',
+            'schedule': SAGA_RECOVERY_INTERVAL,
+        },
+    },
 )
 
 if __name__ == '__main__':
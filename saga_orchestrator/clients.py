@@ -0,0 +1,102 @@
+"""
+Pooled HTTP clients for the services the saga steps call.
+
+Each worker process keeps one requests.Session per service, so step and
+compensation calls reuse keep-alive connections instead of opening a new
+TCP connection every time. Sessions are never shared across a fork: a
+client notices it is in a new process (prefork children, or replacements
+started by worker_max_tasks_per_child) and builds a fresh session, and
+worker_process_init resets every client explicitly.
+
+Configuration (environment):
+    USER_SERVICE_URL, QUIZ_SERVICE_URL    service base URLs
+    SAGA_HTTP_CONNECT_TIMEOUT             seconds to establish a connection (3.05)
+    SAGA_HTTP_READ_TIMEOUT                seconds to wait for a response (10)
+    SAGA_HTTP_BULK_READ_TIMEOUT           the same for bulk requests of a batch (300)
+    SAGA_HTTP_POOL_SIZE                   keep-alive connections per service (10)
+    SAGA_HTTP_CONNECT_RETRIES             retries when connecting fails (2)
+    SERVICE_TOKEN                         sent as X-Service-Token for service-only endpoints
+"""
+import logging
+import os
+import threading
+
+import requests
+from celery.signals import worker_process_init
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+USER_SERVICE_URL = os.environ.get('USER_SERVICE_URL', 'http://127.0.0.1:5001')
+QUIZ_SERVICE_URL = os.environ.get('QUIZ_SERVICE_URL', 'http://127.0.0.1:5000')
+
+CONNECT_TIMEOUT = float(os.environ.get('SAGA_HTTP_CONNECT_TIMEOUT', 3.05))
+READ_TIMEOUT = float(os.environ.get('SAGA_HTTP_READ_TIMEOUT', 10))
+BULK_READ_TIMEOUT = float(os.environ.get('SAGA_HTTP_BULK_READ_TIMEOUT', 300))
+POOL_SIZE = int(os.environ.get('SAGA_HTTP_POOL_SIZE', 10))
+CONNECT_RETRIES = int(os.environ.get('SAGA_HTTP_CONNECT_RETRIES', 2))
+SERVICE_TOKEN = os.environ.get('SERVICE_TOKEN')
+
+
+class ServiceClient:
+    """requests.Session for one service, created lazily once per process."""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip('/')
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _new_session(self) -> requests.Session:
+        # Only failed connection attempts are retried: a request that reached
+        # the service may have had effects, and the steps are not all idempotent.
+        retry = Retry(total=CONNECT_RETRIES, connect=CONNECT_RETRIES, read=0, status=0, redirect=0,
+                      backoff_factor=0.1)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=retry)
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        if SERVICE_TOKEN:
+            session.headers['X-Service-Token'] = SERVICE_TOKEN
+        return session
+
+    @property
+    def session(self) -> requests.Session:
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    # Sockets inherited from the parent are left alone, not closed:
+                    # the parent may still be using them.
+                    self._session = self._new_session()
+                    self._pid = os.getpid()
+        return self._session
+
+    def reset(self):
+        """Forget the session so the next call builds a new one."""
+        with self._lock:
+            self._session = None
+            self._pid = None
+
+    def request(self, method: str, path: str, **kwargs) -> requests.Response:
+        kwargs.setdefault('timeout', (CONNECT_TIMEOUT, READ_TIMEOUT))
+        return self.session.request(method, f'{self.base_url}{path}', **kwargs)
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        return self.request('POST', path, **kwargs)
+
+    def delete(self, path: str, **kwargs) -> requests.Response:
+        return self.request('DELETE', path, **kwargs)
+
+
+user_service = ServiceClient(USER_SERVICE_URL)
+quiz_service = ServiceClient(QUIZ_SERVICE_URL)
+
+
+@worker_process_init.connect
+def _reset_clients(**kwargs):
+    user_service.reset()
+    quiz_service.reset()
@@ -0,0 +1,337 @@
+"""
+Durable log of registration saga state in Redis.
+
+Every chained saga (start_registration_saga) has a hash under
+SAGA_STATE_PREFIX + saga_id holding its current status, the recovery
+attempt that owns it and the data needed to resume or undo it, plus a list
+under SAGA_STATE_PREFIX + saga_id + ':events' with one timestamped entry per
+transition. Sagas that have not finished are kept in the ACTIVE_KEY sorted
+set, scored by the time of their last transition, so stalled ones can be
+found without scanning. Each event is also published on
+progress_channel(saga_id) for clients streaming a saga's progress.
+
+Statuses, in order:
+    started            accepted, step 1 queued
+    creating_user      step 1 running
+    user_created       step 1 done, step 2 queued
+    creating_profile   step 2 running
+    completed          terminal
+    compensating       undoing step 1 (and step 2)
+    compensated        terminal
+    failed             terminal, nothing was created
+
+The attempt number fences out stale workers: recovery increments it, and a
+transition only applies when the caller's attempt still matches, so a task
+from before the recovery can never move the saga again.
+
+The raw user_data (password included) is only kept until step 1 has
+created the user; recovery needs it to retry or resolve that step.
+Finished sagas expire after SAGA_STATE_TTL seconds (7 days).
+
+Batch registrations (start_registration_batch) are logged separately, as
+one hash per batch under SAGA_BATCH_PREFIX + batch_id holding its size and
+the per-item results of every finished chunk. Each chunk also has a state
+hash under chunk_key(batch_id, chunk), fenced by an attempt number like a
+saga's, and is kept in BATCH_ACTIVE_KEY until it is done:
+    queued             accepted, task queued
+    creating_users     bulk create sent to user_service
+    users_created      step 1 done, IDs of the created users logged
+    creating_profiles  bulk create sent to the quiz service
+    compensating       deleting the logged users (and their profiles)
+    done               results written to the batch hash
+The chunk's users (passwords included) are only kept until step 1 is done.
+"""
+import json
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import redis
+
+from saga_orchestrator.celery_app import REDIS_URL
+
+SAGA_STATE_PREFIX = 'saga_state:'
+ACTIVE_KEY = SAGA_STATE_PREFIX + 'active'
+SAGA_BATCH_PREFIX = 'saga_batch:'
+BATCH_ACTIVE_KEY = SAGA_BATCH_PREFIX + 'active'
+SAGA_STATE_TTL = int(os.environ.get('SAGA_STATE_TTL', 7 * 24 * 3600))
+
+TERMINAL = {'completed', 'compensated', 'failed'}
+# Fields holding JSON rather than plain strings.
+JSON_FIELDS = {'user_data', 'user'}
+CHUNK_JSON_FIELDS = {'users', 'created', 'results'}
+
+
+class SagaLog:
+    def __init__(self, client: redis.Redis):
+        self.redis = client
+
+    @staticmethod
+    def key(saga_id: str) -> str:
+        return SAGA_STATE_PREFIX + saga_id
+
+    @staticmethod
+    def events_key(saga_id: str) -> str:
+        return SAGA_STATE_PREFIX + saga_id + ':events'
+
+    @staticmethod
+    def progress_channel(saga_id: str) -> str:
+        return SAGA_STATE_PREFIX + saga_id + ':progress'
+
+    def _event(self, pipe, saga_id: str, event: Dict[str, Any]):
+        event = json.dumps(event)
+        pipe.rpush(self.events_key(saga_id), event)
+        pipe.publish(self.progress_channel(saga_id), event)
+
+    def _write(self, pipe, saga_id: str, status: str, attempt: int, now: float,
+               fields: Dict[str, Any], drop: Iterable[str] = ()):
+        mapping = {'status': status, 'attempt': attempt, 'updated_at': now}
+        for name, value in fields.items():
+            mapping[name] = json.dumps(value) if name in JSON_FIELDS else value
+        pipe.hset(self.key(saga_id), mapping=mapping)
+        if drop:
+            pipe.hdel(self.key(saga_id), *drop)
+        self._event(pipe, saga_id, {'status': status, 'attempt': attempt, 'at': now})
+        if status in TERMINAL:
+            pipe.zrem(ACTIVE_KEY, saga_id)
+            pipe.expire(self.key(saga_id), SAGA_STATE_TTL)
+            pipe.expire(self.events_key(saga_id), SAGA_STATE_TTL)
+        else:
+            pipe.zadd(ACTIVE_KEY, {saga_id: now})
+
+    def begin(self, saga_id: str, user_data: Dict[str, Any]):
+        """Log a new saga as started, before its first task is queued."""
+        now = time.time()
+        pipe = self.redis.pipeline()
+        self._write(pipe, saga_id, 'started', 0, now, {
+            'saga_id': saga_id, 'created_at': now, 'user_data': user_data
+        })
+        pipe.execute()
+
+    def get(self, saga_id: str) -> Optional[Dict[str, Any]]:
+        state = self.redis.hgetall(self.key(saga_id))
+        if not state:
+            return None
+        for name in JSON_FIELDS & state.keys():
+            state[name] = json.loads(state[name])
+        state['attempt'] = int(state['attempt'])
+        for name in ('created_at', 'updated_at'):
+            state[name] = float(state[name])
+        if 'user_id' in state:
+            state['user_id'] = int(state['user_id'])
+        return state
+
+    def events(self, saga_id: str) -> List[Dict[str, Any]]:
+        return [json.loads(event) for event in self.redis.lrange(self.events_key(saga_id), 0, -1)]
+
+    def advance(self, saga_id: str, attempt: int, status: str, expect: Iterable[str],
+                drop: Iterable[str] = (), **fields) -> bool:
+        """
+        Move the saga to status if it is in one of the expect statuses and
+        attempt still owns it. Returns False, changing nothing, otherwise.
+
+        Sagas with no log entry (started by the inline orchestrator, or
+        expired) are not tracked: the call returns True and writes nothing.
+        """
+        key = self.key(saga_id)
+        expect = set(expect)
+
+        def transition(pipe):
+            current, owner = pipe.hmget(key, 'status', 'attempt')
+            if current is None:
+                return True
+            if current not in expect or int(owner) != attempt:
+                return False
+            pipe.multi()
+            self._write(pipe, saga_id, status, attempt, time.time(), fields, drop)
+            return True
+
+        return self.redis.transaction(transition, key, value_from_callable=True)
+
+    def stalled(self, older_than: float, limit: int) -> List[str]:
+        """IDs of unfinished sagas with no transition for older_than seconds."""
+        return self.redis.zrangebyscore(ACTIVE_KEY, '-inf', time.time() - older_than, start=0, num=limit)
+
+    def claim(self, saga_id: str, older_than: float) -> Optional[int]:
+        """
+        Take over a stalled saga for recovery: bump its attempt so earlier
+        workers are fenced out. Returns the new attempt, or None if the saga
+        moved on or another sweeper claimed it first.
+        """
+        key = self.key(saga_id)
+
+        def take(pipe):
+            status, attempt, updated_at = pipe.hmget(key, 'status', 'attempt', 'updated_at')
+            if status is None:
+                pipe.multi()
+                pipe.zrem(ACTIVE_KEY, saga_id)
+                return None
+            now = time.time()
+            if status in TERMINAL or float(updated_at) > now - older_than:
+                return None
+            attempt = int(attempt) + 1
+            pipe.multi()
+            pipe.hset(key, mapping={'attempt': attempt, 'updated_at': now})
+            self._event(pipe, saga_id, {'status': status, 'attempt': attempt, 'at': now, 'recovering': True})
+            pipe.zadd(ACTIVE_KEY, {saga_id: now})
+            return attempt
+
+        return self.redis.transaction(take, key, value_from_callable=True)
+
+    def active_count(self) -> int:
+        return self.redis.zcard(ACTIVE_KEY)
+
+    @staticmethod
+    def chunk_key(batch_id: str, chunk: int) -> str:
+        return f'{SAGA_BATCH_PREFIX}{batch_id}:chunk:{chunk}'
+
+    def _write_chunk(self, pipe, batch_id: str, chunk: int, status: str, attempt: int, now: float,
+                     fields: Dict[str, Any], drop: Iterable[str] = ()):
+        key = self.chunk_key(batch_id, chunk)
+        mapping = {'status': status, 'attempt': attempt, 'updated_at': now}
+        for name, value in fields.items():
+            if name == 'created':
+                value = list(value.items())
+            elif name == 'results':
+                value = list(value.values())
+            mapping[name] = json.dumps(value) if name in CHUNK_JSON_FIELDS else value
+        pipe.hset(key, mapping=mapping)
+        if drop:
+            pipe.hdel(key, *drop)
+        if status == 'done':
+            pipe.zrem(BATCH_ACTIVE_KEY, f'{batch_id}:{chunk}')
+            pipe.expire(key, SAGA_STATE_TTL)
+        else:
+            pipe.zadd(BATCH_ACTIVE_KEY, {f'{batch_id}:{chunk}': now})
+
+    def begin_batch(self, batch_id: str, chunks: List[List[Dict[str, Any]]]):
+        """Log a new batch and its chunks as queued, before the chunk tasks are queued."""
+        key = SAGA_BATCH_PREFIX + batch_id
+        now = time.time()
+        pipe = self.redis.pipeline()
+        pipe.hset(key, mapping={
+            'batch_id': batch_id, 'total': sum(len(users) for users in chunks), 'chunks': len(chunks), 'created_at': now
+        })
+        pipe.expire(key, SAGA_STATE_TTL)
+        for chunk, users in enumerate(chunks):
+            self._write_chunk(pipe, batch_id, chunk, 'queued', 0, now, {'users': users})
+            pipe.expire(self.chunk_key(batch_id, chunk), SAGA_STATE_TTL)
+        pipe.execute()
+
+    def get_chunk(self, batch_id: str, chunk: int) -> Optional[Dict[str, Any]]:
+        """
+        A chunk's state. created maps user ID to item index, results item
+        index to result.
+        """
+        state = self.redis.hgetall(self.chunk_key(batch_id, chunk))
+        if not state:
+            return None
+        for name in CHUNK_JSON_FIELDS & state.keys():
+            state[name] = json.loads(state[name])
+        if 'created' in state:
+            state['created'] = {user_id: index for user_id, index in state['created']}
+        if 'results' in state:
+            state['results'] = {result['index']: result for result in state['results']}
+        state['attempt'] = int(state['attempt'])
+        for name in ('updated_at', 'started'):
+            if name in state:
+                state[name] = float(state[name])
+        return state
+
+    def advance_chunk(self, batch_id: str, chunk: int, attempt: int, status: str, expect: Iterable[str],
+                      drop: Iterable[str] = (), **fields) -> bool:
+        """
+        Move the chunk to status if it is in one of the expect statuses and
+        attempt still owns it. Returns False, changing nothing, otherwise
+        (or if the chunk has no state).
+        """
+        key = self.chunk_key(batch_id, chunk)
+        expect = set(expect)
+
+        def transition(pipe):
+            current, owner = pipe.hmget(key, 'status', 'attempt')
+            if current not in expect or int(owner) != attempt:
+                return False
+            pipe.multi()
+            self._write_chunk(pipe, batch_id, chunk, status, attempt, time.time(), fields, drop)
+            return True
+
+        return self.redis.transaction(transition, key, value_from_callable=True)
+
+    def stalled_chunks(self, older_than: float, limit: int) -> List[Tuple[str, int]]:
+        """(batch_id, chunk) of unfinished chunks with no transition for older_than seconds."""
+        members = self.redis.zrangebyscore(BATCH_ACTIVE_KEY, '-inf', time.time() - older_than, start=0, num=limit)
+        stalled = []
+        for member in members:
+            batch_id, _, chunk = member.rpartition(':')
+            stalled.append((batch_id, int(chunk)))
+        return stalled
+
+    def claim_chunk(self, batch_id: str, chunk: int, older_than: float) -> Optional[int]:
+        """
+        Take over a stalled chunk for recovery, as claim does for a saga.
+        Returns the new attempt, or None if the chunk moved on or another
+        sweeper claimed it first.
+        """
+        key = self.chunk_key(batch_id, chunk)
+
+        def take(pipe):
+            status, attempt, updated_at = pipe.hmget(key, 'status', 'attempt', 'updated_at')
+            if status is None or status == 'done':
+                pipe.multi()
+                pipe.zrem(BATCH_ACTIVE_KEY, f'{batch_id}:{chunk}')
+                return None
+            now = time.time()
+            if float(updated_at) > now - older_than:
+                return None
+            attempt = int(attempt) + 1
+            pipe.multi()
+            pipe.hset(key, mapping={'attempt': attempt, 'updated_at': now})
+            pipe.zadd(BATCH_ACTIVE_KEY, {f'{batch_id}:{chunk}': now})
+            return attempt
+
+        return self.redis.transaction(take, key, value_from_callable=True)
+
+    def finish_chunk(self, batch_id: str, chunk: int, attempt: int, results: Dict[int, Dict[str, Any]]) -> bool:
+        """
+        Record a chunk's per-item results and mark it done, if attempt still
+        owns it. Returns False, changing nothing, otherwise.
+        """
+        key = self.chunk_key(batch_id, chunk)
+
+        def finish(pipe):
+            current, owner = pipe.hmget(key, 'status', 'attempt')
+            if current in (None, 'done') or int(owner) != attempt:
+                return False
+            now = time.time()
+            pipe.multi()
+            pipe.hset(SAGA_BATCH_PREFIX + batch_id, mapping={
+                f'chunk:{chunk}': json.dumps(list(results.values())), 'updated_at': now
+            })
+            self._write_chunk(pipe, batch_id, chunk, 'done', attempt, now, {}, drop=('users', 'created', 'results'))
+            return True
+
+        return self.redis.transaction(finish, key, value_from_callable=True)
+
+    def get_batch(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        """The batch with chunks_done and its finished items' results in input order."""
+        fields = self.redis.hgetall(SAGA_BATCH_PREFIX + batch_id)
+        if not fields:
+            return None
+        chunk_fields = [name for name in fields if name.startswith('chunk:')]
+        results = []
+        for name in chunk_fields:
+            results.extend(json.loads(fields[name]))
+        results.sort(key=lambda result: result['index'])
+        return {
+            'batch_id': fields['batch_id'],
+            'total': int(fields['total']),
+            'chunks': int(fields['chunks']),
+            'created_at': float(fields['created_at']),
+            'updated_at': float(fields['updated_at']) if 'updated_at' in fields else None,
+            'chunks_done': len(chunk_fields),
+            'results': results,
+        }
+
+
+saga_log = SagaLog(redis.Redis.from_url(REDIS_URL, decode_responses=True))
@@ -4,23 +4,79 @@ Saga Orchestrator Tasks using Celery.
 This module implements the Orchestration approach of the Saga Design Pattern.
 The orchestrator coordinates multiple service operations and handles compensation
 (rollback) if any step fails.
+
+start_registration_saga() runs the saga as a Celery chain: each step is its
+own task, so a worker is free between steps, and a failing step triggers
+registration_saga_failed, which compensates. The final result is stored
+under saga_result_id(saga_id). orchestrate_registration_saga is the older
+inline orchestrator, which runs every step inside one task.
+
+Chained sagas record each transition in the Redis saga log (saga_log.py).
+recover_stalled_sagas, run by beat every SAGA_RECOVERY_INTERVAL seconds and
+once when a worker starts, finds sagas with no transition for
+SAGA_STALL_SECONDS (a worker died, or a message was lost) and hands them to
+recover_saga in batches of SAGA_RECOVERY_BATCH. A stalled saga is resumed
+from its last completed step, or compensated once it has been recovered
+SAGA_RECOVERY_MAX_ATTEMPTS times. A saga is therefore picked up again at
+most SAGA_STALL_SECONDS + SAGA_RECOVERY_INTERVAL after its worker died.
+SAGA_STALL_SECONDS must exceed the longest a step can wait in the queue;
+a saga recovered too early is still correct (the attempt fence skips the
+original tasks) but does its work twice.
+
+start_registration_batch() onboards many users at once through the bulk
+endpoints of both services, in chunks that run in parallel; see
+register_batch_chunk. Chunks are logged and fenced like sagas, and the same
+sweep hands chunks with no transition for SAGA_BATCH_STALL_SECONDS to
+recover_batch_chunk. That defaults to the bulk read timeout plus
+SAGA_STALL_SECONDS, so by the time a chunk is recovered user_service has
+either committed its bulk create or given up on it.
 """
+import os
+import time
 import requests
 import logging
-from celery import chain, group
+from datetime import datetime, timezone
+from celery import chain, group, states
+from celery.exceptions import Ignore
+from celery.signals import worker_ready
 from saga_orchestrator.celery_app import celery_app
-from typing import Dict, Any, Optional
+from saga_orchestrator.clients import BULK_READ_TIMEOUT, CONNECT_TIMEOUT, quiz_service, user_service
+from saga_orchestrator.saga_log import TERMINAL, saga_log
+from typing import Dict, Any, List, Optional
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Service URLs
-USER_SERVICE_URL = 'http://127.0.0.1:5001'
-QUIZ_SERVICE_URL = 'http://127.0.0.1:5000'
+SAGA_STALL_SECONDS = float(os.environ.get('SAGA_STALL_SECONDS', 60))
+SAGA_RECOVERY_BATCH = int(os.environ.get('SAGA_RECOVERY_BATCH', 100))
+SAGA_RECOVERY_MAX_ATTEMPTS = int(os.environ.get('SAGA_RECOVERY_MAX_ATTEMPTS', 3))
+# Users per chunk of a batch registration; chunks run as parallel tasks.
+SAGA_BATCH_CHUNK_SIZE = int(os.environ.get('SAGA_BATCH_CHUNK_SIZE', 100))
+SAGA_BATCH_STALL_SECONDS = float(os.environ.get('SAGA_BATCH_STALL_SECONDS', BULK_READ_TIMEOUT + SAGA_STALL_SECONDS))
+
+PROFILE_DEFAULT_PREFERENCES = {
+    'notifications_enabled': True,
+    'default_category': None
+}
+
+
+def saga_result_id(saga_id: str) -> str:
+    """Task ID the saga's final result is stored under; /saga/status reads it."""
+    return f'saga_{saga_id}'
+
+
+def step_task_id(saga_id: str, step: int) -> str:
+    return f'saga_{saga_id}_step{step}'
+
 
-# Saga state keys in Redis
-SAGA_STATE_PREFIX = 'saga_state:'
+def batch_chunk_id(batch_id: str, chunk: int) -> str:
+    return f'batch_{batch_id}_chunk{chunk}'
+
+
+def store_saga_result(saga_id: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    celery_app.backend.store_result(saga_result_id(saga_id), result, states.SUCCESS)
+    return result
 
 
 class SagaError(Exception):
@@ -28,16 +84,16 @@ class SagaError(Exception):
 
 
 @celery_app.task(bind=True, name='saga.create_user')
-def create_user_task(self, saga_id: str, user_data: Dict[str, Any]) -> Dict[str, Any]:
+def create_user_task(self, saga_id: str, user_data: Dict[str, Any], attempt: int = 0) -> Dict[str, Any]:
     
+    if not saga_log.advance(saga_id, attempt, 'creating_user', expect=('started', 'creating_user')):
+        logger.info(f"[Saga {saga_id}] Step 1 superseded by recovery, skipping")
+        raise Ignore()
+
     try:
         logger.info(f"[Saga {saga_id}] Step 1: Creating user in User Service")
         
-        response = requests.post(
-            f'{USER_SERVICE_URL}/users',
-            json=user_data,
-            timeout=10
-        )
+        response = user_service.post('/users', json=user_data)
         
         if response.status_code == 201:
             user = response.json()
@@ -45,12 +101,11 @@ def create_user_task(self, saga_id: str, user_data: Dict[str, Any]) -> Dict[str,
             
             logger.info(f"[Saga {saga_id}] Step 1 SUCCESS: User created with ID {user_id}")
             
-            state = {
-                'step': 'create_user',
-                'status': 'completed',
-                'user_id': user_id,
-                'user_data': user
-            }
+            # The password is not needed past this point: drop it from the log.
+            if not saga_log.advance(saga_id, attempt, 'user_created', expect=('creating_user',),
+                                    drop=('user_data',), user_id=user_id, user=user):
+                logger.info(f"[Saga {saga_id}] Step 1 superseded by recovery after creating the user")
+                raise Ignore()
             
             return {
                 'success': True,
@@ -63,6 +118,8 @@ def create_user_task(self, saga_id: str, user_data: Dict[str, Any]) -> Dict[str,
             logger.error(f"[Saga {saga_id}] Step 1 FAILED: {error_msg}")
             raise SagaError(f"Failed to create user: {error_msg}")
             
+    except Ignore:
+        raise
     except requests.exceptions.RequestException as e:
         logger.error(f"[Saga {saga_id}] Step 1 ERROR: {str(e)}")
         raise SagaError(f"User service communication error: {str(e)}")
@@ -93,17 +150,10 @@ def create_user_profile_task(self, saga_id: str, step1_result: Dict[str, Any]) -
         
         profile_data = {
             'user_id': user_id,
-            'default_preferences': {
-                'notifications_enabled': True,
-                'default_category': None
-            }
+            'default_preferences': PROFILE_DEFAULT_PREFERENCES
         }
         
-        response = requests.post(
-            f'{QUIZ_SERVICE_URL}/api/users/profile',
-            json=profile_data,
-            timeout=10
-        )
+        response = quiz_service.post('/api/users/profile', json=profile_data)
         
         if response.status_code in [200, 201]:
             profile = response.json()
@@ -138,10 +188,7 @@ def compensate_delete_user_task(self, saga_id: str, compensation_data: Dict[str,
             
         logger.info(f"[Saga {saga_id}] COMPENSATE: Deleting user {user_id} from User Service")
         
-        response = requests.delete(
-            f'{USER_SERVICE_URL}/users/{user_id}/compensate',
-            timeout=10
-        )
+        response = user_service.delete(f'/users/{user_id}/compensate')
         
         if response.status_code == 200:
             logger.info(f"[Saga {saga_id}] COMPENSATE SUCCESS: User {user_id} deleted")
@@ -171,10 +218,7 @@ def compensate_delete_profile_task(self, saga_id: str, compensation_data: Dict[s
             
         logger.info(f"[Saga {saga_id}] COMPENSATE: Deleting user profile {user_id} from Quiz Service")
         
-        response = requests.delete(
-            f'{QUIZ_SERVICE_URL}/api/users/{user_id}/profile/compensate',
-            timeout=10
-        )
+        response = quiz_service.delete(f'/api/users/{user_id}/profile/compensate')
         
         if response.status_code == 200:
             logger.info(f"[Saga {saga_id}] COMPENSATE SUCCESS: Profile {user_id} deleted")
@@ -192,9 +236,487 @@ def compensate_delete_profile_task(self, saga_id: str, compensation_data: Dict[s
         return {'success': False, 'error': str(e)}
 
 
+def start_registration_saga(saga_id: str, user_data: Dict[str, Any]) -> str:
+    """
+    Start the registration saga as a chain of step tasks.
+
+    Step 1 creates the user, step 2 the quiz profile and records the result.
+    If either raises, registration_saga_failed runs as its own task and
+    compensates. The saga is logged before anything is queued, so even a
+    lost message is recovered. Returns the task ID the final result will be
+    stored under.
+    """
+    saga_log.begin(saga_id, user_data)
+    launch_registration_chain(saga_id, user_data)
+    return saga_result_id(saga_id)
+
+
+def launch_registration_chain(saga_id: str, user_data: Dict[str, Any], attempt: int = 0):
+    chain(
+        create_user_task.si(saga_id, user_data, attempt).set(task_id=step_task_id(saga_id, 1)),
+        complete_registration_task.s(saga_id, attempt).set(task_id=step_task_id(saga_id, 2)),
+    ).on_error(registration_saga_failed.s(saga_id, attempt)).apply_async()
+
+
+def launch_profile_step(saga_id: str, step1_result: Dict[str, Any], attempt: int):
+    complete_registration_task.apply_async(
+        args=[step1_result, saga_id, attempt],
+        task_id=step_task_id(saga_id, 2),
+        link_error=registration_saga_failed.s(saga_id, attempt)
+    )
+
+
+@celery_app.task(bind=True, name='saga.registration.complete')
+def complete_registration_task(self, step1_result: Dict[str, Any], saga_id: str, attempt: int = 0) -> Dict[str, Any]:
+    """
+    Last link of the registration chain: create the profile (step 2) and
+    store the saga's successful result.
+    """
+    if not saga_log.advance(saga_id, attempt, 'creating_profile', expect=('user_created', 'creating_profile')):
+        logger.info(f"[Saga {saga_id}] Step 2 superseded by recovery, skipping")
+        raise Ignore()
+
+    step2_result = create_user_profile_task(saga_id, step1_result)
+    logger.info(f"[Saga {saga_id}] All saga steps completed successfully")
+    return complete_saga(saga_id, attempt, step1_result.get('user_data'), step2_result.get('profile'))
+
+
+def complete_saga(saga_id: str, attempt: int, user: Dict[str, Any], profile: Dict[str, Any]) -> Dict[str, Any]:
+    # Result first: if the worker dies in between, recovery finds the profile
+    # and stores the same result again.
+    result = store_saga_result(saga_id, {
+        'success': True,
+        'saga_id': saga_id,
+        'result': {
+            'user': user,
+            'profile': profile
+        }
+    })
+    saga_log.advance(saga_id, attempt, 'completed', expect=('creating_profile',))
+    return result
+
+
+@celery_app.task(bind=True, name='saga.registration.failed')
+def registration_saga_failed(self, failed_task_id: str, saga_id: str, attempt: int = 0) -> Dict[str, Any]:
+    """
+    Error callback of the registration chain, queued with the failed task's ID.
+
+    If step 1 had created the user, it is deleted again. Stores the saga's
+    failed result in the same shape as orchestrate_registration_saga.
+    """
+    error = celery_app.AsyncResult(failed_task_id).result
+    state = saga_log.get(saga_id)
+    if state:
+        user_id = state.get('user_id')
+    else:
+        step1 = celery_app.AsyncResult(step_task_id(saga_id, 1))
+        user_id = step1.result.get('user_id') if step1.successful() and step1.result.get('success') else None
+
+    if not user_id:
+        if not saga_log.advance(saga_id, attempt, 'failed', expect=('creating_user',)):
+            return None
+        logger.error(f"[Saga {saga_id}] Step 1 failed: {error}")
+        return store_saga_result(saga_id, {
+            'success': False,
+            'saga_id': saga_id,
+            'failed_step': 1,
+            'error': str(error) if error else 'User creation failed'
+        })
+
+    if not saga_log.advance(saga_id, attempt, 'compensating', expect=('creating_profile',)):
+        return None
+    logger.error(f"[Saga {saga_id}] Step 2 failed, initiating compensation")
+    return compensate_saga(saga_id, attempt, user_id, str(error) if error else 'Profile creation failed')
+
+
+def compensate_saga(saga_id: str, attempt: int, user_id: int, error: str) -> Dict[str, Any]:
+    """
+    Delete the user created by step 1 and store the saga's failed result.
+
+    If the deletion fails the saga stays in compensating, and recovery
+    retries it once it is stalled.
+    """
+    compensation = compensate_delete_user_task(saga_id, {'user_id': user_id})
+    if compensation.get('success'):
+        saga_log.advance(saga_id, attempt, 'compensated', expect=('compensating',))
+    return store_saga_result(saga_id, {
+        'success': False,
+        'saga_id': saga_id,
+        'failed_step': 2,
+        'error': error,
+        'compensation': {
+            'executed': True,
+            'result': compensation
+        }
+    })
+
+
+@celery_app.task(bind=True, name='saga.recovery.sweep')
+def recover_stalled_sagas(self) -> Dict[str, int]:
+    """
+    Claim up to SAGA_RECOVERY_BATCH stalled sagas and queue recover_saga
+    for each. A full batch queues the next sweep right away, so a large
+    backlog drains without waiting for the beat interval.
+    """
+    candidates = saga_log.stalled(SAGA_STALL_SECONDS, SAGA_RECOVERY_BATCH)
+    recovered = 0
+    for saga_id in candidates:
+        attempt = saga_log.claim(saga_id, SAGA_STALL_SECONDS)
+        if attempt is not None:
+            recover_saga.delay(saga_id, attempt)
+            recovered += 1
+    chunks = saga_log.stalled_chunks(SAGA_BATCH_STALL_SECONDS, SAGA_RECOVERY_BATCH)
+    recovered_chunks = 0
+    for batch_id, chunk in chunks:
+        attempt = saga_log.claim_chunk(batch_id, chunk, SAGA_BATCH_STALL_SECONDS)
+        if attempt is not None:
+            recover_batch_chunk.delay(batch_id, chunk, attempt)
+            recovered_chunks += 1
+    if SAGA_RECOVERY_BATCH in (len(candidates), len(chunks)):
+        recover_stalled_sagas.delay()
+    if recovered or recovered_chunks:
+        logger.warning(f"Recovering {recovered} stalled saga(s) and {recovered_chunks} stalled batch chunk(s)")
+    return {'checked': len(candidates) + len(chunks), 'recovered': recovered + recovered_chunks}
+
+
+@celery_app.task(bind=True, name='saga.recovery.recover')
+def recover_saga(self, saga_id: str, attempt: int) -> Dict[str, Any]:
+    """
+    Resume or compensate one stalled saga claimed as attempt.
+
+    A step that was running when its worker died may or may not have taken
+    effect, so it is checked against the service first: the user is looked
+    up with the logged credentials, the profile by user ID.
+    """
+    state = saga_log.get(saga_id)
+    if not state or state['attempt'] != attempt or state['status'] in TERMINAL:
+        return {'saga_id': saga_id, 'action': 'skipped'}
+
+    status = state['status']
+    user_id = state.get('user_id')
+    user = state.get('user')
+    logger.warning(f"[Saga {saga_id}] Recovering from {status} (attempt {attempt})")
+
+    if status == 'creating_user':
+        response = user_service.post('/users/validate', json={
+            'username': state['user_data']['username'],
+            'password': state['user_data']['password']
+        })
+        # An account with the same credentials that predates the saga is
+        # not ours to adopt (or to delete later); a few seconds allow for
+        # clock skew between the hosts.
+        if response.status_code == 200 and _created_after(response.json(), state['created_at'] - 5):
+            user = response.json()
+            user_id = user['id']
+            saga_log.advance(saga_id, attempt, 'user_created', expect=('creating_user',),
+                             drop=('user_data',), user_id=user_id, user=user)
+            status = 'user_created'
+
+    if status == 'creating_profile':
+        response = quiz_service.get(f'/api/users/{user_id}/profile')
+        if response.status_code == 200:
+            complete_saga(saga_id, attempt, user, response.json())
+            return {'saga_id': saga_id, 'action': 'completed'}
+
+    if status == 'compensating' or (attempt > SAGA_RECOVERY_MAX_ATTEMPTS and user_id):
+        saga_log.advance(saga_id, attempt, 'compensating', expect=(status,))
+        # Step 2 may have created the profile before the saga stalled.
+        compensate_delete_profile_task(saga_id, {'user_id': user_id})
+        compensate_saga(saga_id, attempt, user_id, 'Saga stalled and was compensated by recovery')
+        return {'saga_id': saga_id, 'action': 'compensated'}
+
+    if attempt > SAGA_RECOVERY_MAX_ATTEMPTS:
+        saga_log.advance(saga_id, attempt, 'failed', expect=(status,))
+        store_saga_result(saga_id, {
+            'success': False,
+            'saga_id': saga_id,
+            'failed_step': 1,
+            'error': 'Saga stalled before creating the user and was abandoned by recovery'
+        })
+        return {'saga_id': saga_id, 'action': 'failed'}
+
+    if status in ('started', 'creating_user'):
+        launch_registration_chain(saga_id, state['user_data'], attempt)
+        return {'saga_id': saga_id, 'action': 'resumed', 'step': 1}
+
+    launch_profile_step(saga_id, {
+        'success': True,
+        'user_id': user_id,
+        'user_data': user,
+        'compensation_data': {'user_id': user_id}
+    }, attempt)
+    return {'saga_id': saga_id, 'action': 'resumed', 'step': 2}
+
+
+def _created_after(user: Dict[str, Any], timestamp: float) -> bool:
+    # user_service reports naive UTC datetimes.
+    created_at = datetime.fromisoformat(user['created_at']).replace(tzinfo=timezone.utc)
+    return created_at.timestamp() >= timestamp
+
+
+@worker_ready.connect
+def _recover_on_worker_start(**kwargs):
+    # Sagas orphaned by the worker that was restarted are picked up now
+    # rather than at the next beat tick.
+    recover_stalled_sagas.delay()
+
+
+def start_registration_batch(batch_id: str, users: List[Dict[str, Any]]) -> int:
+    """
+    Register many users as a group of chunk tasks of SAGA_BATCH_CHUNK_SIZE
+    users each, which workers run in parallel. Progress and per-item results
+    are logged under the batch (saga_log.get_batch). Returns the number of
+    chunks.
+    """
+    items = [dict(user, index=index) for index, user in enumerate(users)]
+    chunks = [items[start:start + SAGA_BATCH_CHUNK_SIZE] for start in range(0, len(items), SAGA_BATCH_CHUNK_SIZE)]
+    saga_log.begin_batch(batch_id, chunks)
+    group(
+        register_batch_chunk.si(batch_id, number, chunk).set(task_id=batch_chunk_id(batch_id, number))
+        for number, chunk in enumerate(chunks)
+    ).apply_async()
+    return len(chunks)
+
+
+@celery_app.task(bind=True, name='saga.registration.batch_chunk')
+def register_batch_chunk(self, batch_id: str, chunk: int, users: List[Dict[str, Any]],
+                         attempt: int = 0) -> Dict[str, int]:
+    """
+    One chunk of a batch registration: bulk-create the users (step 1), then
+    their profiles (step 2). Compensation is per item: only the users whose
+    profile could not be created are deleted again, the rest of the chunk
+    stands. If the quiz service cannot be reached, any profiles it may have
+    created are deleted and every user of the chunk is compensated.
+
+    Every step is logged in the chunk's state first. Whatever is left
+    unresolved (an unanswered lookup, a failed compensation, a dead worker)
+    stays in the log for recover_batch_chunk.
+    """
+    started = time.time()
+    if not saga_log.advance_chunk(batch_id, chunk, attempt, 'creating_users', expect=('queued',), started=started):
+        logger.info(f"[Batch {batch_id}] Chunk {chunk} superseded by recovery, skipping")
+        raise Ignore()
+
+    try:
+        # user_service commits only within commit_within, well inside our
+        # read timeout: if we time out, the lookup below sees the final state.
+        response = user_service.post('/users/bulk', timeout=(CONNECT_TIMEOUT, BULK_READ_TIMEOUT), json={
+            'users': [{field: user.get(field) for field in ('username', 'email', 'password')} for user in users],
+            'commit_within': BULK_READ_TIMEOUT * 0.8
+        })
+        response.raise_for_status()
+        user_results = response.json()['results']
+    except requests.exceptions.RequestException as e:
+        logger.error(f"[Batch {batch_id}] Chunk {chunk} step 1 ERROR: {str(e)}")
+        user_results = lookup_batch_users(batch_id, users, started, f'User service communication error: {str(e)}')
+        if user_results is None:
+            return {'chunk': chunk, 'created': 0, 'failed': 0}
+
+    created, results = batch_step1_results(users, user_results)
+    if not saga_log.advance_chunk(batch_id, chunk, attempt, 'users_created', expect=('creating_users',),
+                                  drop=('users',), created=created, results=results):
+        logger.info(f"[Batch {batch_id}] Chunk {chunk} superseded by recovery after creating users")
+        raise Ignore()
+    return create_batch_profiles(batch_id, chunk, attempt, created, results)
+
+
+def batch_step1_results(users: List[Dict[str, Any]], user_results: List[Dict[str, Any]]):
+    """The created users (user ID -> item index) and every item's result so far."""
+    created = {}
+    results = {}
+    for user, user_result in zip(users, user_results):
+        result = {'index': user['index'], 'username': user.get('username'), 'status': 'failed'}
+        if 'id' in user_result:
+            created[user_result['id']] = user['index']
+            result['user_id'] = user_result['id']
+        else:
+            result['error'] = user_result.get('error', 'Unknown error')
+        results[user['index']] = result
+    return created, results
+
+
+def create_batch_profiles(batch_id: str, chunk: int, attempt: int, created: Dict[int, int],
+                          results: Dict[int, Dict[str, Any]]) -> Dict[str, int]:
+    """Step 2 of a chunk: bulk-create the profiles of its created users."""
+    if not created:
+        return finish_batch_chunk(batch_id, chunk, attempt, results)
+    if not saga_log.advance_chunk(batch_id, chunk, attempt, 'creating_profiles', expect=('users_created',)):
+        logger.info(f"[Batch {batch_id}] Chunk {chunk} step 2 superseded by recovery, skipping")
+        raise Ignore()
+
+    unreachable = False
+    try:
+        response = quiz_service.post('/api/users/profiles/bulk', timeout=(CONNECT_TIMEOUT, BULK_READ_TIMEOUT), json={
+            'user_ids': list(created),
+            'default_preferences': PROFILE_DEFAULT_PREFERENCES
+        })
+        response.raise_for_status()
+        profile_errors = {
+            result['user_id']: result['error']
+            for result in response.json()['results'] if result['status'] != 'created'
+        }
+    except requests.exceptions.RequestException as e:
+        logger.error(f"[Batch {batch_id}] Chunk {chunk} step 2 ERROR: {str(e)}")
+        profile_errors = {user_id: f'Quiz service communication error: {str(e)}' for user_id in created}
+        unreachable = True
+
+    for user_id, index in created.items():
+        if user_id in profile_errors:
+            results[index]['error'] = profile_errors[user_id]
+        else:
+            results[index]['status'] = 'created'
+    if not profile_errors:
+        return finish_batch_chunk(batch_id, chunk, attempt, results)
+
+    undo = {user_id: index for user_id, index in created.items() if user_id in profile_errors}
+    if not saga_log.advance_chunk(batch_id, chunk, attempt, 'compensating', expect=('creating_profiles',),
+                                  created=undo, results=results):
+        logger.info(f"[Batch {batch_id}] Chunk {chunk} superseded by recovery before compensating")
+        raise Ignore()
+    return compensate_batch_chunk(batch_id, chunk, attempt, undo, results, profiles=unreachable)
+
+
+def compensate_batch_chunk(batch_id: str, chunk: int, attempt: int, undo: Dict[int, int],
+                           results: Dict[int, Dict[str, Any]], profiles: bool = True) -> Dict[str, int]:
+    """
+    Delete the users in undo (and first their profiles, if any may exist),
+    then finish the chunk. If a deletion fails the chunk stays in
+    compensating, and recovery retries it once it is stalled.
+    """
+    user_ids = list(undo)
+    if (profiles and not compensate_batch_profiles(batch_id, user_ids)) or not compensate_batch_users(batch_id, user_ids):
+        logger.error(f"[Batch {batch_id}] Chunk {chunk} left in compensating for recovery")
+        return {'chunk': chunk, 'created': 0, 'failed': 0}
+    for index in undo.values():
+        results[index].update(status='failed', compensated=True)
+    return finish_batch_chunk(batch_id, chunk, attempt, results)
+
+
+@celery_app.task(bind=True, name='saga.recovery.batch_chunk')
+def recover_batch_chunk(self, batch_id: str, chunk: int, attempt: int) -> Dict[str, Any]:
+    """
+    Resume or compensate one stalled batch chunk claimed as attempt.
+
+    A chunk stalled in creating_users is resolved with a lookup of its
+    users, which is safe once user_service's commit_within has passed. A
+    chunk stalled in creating_profiles may have some of its profiles, so it
+    is compensated as a whole, as is one that has been recovered
+    SAGA_RECOVERY_MAX_ATTEMPTS times.
+    """
+    state = saga_log.get_chunk(batch_id, chunk)
+    if not state or state['attempt'] != attempt or state['status'] == 'done':
+        return {'batch_id': batch_id, 'chunk': chunk, 'action': 'skipped'}
+
+    status = state['status']
+    exhausted = attempt > SAGA_RECOVERY_MAX_ATTEMPTS
+    logger.warning(f"[Batch {batch_id}] Recovering chunk {chunk} from {status} (attempt {attempt})")
+
+    if status == 'queued':
+        if not exhausted:
+            register_batch_chunk.delay(batch_id, chunk, state['users'], attempt)
+            return {'batch_id': batch_id, 'chunk': chunk, 'action': 'resumed', 'step': 1}
+        _, results = batch_step1_results(state['users'], [
+            {'error': 'Chunk stalled before creating its users and was abandoned by recovery'} for _ in state['users']
+        ])
+        finish_batch_chunk(batch_id, chunk, attempt, results)
+        return {'batch_id': batch_id, 'chunk': chunk, 'action': 'failed'}
+
+    created, results = state.get('created', {}), state.get('results', {})
+    if status == 'creating_users':
+        user_results = lookup_batch_users(batch_id, state['users'], state['started'],
+                                          'Chunk stalled while creating its users')
+        if user_results is None:
+            # Claimed again at the next sweep.
+            return {'batch_id': batch_id, 'chunk': chunk, 'action': 'retry'}
+        created, results = batch_step1_results(state['users'], user_results)
+        if not saga_log.advance_chunk(batch_id, chunk, attempt, 'users_created', expect=('creating_users',),
+                                      drop=('users',), created=created, results=results):
+            return {'batch_id': batch_id, 'chunk': chunk, 'action': 'skipped'}
+        status = 'users_created'
+
+    if status == 'users_created' and not exhausted:
+        create_batch_profiles(batch_id, chunk, attempt, created, results)
+        return {'batch_id': batch_id, 'chunk': chunk, 'action': 'resumed', 'step': 2}
+
+    if status != 'compensating':
+        for index in created.values():
+            results[index].update(status='failed', error='Chunk stalled and was compensated by recovery')
+        if not saga_log.advance_chunk(batch_id, chunk, attempt, 'compensating', expect=(status,),
+                                      created=created, results=results):
+            return {'batch_id': batch_id, 'chunk': chunk, 'action': 'skipped'}
+    compensate_batch_chunk(batch_id, chunk, attempt, created, results)
+    return {'batch_id': batch_id, 'chunk': chunk, 'action': 'compensated'}
+
+
+def lookup_batch_users(batch_id: str, users: List[Dict[str, Any]], started: float,
+                       error: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Step 1 results for a chunk whose bulk create failed without an answer:
+    it may have committed before the response was lost. Users with the
+    chunk's username and email, created since the chunk started (less a few
+    seconds of clock skew), are ours and carry on; the rest fail with error.
+    Returns None if the lookup itself fails: the users may exist, so the
+    chunk cannot be resolved yet.
+    """
+    try:
+        response = user_service.post('/users/bulk/lookup', timeout=(CONNECT_TIMEOUT, BULK_READ_TIMEOUT), json={
+            'usernames': [user.get('username') for user in users if isinstance(user.get('username'), str)]
+        })
+        response.raise_for_status()
+        found = {user['username']: user for user in response.json()['users']}
+    except requests.exceptions.RequestException as e:
+        logger.error(f"[Batch {batch_id}] Lookup after step 1 ERROR: {str(e)}")
+        return None
+
+    user_results = []
+    for user in users:
+        existing = found.get(user.get('username'))
+        if existing and existing['email'] == user.get('email') and _created_after(existing, started - 5):
+            user_results.append(existing)
+        else:
+            user_results.append({'error': error})
+    return user_results
+
+
+def finish_batch_chunk(batch_id: str, chunk: int, attempt: int, results: Dict[int, Dict[str, Any]]) -> Dict[str, int]:
+    if not saga_log.finish_chunk(batch_id, chunk, attempt, results):
+        logger.info(f"[Batch {batch_id}] Chunk {chunk} superseded by recovery before finishing")
+        raise Ignore()
+    created = sum(1 for result in results.values() if result['status'] == 'created')
+    logger.info(f"[Batch {batch_id}] Chunk {chunk}: {created} created, {len(results) - created} failed")
+    return {'chunk': chunk, 'created': created, 'failed': len(results) - created}
+
+
+def compensate_batch_users(batch_id: str, user_ids: List[int]) -> bool:
+    try:
+        response = user_service.post('/users/bulk/compensate', json={'user_ids': user_ids})
+        if response.status_code == 200:
+            logger.info(f"[Batch {batch_id}] COMPENSATE SUCCESS: {len(user_ids)} user(s) deleted")
+            return True
+        logger.error(f"[Batch {batch_id}] COMPENSATE FAILED: {response.json().get('error', 'Unknown error')}")
+    except requests.exceptions.RequestException as e:
+        logger.error(f"[Batch {batch_id}] COMPENSATE ERROR: {str(e)}")
+    return False
+
+
+def compensate_batch_profiles(batch_id: str, user_ids: List[int]) -> bool:
+    try:
+        response = quiz_service.post('/api/users/profiles/bulk/compensate', json={'user_ids': user_ids})
+        if response.status_code == 200:
+            return True
+        logger.warning(f"[Batch {batch_id}] COMPENSATE: Profile deletion returned {response.status_code}")
+    except requests.exceptions.RequestException as e:
+        logger.warning(f"[Batch {batch_id}] COMPENSATE ERROR: {str(e)}")
+    return False
+
+
 @celery_app.task(bind=True, name='saga.orchestrate_registration')
 def orchestrate_registration_saga(self, saga_id: str, user_data: Dict[str, Any]) -> Dict[str, Any]:
-    
+    """
+    Inline orchestrator: runs every step with .apply() inside this task, so
+    the worker slot is held for the whole saga. Kept for comparison with
+    start_registration_saga (SAGA_EXECUTION=inline).
+    """
     try:
         logger.info(f"[Saga {saga_id}] Starting Registration Saga Orchestration")
         
@@ -49,6 +49,11 @@ if ($eventlet -match "Name: eventlet") {
     pip install eventlet
 }
 
+# Migrations are a deploy step: the services no longer apply them at startup
+Write-Host "Applying database migrations..." -ForegroundColor Green
+python migrate.py quiz upgrade
+python migrate.py user_service upgrade
+
 Write-Host ""
 Write-Host "========================================" -ForegroundColor Cyan
 Write-Host "Service Startup Instructions" -ForegroundColor Cyan
@@ -0,0 +1,121 @@
+"""
+Archive tier behaviour across processes.
+
+The web app and archive_attempts.py run in different processes: history has
+to notice what the archiver moved, and IDs it freed must never be reused.
+
+Run with: python -m pytest test_archive.py
+"""
+import os
+import re
+import subprocess
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+import sqlalchemy as sa
+
+from app import create_app, db
+from app.migrations import upgrade_database
+from app.models import ArchivedAttempt, QuizAttempt
+from app.question_packs import load_pack
+from app.quiz.services import attempt_results, category_cache, question_bundles, question_pool
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+ANSWER = re.compile(rb'name="answer_(\d+)"\s+value="(\d+)"')
+
+
+def reset_caches():
+    question_pool.invalidate()
+    question_bundles.evict()
+    attempt_results.clear()
+    category_cache.invalidate()
+
+
+@pytest.fixture
+def urls(tmp_path):
+    return {
+        "DATABASE_URL": f"sqlite:///{tmp_path / 'quiz.db'}",
+        "ARCHIVE_DATABASE_URL": f"sqlite:///{tmp_path / 'archive.db'}",
+    }
+
+
+@pytest.fixture
+def quiz_app(tmp_path, urls):
+    reset_caches()
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": urls["DATABASE_URL"],
+        "SQLALCHEMY_BINDS": {"archive": urls["ARCHIVE_DATABASE_URL"]},
+        "QUIZ_STATE_BACKEND": "sqlite",
+        "QUIZ_STATE_SQLITE_PATH": str(tmp_path / "quiz_state.db"),
+        "TESTING": True,
+        "SECRET_KEY": "test",
+    })
+    with app.app_context():
+        upgrade_database()
+        load_pack(os.path.join(ROOT, "question_packs", "starter.json"))
+    yield app
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+    reset_caches()
+
+
+def take_quiz(client):
+    client.post("/quiz/start", data={"category_id": 1})
+    for index in range(1, 6):
+        match = ANSWER.search(client.get(f"/quiz/question/{index}").data)
+        client.post(f"/quiz/question/{index}", data={f"answer_{int(match.group(1))}": int(match.group(2))})
+    submitted = client.post("/quiz/submit")
+    assert submitted.status_code == 302
+    return submitted.headers["Location"]
+
+
+def run_archiver(tmp_path, urls):
+    """archive_attempts.py in its own process, like the nightly job."""
+    env = dict(os.environ, **urls, QUIZ_STATE_BACKEND="sqlite",
+               QUIZ_STATE_SQLITE_PATH=str(tmp_path / "quiz_state.db"))
+    subprocess.run(
+        [sys.executable, os.path.join(ROOT, "archive_attempts.py"), "--older-than-days", "1"],
+        cwd=ROOT, env=env, check=True, capture_output=True
+    )
+
+
+def test_history_sees_attempts_archived_by_another_process(quiz_app, tmp_path, urls):
+    client = quiz_app.test_client()
+    detail_url = take_quiz(client)
+    with quiz_app.app_context():
+        db.session.execute(sa.update(QuizAttempt).values(created_at=datetime.utcnow() - timedelta(days=30)))
+        db.session.commit()
+
+    before = client.get("/history/data").get_json()["items"]
+    assert len(before) == 1
+
+    run_archiver(tmp_path, urls)
+    with quiz_app.app_context():
+        assert QuizAttempt.query.count() == 0
+        assert db.session.get(ArchivedAttempt, before[0]["id"]) is not None
+
+    after = client.get("/history/data").get_json()["items"]
+    assert [item["id"] for item in after] == [before[0]["id"]]
+    assert client.get(detail_url).status_code == 200
+
+
+def test_archived_ids_are_not_reused(quiz_app, tmp_path, urls):
+    owner = quiz_app.test_client()
+    archived_url = take_quiz(owner)
+    with quiz_app.app_context():
+        db.session.execute(sa.update(QuizAttempt).values(created_at=datetime.utcnow() - timedelta(days=30)))
+        db.session.commit()
+    assert owner.get(archived_url).status_code == 200
+    run_archiver(tmp_path, urls)
+
+    other_url = take_quiz(quiz_app.test_client())
+    assert other_url != archived_url
+    # Served from the archive, not from a cached entry of another attempt.
+    assert owner.get(archived_url).status_code == 200
+
+    run_archiver(tmp_path, urls)
+    with quiz_app.app_context():
+        assert ArchivedAttempt.query.count() == 1
+        assert QuizAttempt.query.count() == 1
@@ -0,0 +1,347 @@
+"""
+Smoke test of both Flask services on a configurable database.
+
+By default each service runs on a fresh SQLite file. Point the test at a
+server database with TEST_DATABASE_URL (quiz), TEST_ARCHIVE_DATABASE_URL and
+TEST_USER_DATABASE_URL; CI runs it against a PostgreSQL container. The
+public schema of those databases is dropped and recreated first, so never
+point them at data you want to keep.
+
+Run with: python -m pytest test_database_backends.py
+"""
+import importlib.util
+import os
+import re
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+import sqlalchemy as sa
+
+from app import create_app, db
+from app.migrations import upgrade_database
+from app import retention
+from app.main import services as main_services
+from app.models import ArchivedAttempt, Choice, Question, QuizAttempt, UserStats
+from app.question_packs import load_pack
+from app.quiz.services import attempt_results, category_cache, ingest_attempts, question_bundles, question_pool
+from app.stats import rebuild_user_stats
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+ANSWER = re.compile(rb'name="answer_(\d+)"\s+value="(\d+)"')
+SERVICE_TOKEN = "test-service-token"
+SERVICE = {"X-Service-Token": SERVICE_TOKEN}
+
+
+def fresh_database(variable, default):
+    url = os.environ.get(variable)
+    if not url:
+        return default
+    engine = sa.create_engine(url)
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.exec_driver_sql("DROP SCHEMA public CASCADE")
+            conn.exec_driver_sql("CREATE SCHEMA public")
+    engine.dispose()
+    return url
+
+
+def reset_caches():
+    question_pool.invalidate()
+    question_bundles.evict()
+    attempt_results.clear()
+    category_cache.invalidate()
+
+
+@pytest.fixture
+def quiz_app(tmp_path):
+    reset_caches()
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": fresh_database("TEST_DATABASE_URL", f"sqlite:///{tmp_path / 'quiz.db'}"),
+        "SQLALCHEMY_BINDS": {
+            "archive": fresh_database("TEST_ARCHIVE_DATABASE_URL", f"sqlite:///{tmp_path / 'archive.db'}"),
+        },
+        "QUIZ_STATE_BACKEND": "sqlite",
+        "QUIZ_STATE_SQLITE_PATH": str(tmp_path / "quiz_state.db"),
+        "SERVICE_TOKEN": SERVICE_TOKEN,
+        "TESTING": True,
+        "SECRET_KEY": "test",
+    })
+    with app.app_context():
+        upgrade_database()
+        load_pack(os.path.join(ROOT, "question_packs", "starter.json"))
+    yield app
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+    reset_caches()
+
+
+@pytest.fixture
+def user_service(tmp_path, monkeypatch):
+    monkeypatch.setenv(
+        "DATABASE_URL", fresh_database("TEST_USER_DATABASE_URL", f"sqlite:///{tmp_path / 'users.db'}")
+    )
+    # Loaded from its file: user_service/app.py would clash with the quiz "app" package.
+    spec = importlib.util.spec_from_file_location("user_service_app", os.path.join(ROOT, "user_service", "app.py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    module.upgrade_schema()
+    yield module
+    with module.app.app_context():
+        for engine in module.db.engines.values():
+            engine.dispose()
+    sys.modules.pop(spec.name, None)
+
+
+def take_quiz(client, headers=None):
+    client.post("/quiz/start", data={"category_id": 1}, headers=headers)
+    for index in range(1, 6):
+        match = ANSWER.search(client.get(f"/quiz/question/{index}", headers=headers).data)
+        client.post(
+            f"/quiz/question/{index}",
+            data={f"answer_{int(match.group(1))}": int(match.group(2))},
+            headers=headers
+        )
+    return client.post("/quiz/submit", headers=headers)
+
+
+def test_quiz_service(quiz_app):
+    client = quiz_app.test_client()
+    headers = {"X-User-Id": "7"}
+
+    submitted = take_quiz(client, headers)
+    assert submitted.status_code == 302
+
+    assert client.get(submitted.headers["Location"], headers=headers).status_code == 200
+    items = client.get("/history/data", headers=headers).get_json()["items"]
+    assert [item["total"] for item in items] == [5]
+    assert client.get("/api/users/7/stats").status_code == 401
+    assert client.get("/api/users/7/stats", headers=SERVICE).get_json()["overall"]["attempt_count"] == 1
+    assert client.get("/api/export/attempts", headers=SERVICE).data.count(b"\n") == 1
+
+    assert client.post("/api/users/profiles/bulk", json={"user_ids": [21]}).status_code == 401
+    bulk = client.post("/api/users/profiles/bulk", json={"user_ids": [21, 22, 21]}, headers=SERVICE)
+    assert bulk.status_code == 207
+    assert [item["status"] for item in bulk.get_json()["results"]] == ["created", "created", "error"]
+    assert client.get("/api/users/22/profile").get_json()["user_id"] == 22
+    assert client.post("/api/users/profiles/bulk/compensate", json={"user_ids": [21, 22]}, headers=SERVICE).get_json()["deleted"] == 2
+
+    assert client.get("/api/pool").status_code == 401
+    pools = client.get("/api/pool", headers=SERVICE).get_json()["binds"]
+    assert pools["default"]["pool"] == "TimedQueuePool"
+    assert pools["default"]["checked_out"] == 0
+    assert pools["default"]["checkouts"] > 0
+    assert pools["default"]["max_overflow"] == 20
+
+
+def test_read_only_routing_ends_with_the_request(quiz_app):
+    client = quiz_app.test_client()
+    with quiz_app.app_context():
+        # Requests inside an outer app context share its g.
+        assert client.get("/history/data", headers={"X-User-Id": "4"}).status_code == 200
+        submitted = take_quiz(client, {"X-User-Id": "4"})
+        assert submitted.status_code == 302
+        assert len(client.get("/history/data", headers={"X-User-Id": "4"}).get_json()["items"]) == 1
+
+
+def test_attempt_batch_validates_each_item(quiz_app):
+    with quiz_app.app_context():
+        question = Question.query.filter_by(category_id=1).first()
+        choice_id = Choice.query.filter_by(question_id=question.id, is_correct=True).first().id
+    answers = {str(question.id): choice_id}
+    attempts = [
+        {"category_id": 1, "user_id": 5, "answers": answers},
+        {"category_id": [1], "user_id": 5, "answers": answers},
+        {"category_id": 1, "user_id": 5, "answers": answers, "total": {"n": 1}},
+        {"category_id": 1, "session_id": {"id": "x"}, "answers": answers},
+        {"category_id": 1, "user_id": True, "answers": answers},
+        {"category_id": 1, "user_id": 5, "answers": [{"question_id": [1], "choice_id": 1}]},
+        {"category_id": 1, "session_id": "kiosk-1", "answers": [{"question_id": question.id, "choice_id": choice_id}]},
+        {"category_id": 1, "user_id": 5, "answers": {str(question.id): choice_id + 0.7}},
+        {"category_id": 1, "user_id": 5, "answers": {str(question.id): True}},
+        {"category_id": 1, "user_id": 5, "answers": answers, "total": 6},
+        {"category_id": 1, "user_id": 6, "answers": answers, "total": 5, "created_at": "2024-05-01T12:00:00+02:00"},
+    ]
+    client = quiz_app.test_client()
+    assert client.post("/api/attempts/batch", json={"attempts": attempts}).status_code == 401
+
+    response = client.post("/api/attempts/batch", json={"attempts": attempts}, headers=SERVICE)
+    assert response.status_code == 207
+    body = response.get_json()
+    assert [item["status"] for item in body["results"]] == [
+        "created", "error", "error", "error", "error", "error", "created", "error", "error", "error", "created"
+    ]
+    assert body["results"][0]["score"] == 1
+    assert body["created"] == 3 and body["failed"] == 8
+    with quiz_app.app_context():
+        attempt = db.session.get(QuizAttempt, body["results"][-1]["attempt_id"])
+        assert (attempt.total, attempt.created_at) == (5, datetime(2024, 5, 1, 10, 0))
+
+
+def stats_rows(exact=True):
+    columns = [UserStats.user_id, UserStats.session_id, UserStats.category_id,
+               UserStats.attempt_count, UserStats.score_sum, UserStats.total_sum]
+    if exact:
+        columns += [UserStats.best_score, UserStats.last_attempt_at]
+    rows = db.session.query(*columns).all()
+    return sorted(rows, key=lambda row: (row[0] or 0, row[1] or "", row[2]))
+
+
+def test_chunked_guest_migration_keeps_stats_consistent(quiz_app, monkeypatch):
+    with quiz_app.app_context():
+        items = []
+        for category_id in (1, 2):
+            question = Question.query.filter_by(category_id=category_id).first()
+            choices = Choice.query.filter_by(question_id=question.id).order_by(Choice.is_correct).all()
+            for index in range(5):
+                choice = choices[-1] if index % 2 else choices[0]
+                items.append({"category_id": category_id, "session_id": "guest-1",
+                              "answers": {str(question.id): choice.id}})
+            items.append({"category_id": category_id, "user_id": 9, "answers": {str(question.id): choices[0].id}})
+        assert all(result["status"] == "created" for result in ingest_attempts(items))
+
+        # The migration stops after its first chunk: what was committed must
+        # already be consistent.
+        move_guest_stats = main_services.move_guest_stats
+        calls = []
+
+        def fail_second_chunk(*args):
+            calls.append(args)
+            if len(calls) == 2:
+                raise RuntimeError("connection lost")
+            move_guest_stats(*args)
+
+        monkeypatch.setattr(main_services, "move_guest_stats", fail_second_chunk)
+        with pytest.raises(RuntimeError):
+            main_services.migrate_guest_attempts("guest-1", 9, chunk_size=3)
+        partial = stats_rows(exact=False)
+        rebuild_user_stats()
+        assert stats_rows(exact=False) == partial
+
+        monkeypatch.setattr(main_services, "move_guest_stats", move_guest_stats)
+        assert main_services.migrate_guest_attempts("guest-1", 9, chunk_size=3) == 7
+        migrated = stats_rows()
+        assert [row[:4] for row in migrated] == [(9, None, 1, 6), (9, None, 2, 6)]
+        rebuild_user_stats()
+        assert stats_rows() == migrated
+
+
+def test_retention_dry_run_matches_real_run(quiz_app, monkeypatch):
+    monkeypatch.setattr(retention, "SESSION_CHUNK", 2)
+    old = (datetime.utcnow() - timedelta(days=60)).isoformat()
+    with quiz_app.app_context():
+        question = Question.query.filter_by(category_id=1).first()
+        answers = {str(question.id): Choice.query.filter_by(question_id=question.id).first().id}
+        items = [{"category_id": 1, "session_id": f"idle-{i}", "answers": answers, "created_at": old} for i in range(5)]
+        items += [
+            {"category_id": 1, "session_id": "active", "answers": answers},
+            {"category_id": 1, "user_id": 3, "answers": answers, "created_at": old},
+        ]
+        assert all(result["status"] == "created" for result in ingest_attempts(items))
+        db.session.add(QuizAttempt(category_id=1, score=0, total=1, created_at=datetime.utcnow() - timedelta(days=60)))
+        for attempt_id, session_id in ((9001, "idle-0"), (9002, "archived-only")):
+            db.session.add(ArchivedAttempt(id=attempt_id, category_id=1, session_id=session_id, score=0, total=1,
+                                           created_at=datetime.utcnow() - timedelta(days=90), payload=b""))
+        db.session.commit()
+
+        ignored = ("cutoff", "dry_run", "batches", "reclaimable_bytes")
+        planned = retention.compact_guest_attempts(dry_run=True)
+        done = retention.compact_guest_attempts()
+        assert {k: v for k, v in planned.items() if k not in ignored} == {
+            k: v for k, v in done.items() if k not in ignored
+        }
+        assert (done["sessions"], done["attempts"], done["answers"], done["archived_attempts"]) == (6, 6, 5, 2)
+        assert retention.compact_guest_attempts(dry_run=True)["attempts"] == 0
+        assert QuizAttempt.query.count() == 2
+
+
+def test_retention_keeps_guests_who_come_back(quiz_app, monkeypatch):
+    old = (datetime.utcnow() - timedelta(days=60)).isoformat()
+    with quiz_app.app_context():
+        question = Question.query.filter_by(category_id=1).first()
+        answers = {str(question.id): Choice.query.filter_by(question_id=question.id).first().id}
+        items = [{"category_id": 1, "session_id": session_id, "answers": answers, "created_at": old}
+                 for session_id in ("idle", "back")]
+        assert all(result["status"] == "created" for result in ingest_attempts(items))
+        db.session.add(ArchivedAttempt(id=9001, category_id=1, session_id="back", score=0, total=1,
+                                       created_at=datetime.utcnow() - timedelta(days=90), payload=b""))
+        db.session.commit()
+
+        # The guest submits right after the sessions were picked.
+        find_orphaned_guest_sessions = retention.find_orphaned_guest_sessions
+
+        def guest_comes_back(cutoff):
+            sessions = find_orphaned_guest_sessions(cutoff)
+            assert ingest_attempts([{"category_id": 1, "session_id": "back", "answers": answers}])[0]["status"] == "created"
+            return sessions
+
+        monkeypatch.setattr(retention, "find_orphaned_guest_sessions", guest_comes_back)
+        report = retention.compact_guest_attempts()
+        assert (report["sessions"], report["attempts"], report["archived_attempts"], report["stats_rows"]) == (2, 1, 0, 1)
+        assert [attempt.session_id for attempt in QuizAttempt.query.all()] == ["back", "back"]
+        assert db.session.get(ArchivedAttempt, 9001) is not None
+        assert [row[:4] for row in stats_rows()] == [(None, "back", 1, 2)]
+
+
+def test_export_is_service_only(quiz_app):
+    guest = quiz_app.test_client()
+    take_quiz(guest)
+    with guest.session_transaction() as session:
+        guest_session = session["anonymous_session_id"]
+
+    client = quiz_app.test_client()
+    assert client.get("/api/export/attempts").status_code == 401
+    assert client.get("/api/export/attempts", headers={"X-Service-Token": "wrong"}).status_code == 401
+    exported = client.get("/api/export/attempts", headers=SERVICE)
+    assert exported.status_code == 200
+    assert b"session_id" not in exported.data and guest_session.encode() not in exported.data
+
+    # Naming another guest's session does not claim its attempts.
+    claimed = client.post("/migrate-guest-results", json={"session_id": guest_session}, headers={"X-User-Id": "9"})
+    assert claimed.get_json()["migrated"] == 0
+    assert guest.post("/migrate-guest-results", headers={"X-User-Id": "9"}).get_json()["migrated"] == 1
+
+    quiz_app.config["SERVICE_TOKEN"] = None
+    assert client.get("/api/export/attempts", headers=SERVICE).status_code == 403
+
+
+def test_user_service(user_service):
+    client = user_service.app.test_client()
+
+    created = client.post("/users", json={"username": "ada", "email": "ada@example.com", "password": "pw"})
+    assert created.status_code == 201
+    user_id = created.get_json()["id"]
+
+    assert client.post("/users/validate", json={"username": "ada", "password": "pw"}).status_code == 200
+    assert client.get(f"/users/{user_id}").get_json()["username"] == "ada"
+    assert client.delete(f"/users/{user_id}/compensate").status_code == 200
+    assert client.get(f"/users/{user_id}").status_code == 404
+
+    bulk = client.post("/users/bulk", json={"users": [
+        {"username": "grace", "email": "grace@example.com", "password": "pw"},
+        {"username": "grace", "email": "other@example.com", "password": "pw"},
+        {"username": "linus", "email": "linus@example.com"},
+        {"username": "x" * 81, "email": "long@example.com", "password": "pw"},
+        {"username": "barbara", "email": "b" * 110 + "@example.com", "password": "pw"},
+        {"username": "edsger", "email": "edsger@example.com", "password": "pw"},
+    ]}).get_json()
+    assert bulk["created"] == 2
+    assert [result.get("error") for result in bulk["results"][1:]] == [
+        "Username already exists", "Missing required fields: username, email, password",
+        "username must be at most 80 characters", "email must be at most 120 characters", None
+    ]
+    for commit_within in ("soon", True, -1):
+        assert client.post("/users/bulk", json={"users": [], "commit_within": commit_within}).status_code == 400
+    unhashable = client.post("/users/bulk", json={"users": [
+        {"username": ["ada"], "email": {"at": "example.com"}, "password": "pw"},
+    ]})
+    assert unhashable.get_json()["results"][0]["error"] == "Missing required fields: username, email, password"
+    assert client.post("/users/bulk/lookup", json={"usernames": [["grace"]]}).status_code == 400
+    found = client.post("/users/bulk/lookup", json={"usernames": ["grace", "linus"]}).get_json()["users"]
+    assert [user["id"] for user in found] == [bulk["results"][0]["id"]]
+    assert client.post("/users/bulk/compensate", json={"user_ids": [found[0]["id"]]}).get_json()["deleted"] == 1
+
+    pool = client.get("/pool").get_json()["binds"]["default"]
+    assert pool["checked_out"] == 0
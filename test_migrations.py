@@ -0,0 +1,116 @@
+"""
+Schema migrations: upgrading a database created before migrations existed,
+and several processes upgrading the same database at once.
+
+Run with: python -m pytest test_migrations.py
+"""
+import os
+import threading
+from datetime import datetime
+
+import sqlalchemy as sa
+
+from dbmigrate import MigrationRunner
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+QUIZ_MIGRATIONS = os.path.join(ROOT, "app", "migrations")
+USER_MIGRATIONS = os.path.join(ROOT, "user_service", "migrations")
+
+
+def sqlite_engine(path):
+    return sa.create_engine(f"sqlite:///{path}", connect_args={"timeout": 30})
+
+
+def create_baseline(engine):
+    """The quiz schema as db.create_all() left it, with a legacy answer."""
+    MigrationRunner(engine, QUIZ_MIGRATIONS).upgrade(target="0001", pause=0)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE schema_migrations")
+        conn.exec_driver_sql("INSERT INTO categories (id, name) VALUES (1, 'Geography')")
+        conn.exec_driver_sql("INSERT INTO questions (id, text, correct_choice, category_id) VALUES (1, 'Capital?', 'B', 1)")
+        conn.exec_driver_sql("INSERT INTO choices (id, text, question_id) VALUES (1, 'Lyon', 1), (2, 'Paris', 1)")
+        conn.execute(
+            sa.text("INSERT INTO quiz_attempts (id, category_id, user_id, score, total, created_at) "
+                    "VALUES (7, 1, 3, 1, 1, :created_at)"),
+            {"created_at": datetime(2024, 1, 1)}
+        )
+        conn.exec_driver_sql(
+            "INSERT INTO quiz_answers (id, quiz_attempt_id, question_id, selected_choice) VALUES (1, 7, 1, 'Paris')"
+        )
+
+
+def test_upgrade_from_baseline(tmp_path):
+    engine = sqlite_engine(tmp_path / "quiz.db")
+    create_baseline(engine)
+
+    runner = MigrationRunner(engine, QUIZ_MIGRATIONS)
+    reports = runner.upgrade(pause=0)
+    assert [report["version"] for report in reports] == [m.version for m in runner.migrations()]
+    assert runner.pending() == []
+    assert runner.upgrade(pause=0) == []
+
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("SELECT id, is_correct FROM choices ORDER BY id").all() == [(1, 0), (2, 1)]
+        assert conn.exec_driver_sql(
+            "SELECT quiz_attempt_id, selected_choice_id, is_correct, selected_choice FROM quiz_answers"
+        ).all() == [(7, 2, 1, None)]
+        assert conn.exec_driver_sql(
+            "SELECT user_id, category_id, attempt_count, best_score FROM user_stats"
+        ).all() == [(3, 1, 1, 1)]
+        # Attempt IDs are never reused once the table has AUTOINCREMENT.
+        conn.exec_driver_sql("DELETE FROM quiz_answers")
+        conn.exec_driver_sql("DELETE FROM quiz_attempts")
+        conn.exec_driver_sql("INSERT INTO quiz_attempts (category_id, score, total) VALUES (1, 0, 1)")
+        assert conn.exec_driver_sql("SELECT id FROM quiz_attempts").scalar() == 8
+        conn.commit()
+    engine.dispose()
+
+
+def test_concurrent_upgrades_apply_each_migration_once(tmp_path):
+    path = tmp_path / "quiz.db"
+    create_baseline(sqlite_engine(path))
+
+    engines = [sqlite_engine(path) for _ in range(3)]
+    reports, errors = [], []
+
+    def upgrade(engine):
+        try:
+            reports.append(MigrationRunner(engine, QUIZ_MIGRATIONS).upgrade(pause=0))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=upgrade, args=(engine,)) for engine in engines]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    applied = sorted(report["version"] for run in reports for report in run)
+    runner = MigrationRunner(engines[0], QUIZ_MIGRATIONS)
+    assert applied == [m.version for m in runner.migrations()]
+    assert runner.pending() == []
+    with engines[0].connect() as conn:
+        assert conn.exec_driver_sql("SELECT COUNT(*) FROM schema_migrations_lock").scalar() == 0
+    for engine in engines:
+        engine.dispose()
+
+
+def test_user_service_baseline(tmp_path):
+    engine = sqlite_engine(tmp_path / "users.db")
+    runner = MigrationRunner(engine, USER_MIGRATIONS)
+    assert [report["version"] for report in runner.upgrade()] == [m.version for m in runner.migrations()]
+    assert runner.upgrade() == []
+    assert sa.inspect(engine).has_table("users")
+    engine.dispose()
+
+
+def test_dry_run_on_empty_database(tmp_path):
+    engine = sqlite_engine(tmp_path / "quiz.db")
+    runner = MigrationRunner(engine, QUIZ_MIGRATIONS)
+    reports = runner.upgrade(dry_run=True, pause=0)
+    assert [report["version"] for report in reports] == [m.version for m in runner.migrations()]
+    assert all(report["dry_run"] for report in reports)
+    # Nothing was written, not even the bookkeeping tables.
+    assert sa.inspect(engine).get_table_names() == []
+    engine.dispose()
@@ -0,0 +1,188 @@
+"""
+Process-local caches and page ETags when another process changes the data.
+
+Each worker caches categories and question IDs and answers revalidations
+itself, so a change made by another process (a pack load, a batch upload)
+must still reach the caches and the ETags the first process hands out.
+
+Run with: python -m pytest test_page_cache.py
+"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from app import create_app, db
+from app.migrations import upgrade_database
+from app.models import Category, Choice, Question
+from app.question_packs import load_pack
+from app.quiz.services import attempt_results, category_cache, ingest_attempts, question_bundles, question_pool
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def reset_caches():
+    question_pool.invalidate()
+    question_bundles.evict()
+    attempt_results.clear()
+    category_cache.invalidate()
+
+
+@pytest.fixture
+def env(tmp_path):
+    return dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{tmp_path / 'quiz.db'}",
+        ARCHIVE_DATABASE_URL=f"sqlite:///{tmp_path / 'archive.db'}",
+        QUIZ_STATE_BACKEND="sqlite",
+        QUIZ_STATE_SQLITE_PATH=str(tmp_path / "quiz_state.db"),
+    )
+
+
+@pytest.fixture
+def quiz_app(env):
+    reset_caches()
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": env["DATABASE_URL"],
+        "SQLALCHEMY_BINDS": {"archive": env["ARCHIVE_DATABASE_URL"]},
+        "QUIZ_STATE_BACKEND": "sqlite",
+        "QUIZ_STATE_SQLITE_PATH": env["QUIZ_STATE_SQLITE_PATH"],
+        "TESTING": True,
+        "SECRET_KEY": "test",
+    })
+    with app.app_context():
+        upgrade_database()
+        load_pack(os.path.join(ROOT, "question_packs", "starter.json"))
+    yield app
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+    reset_caches()
+
+
+def in_other_process(env, code):
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, check=True, capture_output=True)
+
+
+def revalidate(client, url, response, headers=None):
+    return client.get(url, headers=dict(headers or {}, **{"If-None-Match": response.headers["ETag"]}))
+
+
+def load_in_other_process(env, tmp_path, questions):
+    pack = tmp_path / "pack.json"
+    pack.write_text(json.dumps(questions))
+    subprocess.run([sys.executable, "load_questions.py", str(pack), "--quiet"],
+                   cwd=ROOT, env=env, check=True, capture_output=True)
+
+
+def test_home_sees_categories_loaded_by_another_process(quiz_app, env, tmp_path):
+    client = quiz_app.test_client()
+    home = client.get("/")
+    assert revalidate(client, "/", home).status_code == 304
+
+    load_in_other_process(env, tmp_path, [
+        {"category": "Astronomy", "text": "Closest star?", "choices": ["Sirius", "The Sun"], "correct": "B"}
+    ])
+
+    changed = revalidate(client, "/", home)
+    assert changed.status_code == 200
+    assert b"Astronomy" in changed.data
+
+
+def test_question_pool_sees_questions_loaded_by_another_process(quiz_app, env, tmp_path):
+    with quiz_app.app_context():
+        math = Category.query.filter_by(name="Math").one().id
+        before = question_pool.get(math)
+
+    load_in_other_process(env, tmp_path, [
+        {"category": "Math", "text": "What is 6 x 7?", "choices": ["42", "48"], "correct": "A"}
+    ])
+
+    with quiz_app.app_context():
+        added = Question.query.filter_by(text="What is 6 x 7?").one().id
+        assert set(question_pool.get(math)) == set(before) | {added}
+
+
+def test_history_sees_attempts_recorded_by_another_process(quiz_app, env):
+    client = quiz_app.test_client()
+    headers = {"X-User-Id": "7"}
+    history = client.get("/history/data", headers=headers)
+    assert history.get_json()["items"] == []
+    assert revalidate(client, "/history/data", history, headers).status_code == 304
+
+    in_other_process(env, """
+from app import create_app
+from app.models import Choice
+from app.quiz.services import ingest_attempts
+with create_app().app_context():
+    choice = Choice.query.filter_by(is_correct=True).first()
+    ingest_attempts([{"category_id": choice.question.category_id, "user_id": 7,
+                      "answers": {str(choice.question_id): choice.id}}])
+""")
+
+    changed = revalidate(client, "/history/data", history, headers)
+    assert changed.status_code == 200
+    assert len(changed.get_json()["items"]) == 1
+    assert revalidate(client, "/history/data", changed, headers).status_code == 304
+
+
+def test_question_bundles_see_choices_edited_by_another_process(quiz_app, env):
+    with quiz_app.app_context():
+        question = Question.query.first()
+        before = question_bundles.get(question.id)
+        choice_id = before.choices[0].id
+
+    in_other_process(env, f"""
+from app import create_app, db
+from app.models import Choice
+with create_app().app_context():
+    db.session.get(Choice, {choice_id}).text = "Edited elsewhere"
+    db.session.commit()
+""")
+
+    with quiz_app.app_context():
+        after = question_bundles.get(question.id)
+        assert after.choices[0] == (choice_id, "Edited elsewhere")
+        assert after.choices[1:] == before.choices[1:]
+
+
+def test_question_bundles_see_questions_edited_by_a_pack_load(quiz_app, env, tmp_path):
+    with quiz_app.app_context():
+        question = Question.query.filter_by(text="What is 3/4 + 1/4?").one()
+        assert [choice.text for choice in question_bundles.get(question.id).choices] == ["1/2", "1", "3/4", "2"]
+
+    load_in_other_process(env, tmp_path, [
+        {"category": "Math", "text": "What is 3/4 + 1/4?", "choices": ["0.5", "1.0", "0.75", "2.0"], "correct": "B"}
+    ])
+
+    with quiz_app.app_context():
+        assert [choice.text for choice in question_bundles.get(question.id).choices] == ["0.5", "1.0", "0.75", "2.0"]
+
+
+def test_attempt_detail_sees_choices_edited_by_another_process(quiz_app, env):
+    with quiz_app.app_context():
+        choice = Choice.query.filter_by(is_correct=True).first()
+        choice_id, question_id, category_id = choice.id, choice.question_id, choice.question.category_id
+        [result] = ingest_attempts([{"category_id": category_id, "user_id": 7,
+                                     "answers": {str(question_id): choice_id}}])
+
+    client = quiz_app.test_client()
+    headers = {"X-User-Id": "7"}
+    url = f"/quiz/detail/{result['attempt_id']}"
+    detail = client.get(url, headers=headers)
+    assert b"Edited elsewhere" not in detail.data
+    assert revalidate(client, url, detail, headers).status_code == 304
+
+    in_other_process(env, f"""
+from app import create_app, db
+from app.models import Choice
+with create_app().app_context():
+    db.session.get(Choice, {choice_id}).text = "Edited elsewhere"
+    db.session.commit()
+""")
+
+    changed = revalidate(client, url, detail, headers)
+    assert changed.status_code == 200
+    assert b"Edited elsewhere" in changed.data
@@ -0,0 +1,137 @@
+"""
+Query-plan regression test for the quiz service's hot paths.
+
+Drives the quiz and history routes against an in-memory SQLite database,
+records every SELECT they issue and runs EXPLAIN QUERY PLAN on it. Fails if a
+hot table is read with a full scan instead of an index lookup.
+
+Run with: python -m pytest test_query_plans.py
+"""
+import re
+
+import pytest
+from sqlalchemy import event
+
+from app import create_app, db
+from app.migrations import upgrade_database
+from app.models import Category, Choice, Question, QuizAttempt
+from app.quiz.services import attempt_results, question_bundles, question_pool
+
+# Tables that grow with usage; categories is small and listed in full on the home page.
+HOT_TABLES = {"questions", "choices", "quiz_attempts", "quiz_answers", "user_stats"}
+SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)")
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": "sqlite://",
+        "SQLALCHEMY_BINDS": {"archive": "sqlite://"},
+        "QUIZ_STATE_BACKEND": "sqlite",
+        "QUIZ_STATE_SQLITE_PATH": str(tmp_path / "quiz_state.db"),
+        "TESTING": True,
+        "SECRET_KEY": "test",
+        "SERVICE_TOKEN": "test-service-token",
+    })
+    with app.app_context():
+        upgrade_database()
+        for c in range(3):
+            category = Category(name=f"Category {c}")
+            db.session.add(category)
+            db.session.flush()
+            for q in range(8):
+                question = Question(text=f"Question {c}.{q}", correct_choice="A", category_id=category.id)
+                db.session.add(question)
+                db.session.flush()
+                db.session.add_all([
+                    Choice(text=f"Choice {letter}", question_id=question.id, is_correct=letter == "A")
+                    for letter in "ABCD"
+                ])
+        db.session.commit()
+
+        question_pool.invalidate()
+        question_bundles.evict()
+        attempt_results.clear()
+        yield app
+        question_pool.invalidate()
+        question_bundles.evict()
+        attempt_results.clear()
+
+
+@pytest.fixture
+def statements(app):
+    """Collect every SELECT issued on the quiz database."""
+    captured = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and not executemany:
+            captured.append((statement, parameters))
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", record)
+    yield captured
+    event.remove(engine, "before_cursor_execute", record)
+
+
+def full_scans(app, captured):
+    """Return (table, statement) for each hot table read with a full scan."""
+    scans = []
+    with app.app_context():
+        conn = db.engine.raw_connection()
+        try:
+            for statement, parameters in captured:
+                for row in conn.execute(f"EXPLAIN QUERY PLAN {statement}", parameters):
+                    match = SCAN.match(row[-1])
+                    if match and match.group(1) in HOT_TABLES:
+                        scans.append((match.group(1), statement))
+        finally:
+            conn.close()
+    return scans
+
+
+def take_quiz(client, category_id, headers=None):
+    client.post("/quiz/start", data={"category_id": category_id}, headers=headers)
+    for index in range(1, 6):
+        page = client.get(f"/quiz/question/{index}", headers=headers)
+        choice_id = re.search(rb'name="answer_(\d+)"\s+value="(\d+)"', page.data)
+        client.post(
+            f"/quiz/question/{index}",
+            data={f"answer_{int(choice_id.group(1))}": int(choice_id.group(2))},
+            headers=headers
+        )
+    return client.post("/quiz/submit", headers=headers)
+
+
+def test_quiz_routes_use_indexes(app, statements):
+    client = app.test_client()
+    headers = {"X-User-Id": "7"}
+
+    submitted = take_quiz(client, 1, headers)
+    assert submitted.status_code == 302
+    attempt_results.clear()
+    detail = client.get(submitted.headers["Location"], headers=headers)
+    assert detail.status_code == 200
+
+    assert statements, "no queries were captured"
+    assert full_scans(app, statements) == []
+
+
+def test_history_routes_use_indexes(app, statements):
+    user_client = app.test_client()
+    guest_client = app.test_client()
+    for _ in range(3):
+        take_quiz(user_client, 2, {"X-User-Id": "7"})
+        take_quiz(guest_client, 3)
+    with app.app_context():
+        assert QuizAttempt.query.count() == 6
+    statements.clear()
+
+    assert user_client.get("/history", headers={"X-User-Id": "7"}).status_code == 200
+    assert user_client.get("/history/data", headers={"X-User-Id": "7"}).status_code == 200
+    assert guest_client.get("/history").status_code == 200
+    assert guest_client.get("/history/data").status_code == 200
+    assert user_client.get("/api/users/7/stats", headers={"X-Service-Token": "test-service-token"}).status_code == 200
+
+    assert statements, "no queries were captured"
+    assert full_scans(app, statements) == []
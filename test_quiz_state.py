@@ -0,0 +1,95 @@
+"""
+Quiz state stores: round trips, expiry and writes racing the expiry.
+
+The Redis store runs against fakeredis, the SQLite store against a file in
+the test's temporary directory.
+
+Run with: python -m pytest test_quiz_state.py
+"""
+import time
+
+import pytest
+import redis
+from flask import Flask
+
+from app.quiz.state import RedisQuizStateStore, SQLiteQuizStateStore, init_quiz_state_store
+
+
+@pytest.fixture
+def redis_client():
+    fakeredis = pytest.importorskip("fakeredis")
+    return fakeredis.FakeRedis()
+
+
+@pytest.fixture(params=["redis", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "redis":
+        return RedisQuizStateStore(request.getfixturevalue("redis_client"), ttl=60)
+    return SQLiteQuizStateStore(str(tmp_path / "quiz_state.db"), ttl=60)
+
+
+def expire(store, state_id):
+    """Make a state expire now, as if its TTL had run out."""
+    if isinstance(store, RedisQuizStateStore):
+        store.client.delete(store._key(state_id))
+    else:
+        store._connect().execute("UPDATE quiz_states SET expires_at = ? WHERE id = ?", (time.time() - 1, state_id))
+
+
+def test_round_trip(store):
+    state_id = store.create(3, [10, 11, 12])
+    assert store.set_choice_order(state_id, 10, [4, 2, 1]) == [4, 2, 1]
+    # The first shuffle wins.
+    assert store.set_choice_order(state_id, 10, [1, 2, 4]) == [4, 2, 1]
+    assert store.set_answer(state_id, 10, 2) is True
+    assert store.set_answer(state_id, 10, 4) is True
+
+    assert store.load(state_id) == {
+        "category_id": 3,
+        "question_ids": [10, 11, 12],
+        "answers": {"10": 4},
+        "choice_orders": {"10": [4, 2, 1]},
+    }
+    store.delete(state_id)
+    assert store.load(state_id) is None
+
+
+def test_writes_after_expiry_leave_nothing_behind(store):
+    state_id = store.create(3, [10, 11])
+    expire(store, state_id)
+
+    assert store.set_answer(state_id, 10, 2) is False
+    assert store.set_choice_order(state_id, 11, [5, 6]) == [5, 6]
+    assert store.load(state_id) is None
+
+    if isinstance(store, RedisQuizStateStore):
+        assert not store.client.exists(store._key(state_id))
+    else:
+        assert store._connect().execute("SELECT COUNT(*) FROM quiz_state_entries").fetchone()[0] == 0
+
+
+def test_writes_after_delete_leave_nothing_behind(store):
+    state_id = store.create(3, [10])
+    store.delete(state_id)
+    assert store.set_answer(state_id, 10, 2) is False
+    assert store.load(state_id) is None
+
+
+def test_redis_load_ignores_partial_hash(redis_client):
+    store = RedisQuizStateStore(redis_client, ttl=60)
+    redis_client.hset(store._key("partial"), "answer:10", 2)
+    assert store.load("partial") is None
+
+
+def test_backend_is_chosen_from_config(tmp_path, monkeypatch):
+    monkeypatch.delenv("REDIS_URL", raising=False)
+    monkeypatch.delenv("QUIZ_STATE_REDIS_URL", raising=False)
+    app = Flask(__name__, instance_path=str(tmp_path))
+    app.config.update(QUIZ_STATE_BACKEND="auto", QUIZ_STATE_SQLITE_PATH=str(tmp_path / "state.db"))
+    assert isinstance(init_quiz_state_store(app), SQLiteQuizStateStore)
+
+    # A configured Redis that is down is an error, not a per-process fallback.
+    app = Flask(__name__, instance_path=str(tmp_path))
+    app.config.update(QUIZ_STATE_BACKEND="auto", QUIZ_STATE_REDIS_URL="redis://127.0.0.1:1/0")
+    with pytest.raises(redis.exceptions.ConnectionError):
+        init_quiz_state_store(app)
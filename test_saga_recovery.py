@@ -0,0 +1,199 @@
+"""
+Batch registration chunks: fencing out superseded workers, and recovering
+or compensating chunks whose worker died.
+
+The saga log runs on fakeredis and both services are in-memory fakes, so
+no worker, broker or service has to be running.
+
+Run with: python -m pytest test_saga_recovery.py
+"""
+from datetime import datetime
+
+import pytest
+import requests
+from celery.exceptions import Ignore
+
+from saga_orchestrator import tasks
+from saga_orchestrator.saga_log import saga_log
+
+
+class WorkerDied(BaseException):
+    """Stands in for a worker killed in the middle of a request."""
+
+
+class Response:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.body = body
+
+    def json(self):
+        return self.body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} error")
+
+
+class FakeService:
+    """Bulk endpoints of user_service and the quiz service, kept in memory."""
+
+    def __init__(self):
+        self.users = {}
+        self.profiles = set()
+        self.failures = {}
+        self.calls = []
+
+    def post(self, path, json=None, timeout=None):
+        self.calls.append(path)
+        failure = self.failures.pop(path, None)
+        if isinstance(failure, BaseException):
+            raise failure
+        if failure == "after_commit":
+            self.handle(path, json)
+            raise requests.exceptions.ReadTimeout("read timed out")
+        if failure:
+            return Response(failure, {"error": "Service unavailable"})
+        return self.handle(path, json)
+
+    def handle(self, path, body):
+        if path == "/users/bulk":
+            results = []
+            for user in body["users"]:
+                user_id = len(self.users) + 1
+                self.users[user_id] = dict(user, id=user_id, created_at=datetime.utcnow().isoformat())
+                results.append(self.users[user_id])
+            return Response(201, {"results": results})
+        if path == "/users/bulk/lookup":
+            return Response(200, {"users": [user for user in self.users.values() if user["username"] in body["usernames"]]})
+        if path == "/users/bulk/compensate":
+            for user_id in body["user_ids"]:
+                self.users.pop(user_id, None)
+            return Response(200, {"deleted": len(body["user_ids"])})
+        if path == "/api/users/profiles/bulk":
+            self.profiles.update(body["user_ids"])
+            return Response(201, {"results": [{"user_id": user_id, "status": "created"} for user_id in body["user_ids"]]})
+        if path == "/api/users/profiles/bulk/compensate":
+            self.profiles.difference_update(body["user_ids"])
+            return Response(200, {"deleted": len(body["user_ids"])})
+        raise AssertionError(f"unexpected request to {path}")
+
+
+@pytest.fixture
+def service(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    monkeypatch.setattr(saga_log, "redis", fakeredis.FakeRedis(decode_responses=True))
+    service = FakeService()
+    monkeypatch.setattr(tasks, "user_service", service)
+    monkeypatch.setattr(tasks, "quiz_service", service)
+    monkeypatch.setattr(tasks, "SAGA_BATCH_STALL_SECONDS", 0)
+    return service
+
+
+@pytest.fixture
+def queued(monkeypatch):
+    """Tasks queued with .delay, as (task name, args)."""
+    queued = []
+    for task in (tasks.recover_batch_chunk, tasks.register_batch_chunk, tasks.recover_stalled_sagas):
+        monkeypatch.setattr(task, "delay", lambda *args, name=task.name: queued.append((name, args)))
+    return queued
+
+
+def begin(batch_id, count=3):
+    users = [
+        {"username": f"user{i}", "email": f"user{i}@example.com", "password": "secret", "index": i}
+        for i in range(count)
+    ]
+    saga_log.begin_batch(batch_id, [users])
+    return users
+
+
+def sweep(queued):
+    """Run the recovery sweep and every chunk recovery it queues."""
+    queued.clear()
+    tasks.recover_stalled_sagas()
+    claimed = [args for name, args in queued if name == "saga.recovery.batch_chunk"]
+    for args in claimed:
+        tasks.recover_batch_chunk(*args)
+    return claimed
+
+
+def test_chunk_completes_and_leaves_nothing_to_recover(service, queued):
+    users = begin("b1")
+    assert tasks.register_batch_chunk("b1", 0, users) == {"chunk": 0, "created": 3, "failed": 0}
+    assert saga_log.get_chunk("b1", 0)["status"] == "done"
+    assert sweep(queued) == []
+    batch = saga_log.get_batch("b1")
+    assert batch["chunks_done"] == 1
+    assert [result["status"] for result in batch["results"]] == ["created"] * 3
+
+
+def test_unanswered_step_is_resolved_by_recovery_and_fences_the_old_task(service, queued):
+    users = begin("b2")
+    service.failures["/users/bulk"] = "after_commit"
+    service.failures["/users/bulk/lookup"] = requests.exceptions.ConnectionError("refused")
+    # The users were committed but neither the response nor the lookup came
+    # back: the chunk must not be finished as failed, or they are orphaned.
+    tasks.register_batch_chunk("b2", 0, users)
+    assert saga_log.get_chunk("b2", 0)["status"] == "creating_users"
+    assert saga_log.get_batch("b2")["chunks_done"] == 0
+
+    assert sweep(queued) == [("b2", 0, 1)]
+    batch = saga_log.get_batch("b2")
+    assert [result["status"] for result in batch["results"]] == ["created"] * 3
+    assert len(service.users) == 3
+    assert service.profiles == set(service.users)
+
+    # The original task, redelivered, is fenced out before it sends anything.
+    calls = len(service.calls)
+    with pytest.raises(Ignore):
+        tasks.register_batch_chunk("b2", 0, users, attempt=0)
+    with pytest.raises(Ignore):
+        tasks.finish_batch_chunk("b2", 0, 0, {})
+    assert len(service.calls) == calls
+    assert len(service.users) == 3
+
+
+def test_queued_chunk_is_requeued_with_a_new_attempt(service, queued):
+    users = begin("b3")
+    assert sweep(queued) == [("b3", 0, 1)]
+    assert ("saga.registration.batch_chunk", ("b3", 0, users, 1)) in queued
+    with pytest.raises(Ignore):
+        tasks.register_batch_chunk("b3", 0, users)
+    tasks.register_batch_chunk("b3", 0, users, attempt=1)
+    assert saga_log.get_batch("b3")["chunks_done"] == 1
+
+
+def test_chunk_stalled_creating_profiles_is_compensated(service, queued):
+    users = begin("b4")
+    service.failures["/api/users/profiles/bulk"] = WorkerDied()
+    with pytest.raises(WorkerDied):
+        tasks.register_batch_chunk("b4", 0, users)
+    assert saga_log.get_chunk("b4", 0)["status"] == "creating_profiles"
+
+    # The first compensation fails: the chunk waits in compensating.
+    service.failures["/users/bulk/compensate"] = 503
+    sweep(queued)
+    assert saga_log.get_chunk("b4", 0)["status"] == "compensating"
+    assert saga_log.get_batch("b4")["chunks_done"] == 0
+
+    sweep(queued)
+    assert service.users == {} and service.profiles == set()
+    batch = saga_log.get_batch("b4")
+    assert batch["chunks_done"] == 1
+    assert all(result["status"] == "failed" and result["compensated"] for result in batch["results"])
+    assert sweep(queued) == []
+
+
+def test_failed_profiles_are_compensated_per_item(service, queued):
+    users = begin("b5")
+    service.failures["/api/users/profiles/bulk"] = requests.exceptions.ConnectionError("refused")
+    service.failures["/api/users/profiles/bulk/compensate"] = 503
+    tasks.register_batch_chunk("b5", 0, users)
+    assert saga_log.get_chunk("b5", 0)["status"] == "compensating"
+    assert len(service.users) == 3
+
+    sweep(queued)
+    assert service.users == {}
+    results = saga_log.get_batch("b5")["results"]
+    assert [result["error"] for result in results] == ["Quiz service communication error: refused"] * 3
+    assert all(result["compensated"] for result in results)
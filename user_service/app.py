@@ -1,15 +1,47 @@
 from flask import Flask, request, jsonify
+from werkzeug.serving import WSGIRequestHandler
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy.exc import IntegrityError
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import os
+import sys
+import time
+
+# The migration runner is shared with the quiz service at the repository root.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dbmigrate import MigrationRunner
+from dbprofile import (
+    READ_BIND, RoutingSession, apply_pragmas, clear_read_only, engine_options, pool_stats, pragmas_from_env,
+    read_only, read_only_url
+)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+MAX_BULK_USERS = 1000
+# Password hashing dominates bulk creation; hashlib releases the GIL, so
+# hashing in threads uses every core.
+BULK_HASH_WORKERS = int(os.environ.get('USER_BULK_HASH_WORKERS', os.cpu_count() or 1))
 
 app = Flask(__name__)
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///user_service.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SECRET_KEY'] = 'user-service-secret-key'
 
-db = SQLAlchemy(app)
+# Pool settings from DB_* variables, SQLite pragmas and a read-only engine
+# for lookups, as in the quiz service.
+read_url = read_only_url(app.config['SQLALCHEMY_DATABASE_URI'], app.instance_path)
+if read_url and os.environ.get('SQLITE_READ_BIND', '1') != '0':
+    app.config['SQLALCHEMY_BINDS'] = {READ_BIND: dict(engine_options(read_url), url=read_url)}
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+
+db = SQLAlchemy(app, session_options={'class_': RoutingSession})
+
+with app.app_context():
+    for bind_key, engine in db.engines.items():
+        apply_pragmas(engine, pragmas_from_env(), read_only=bind_key == READ_BIND)
+app.teardown_request(clear_read_only)
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -28,10 +60,20 @@ class User(db.Model):
             'created_at': self.created_at.isoformat()
         }
 
+def upgrade_schema(**options):
+    """Apply pending user_service migrations. Options go to MigrationRunner.upgrade."""
+    with app.app_context():
+        return MigrationRunner(db.engine, MIGRATIONS_DIR).upgrade(**options)
+
 @app.route('/health', methods=['GET'])
 def health():
     return jsonify({'status': 'ok'}), 200
 
+@app.route('/pool', methods=['GET'])
+def get_pool_stats():
+    """Connection pool usage and checkout wait times for this process."""
+    return jsonify({'pid': os.getpid(), 'binds': pool_stats(db.engines)}), 200
+
 @app.route('/users', methods=['POST'])
 def create_user():
     data = request.get_json()
@@ -56,7 +98,162 @@ def create_user():
     
     return jsonify(user.to_dict()), 201
 
+def bulk_item_error(item):
+    """
+    Why a bulk item cannot be inserted, or None if it can.
+
+    Lengths are checked here so an overlong value fails its own item instead
+    of the whole chunk's insert.
+    """
+    if not isinstance(item, dict) or not all(
+        isinstance(item.get(field), str) and item[field] for field in ('username', 'email', 'password')
+    ):
+        return 'Missing required fields: username, email, password'
+    for field in ('username', 'email'):
+        limit = User.__table__.c[field].type.length
+        if len(item[field]) > limit:
+            return f'{field} must be at most {limit} characters'
+    return None
+
+def commit_expired():
+    return jsonify({'error': 'commit_within passed before commit; no users were created'}), 503
+
+@app.route('/users/bulk', methods=['POST'])
+def create_users_bulk():
+    """
+    Create up to MAX_BULK_USERS users in one transaction (batch registration saga).
+
+    Request Body: {"users": [{"username", "email", "password"}, ...], "commit_within": seconds (optional)}
+
+    Each item is checked on its own, so one bad item does not reject the
+    others. Returns results in input order, each either the created user or
+    {"error": "..."}:
+    {"created": int, "failed": int, "results": [...]}
+
+    With commit_within, nothing is committed once that many seconds have
+    passed since the request arrived (503 instead). A caller that timed out
+    waiting can then look the users up and know the answer is final.
+    """
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get('users'), list):
+        return jsonify({'error': 'Request body must contain a users list'}), 400
+    items = data['users']
+    if len(items) > MAX_BULK_USERS:
+        return jsonify({'error': f'At most {MAX_BULK_USERS} users per request'}), 413
+    commit_within = data.get('commit_within')
+    if commit_within is not None and (
+        isinstance(commit_within, bool) or not isinstance(commit_within, (int, float)) or commit_within <= 0
+    ):
+        return jsonify({'error': 'commit_within must be a positive number of seconds'}), 400
+    deadline = time.monotonic() + commit_within if commit_within else None
+
+    results = [None] * len(items)
+    errors = [bulk_item_error(item) for item in items]
+    complete = [index for index, error in enumerate(errors) if error is None]
+    usernames = {items[index]['username'] for index in complete}
+    emails = {items[index]['email'] for index in complete}
+    taken_usernames = {row.username for row in User.query.filter(User.username.in_(usernames))}
+    taken_emails = {row.email for row in User.query.filter(User.email.in_(emails))}
+
+    valid = []
+    for index, item in enumerate(items):
+        if errors[index]:
+            results[index] = {'error': errors[index]}
+        elif item['username'] in taken_usernames:
+            results[index] = {'error': 'Username already exists'}
+        elif item['email'] in taken_emails:
+            results[index] = {'error': 'Email already exists'}
+        else:
+            # Later duplicates within the request fail like existing ones.
+            taken_usernames.add(item['username'])
+            taken_emails.add(item['email'])
+            valid.append(index)
+
+    with ThreadPoolExecutor(max_workers=BULK_HASH_WORKERS) as pool:
+        hashes = list(pool.map(generate_password_hash, [items[index]['password'] for index in valid]))
+    users = [
+        User(username=items[index]['username'], email=items[index]['email'], password_hash=password_hash)
+        for index, password_hash in zip(valid, hashes)
+    ]
+
+    if deadline and time.monotonic() > deadline:
+        return commit_expired()
+
+    try:
+        db.session.add_all(users)
+        db.session.flush()
+        if deadline and time.monotonic() > deadline:
+            db.session.rollback()
+            return commit_expired()
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent request took one of the names: insert one by one so
+        # only the conflicting items fail.
+        db.session.rollback()
+        users = [User(username=user.username, email=user.email, password_hash=user.password_hash) for user in users]
+        for index, user in zip(valid, users):
+            try:
+                with db.session.begin_nested():
+                    db.session.add(user)
+            except IntegrityError:
+                results[index] = {'error': 'Username or email already exists'}
+        if deadline and time.monotonic() > deadline:
+            db.session.rollback()
+            return commit_expired()
+        db.session.commit()
+
+    for index, user in zip(valid, users):
+        if results[index] is None:
+            results[index] = user.to_dict()
+
+    created = sum(1 for result in results if 'id' in result)
+    return jsonify({'created': created, 'failed': len(results) - created, 'results': results}), 200
+
+@app.route('/users/bulk/lookup', methods=['POST'])
+@read_only
+def lookup_users_bulk():
+    """
+    Users with the given usernames, for a batch saga that lost the response
+    to a bulk create and must find out which users were created.
+
+    Request Body: {"usernames": ["string", ...]}
+    """
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get('usernames'), list):
+        return jsonify({'error': 'Request body must contain a usernames list'}), 400
+    if len(data['usernames']) > MAX_BULK_USERS:
+        return jsonify({'error': f'At most {MAX_BULK_USERS} usernames per request'}), 413
+    if not all(isinstance(username, str) for username in data['usernames']):
+        return jsonify({'error': 'usernames must be strings'}), 400
+
+    users = User.query.filter(User.username.in_(data['usernames'])).all()
+    return jsonify({'users': [user.to_dict() for user in users]}), 200
+
+@app.route('/users/bulk/compensate', methods=['POST'])
+def compensate_delete_users_bulk():
+    """
+    Bulk compensation for the batch registration saga: delete the given
+    users. Missing users are ignored, so the call is idempotent.
+
+    Request Body: {"user_ids": [int, ...]}
+    """
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get('user_ids'), list):
+        return jsonify({'error': 'Request body must contain a user_ids list'}), 400
+    if not all(isinstance(user_id, int) and not isinstance(user_id, bool) for user_id in data['user_ids']):
+        return jsonify({'error': 'user_ids must be integers'}), 400
+
+    try:
+        deleted = User.query.filter(User.id.in_(data['user_ids'])).delete(synchronize_session=False)
+        db.session.commit()
+        return jsonify({'success': True, 'deleted': deleted, 'compensated': True}), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to compensate (delete users): {str(e)}'}), 500
+
 @app.route('/users/validate', methods=['POST'])
+@read_only
 def validate_user():
     data = request.get_json()
     
@@ -71,6 +268,7 @@ def validate_user():
     return jsonify(user.to_dict()), 200
 
 @app.route('/users/<int:user_id>', methods=['GET'])
+@read_only
 def get_user(user_id):
     user = User.query.get_or_404(user_id)
     return jsonify(user.to_dict()), 200
@@ -112,6 +310,9 @@ def compensate_delete_user(user_id):
         }), 500
 
 if __name__ == '__main__':
-    with app.app_context():
-        db.create_all()
+    # Migrations are a deploy step (python migrate.py user_service upgrade).
+    if os.environ.get('AUTO_MIGRATE', '0') == '1':
+        upgrade_schema()
+    # HTTP/1.1 keep-alive, so the saga workers' pooled clients reuse connections.
+    WSGIRequestHandler.protocol_version = 'HTTP/1.1'
     app.run(debug=True, port=5001)
@@ -0,0 +1,21 @@
+"""
+Baseline user_service schema: the users table.
+
+Matches the table db.create_all() created before migrations existed.
+"""
+import sqlalchemy as sa
+
+metadata = sa.MetaData()
+
+users = sa.Table(
+    "users", metadata,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("username", sa.String(80), unique=True, nullable=False),
+    sa.Column("email", sa.String(120), unique=True, nullable=False),
+    sa.Column("password_hash", sa.String(255), nullable=False),
+    sa.Column("created_at", sa.DateTime),
+)
+
+
+def upgrade(ctx):
+    ctx.create_table(users)